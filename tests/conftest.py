@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the modules are flat scripts in yolo/ that import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yolo"))
+
+from firebase_stub import start_stub  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """In-process stand-in for the Firebase RTDB -> (db, base url)."""
+    srv, db, url = start_stub()
+    yield db, url
+    srv.shutdown()
@@ -0,0 +1,71 @@
+"""
+Incident association: one crash seen by a noisy detector (box jitter, the
+box split in two, a frame or two missed) must stay ONE incident -- one "on", one
+"off", one alert -- while two crashes, together or one after the other, are
+two incidents with an "on" each.
+"""
+
+import numpy as np
+import pytest
+
+from accident_smoother import AccidentSmoother
+
+FPS = 10
+DURATION = 20.0
+BOX = np.array((600, 300, 760, 420), dtype=np.float32)
+OTHER = np.array((100, 350, 240, 460), dtype=np.float32)
+
+
+def noisy(box, rng, jitter=25, split=0.15):
+    box = box + rng.uniform(-jitter, jitter, 4).astype(np.float32)
+    if rng.random() < split:
+        x1, y1, x2, y2 = box
+        xm = (x1 + x2) / 2
+        return [(x1, y1, xm, y2), (xm, y1, x2, y2)]
+    return [tuple(box)]
+
+
+def run(crashes, seed, miss=0.10):
+    """crashes: [(box, t_on, t_off)] -> list of (kind, id, t) events."""
+    rng = np.random.default_rng(seed)
+    sm = AccidentSmoother()
+    events = []
+    missed = [0] * len(crashes)
+    for i in range(int(DURATION * FPS)):
+        t = i / FPS
+        boxes = []
+        for c, (box, t_on, t_off) in enumerate(crashes):
+            if not t_on <= t < t_off:
+                continue
+            # missed frames, but never as long as fall_ms (3 frames at 10 FPS): that is a real "off"
+            missed[c] = missed[c] + 1 if missed[c] < 2 and rng.random() < miss else 0
+            if not missed[c]:
+                boxes += noisy(box, rng)
+        sm.update(np.array(boxes, np.float32).reshape(-1, 4), rng.uniform(0.5, 0.9, len(boxes)), t)
+        events += [(kind, iid, t) for kind, iid, _, _ in sm.events]
+    return events
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_one_crash_is_one_incident(seed):
+    events = run([(BOX, 2.0, 18.0)], seed)
+    on = [e for e in events if e[0] == "on"]
+    off = [e for e in events if e[0] == "off"]
+    assert len(on) == 1 and len(off) == 1, events
+    assert on[0][1] == off[0][1]
+    assert 2.0 <= on[0][2] <= 2.5 and 18.0 <= off[0][2] <= 18.5
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_two_crashes_at_once_are_two_incidents(seed):
+    events = run([(BOX, 2.0, 18.0), (OTHER, 2.0, 18.0)], seed)
+    on = [e for e in events if e[0] == "on"]
+    assert len(on) == 2 and on[0][1] != on[1][1], events
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_second_crash_while_first_is_on_alerts_again(seed):
+    events = run([(BOX, 2.0, 18.0), (OTHER, 8.0, 14.0)], seed)
+    on = [(iid, t) for kind, iid, t in events if kind == "on"]
+    assert len(on) == 2, events
+    assert 2.0 <= on[0][1] <= 2.5 and 8.0 <= on[1][1] <= 8.5
@@ -0,0 +1,80 @@
+"""
+batch_analyze streams chunk results in chunk order while keeping only a
+bounded number of chunks submitted but not yet written out, and its
+stitching keeps a track's ID and count across a chunk boundary.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batch_analyze import ChunkAnalysis, ordered_results
+from counting import LineCounter, parse_count_lines
+from zones import ZoneSet, parse_zones
+
+
+def test_ordered_and_bounded():
+    lock = threading.Lock()
+    started, consumed, peak = [0], [0], [0]
+
+    def work(j):
+        with lock:
+            started[0] += 1
+            peak[0] = max(peak[0], started[0] - consumed[0])
+        time.sleep(random.uniform(0, 0.01))  # later chunks often finish first
+        return j
+
+    out = []
+    with ThreadPoolExecutor(4) as pool:
+        for r in ordered_results(pool, work, range(40), ahead=6):
+            out.append(r)
+            with lock:
+                consumed[0] += 1
+    assert out == list(range(40))
+    assert peak[0] <= 6
+
+
+def test_first_chunks_start_before_iteration():
+    with ThreadPoolExecutor(2) as pool:
+        ev = threading.Event()
+        it = ordered_results(pool, lambda j: ev.set() or j, [7], ahead=2)
+        assert ev.wait(1.0)   # submitted on the call, not on the first next()
+        assert list(it) == [7]
+
+
+def chunk_records(lo, end, tracks):
+    """Records of frames [lo, end) as a worker returns them; tracks: {local id: (first frame, cx, y0, vy)}."""
+    recs = []
+    for f in range(lo, end):
+        live = [(lid, cx, y0 + vy * (f - f0)) for lid, (f0, cx, y0, vy) in tracks.items() if f >= f0]
+        recs.append({
+            "frame": f,
+            "xyxy": np.array([(cx - 40, cy - 30, cx + 40, cy + 30) for _, cx, cy in live], np.float32).reshape(-1, 4),
+            "id": np.array([lid for lid, _, _ in live], dtype=np.int64),
+            "conf": np.full(len(live), 0.9, np.float32),
+            "cls": np.full(len(live), 2, dtype=np.int64),
+        })
+    return recs
+
+
+def test_track_crossing_at_chunk_boundary_keeps_one_id_and_counts_once():
+    W, H, FPS = 1280, 720, 25.0
+    analysis = ChunkAnalysis(FPS, LineCounter(parse_count_lines("", W, H), {2: "car"}, 200.0),
+                             ZoneSet(parse_zones("", W, H), W, H), {2: "car"})
+    # count line at y=576; the car's centre is 570 at frame 9 (chunk 0) and 580 at frame 10 (chunk 1)
+    car = (0, 640, 480, 10)
+    # the chunk-1 worker re-detects the car in its overlap frames 6..9 under its own local ID 3;
+    # a second car only appears in chunk 1 (local ID 1, which chunk 0 used for the first car)
+    out = analysis.add_chunk(0, chunk_records(0, 10, {1: car}))
+    out += analysis.add_chunk(10, chunk_records(6, 20, {3: car, 1: (12, 300, 200, 5)}))
+
+    assert [o["frame"] for o in out] == list(range(20))
+    first = [v["id"] for o in out for v in o["vehicles"] if v["xyxy"][0] == 600]
+    assert first == [1] * 20
+    assert {v["id"] for o in out for v in o["vehicles"] if v["xyxy"][0] == 260} == {2}
+    crossings = [(o["frame"], e["id"]) for o in out for e in o["events"] if e["type"] == "crossing"]
+    assert crossings == [(10, 1)]
+    assert out[-1]["crossings"] == 1 and analysis.tracks == 2
@@ -0,0 +1,121 @@
+"""
+Capture: FrameGrabber hands out every frame in order in "lossless" mode and
+only ever the newest one in "latest" mode, with capture timestamps that
+never go backwards; MjpegStream reconnects when the camera drops the
+connection (mjpeg_replay_server --drop-every) and keeps delivering frames.
+"""
+
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+from capture import FrameGrabber, MjpegStream
+from mjpeg_replay_server import make_handler
+
+LEVELS = (0, 50, 100, 150, 200)  # gray level of replay frame i
+
+
+class NumberedSource:
+    """cv2.VideoCapture stand-in: n 8x8 frames whose pixels hold the frame number, each taking `delay` s."""
+
+    def __init__(self, n, fps=25.0, delay=0.0):
+        self.n, self.fps, self.delay = n, fps, delay
+        self.i = 0
+
+    def read(self, image=None):
+        if self.i >= self.n:
+            return False, None
+        time.sleep(self.delay)
+        frame = np.full((8, 8, 3), self.i % 256, dtype=np.uint8)
+        self.i += 1
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def get(self, prop):
+        return self.fps if prop == cv2.CAP_PROP_FPS else 0.0
+
+    def release(self):
+        pass
+
+
+def drain(grabber, consume_s):
+    """Read until EOF, spending consume_s per frame -> [(frame number, frame_index, timestamp)]."""
+    got = []
+    while True:
+        ok, frame = grabber.read(timeout=5.0)
+        if not ok:
+            return got
+        got.append((int(frame[0, 0, 0]), grabber.frame_index, grabber.timestamp))
+        time.sleep(consume_s)
+
+
+def test_lossless_delivers_every_frame_in_order_on_media_time():
+    grabber = FrameGrabber(NumberedSource(60), mode="lossless", buffer_size=4, clock="media").start()
+    got = drain(grabber, consume_s=0.002)  # slower than the source: the reader must wait, not drop
+    grabber.release()
+    assert [n for n, _, _ in got] == list(range(60))
+    assert [i for _, i, _ in got] == list(range(60))
+    assert [t for _, _, t in got] == [i / 25.0 for i in range(60)]
+    assert grabber.dropped == 0 and grabber.decoded == grabber.delivered == 60
+
+
+def test_latest_drops_stale_frames_and_ends_on_the_newest():
+    grabber = FrameGrabber(NumberedSource(100, delay=0.001), mode="latest", buffer_size=4).start()
+    got = drain(grabber, consume_s=0.01)  # ~10x slower than the source
+    grabber.release()
+    idx = [i for _, i, _ in got]
+    assert [n for n, _, _ in got] == idx  # the slot read is the frame the index says
+    assert all(b > a for a, b in zip(idx, idx[1:]))
+    assert idx[-1] == 99  # the newest frame is never the one dropped
+    assert len(got) < 60 and grabber.dropped == grabber.decoded - grabber.delivered > 40
+    ts = [t for _, _, t in got]
+    assert all(b > a for a, b in zip(ts, ts[1:]))  # wall clock at decode
+
+
+@pytest.fixture
+def replay_url():
+    """mjpeg_replay_server on an ephemeral port: 1280x720 frames, connection dropped every 5 frames."""
+    jpegs = [cv2.imencode(".jpg", np.full((720, 1280, 3), v, np.uint8))[1].tobytes() for v in LEVELS]
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(jpegs, fps=200, loop=True, drop_every=5))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/stream"
+    srv.shutdown()
+    srv.server_close()
+
+
+def level(frame):
+    return LEVELS.index(min(LEVELS, key=lambda v: abs(v - float(frame.mean()))))
+
+
+def test_mjpeg_stream_reconnects_after_dropped_connections(replay_url):
+    stream = MjpegStream(replay_url, target_size=320, backoff_min=0.01)
+    seen = []
+    for _ in range(12):
+        ok, frame = stream.read()
+        assert ok
+        seen.append(level(frame))
+    stream.release()
+    # every new connection replays from frame 0
+    assert seen == [0, 1, 2, 3, 4, 0, 1, 2, 3, 4, 0, 1]
+    assert stream.frames == 12 and stream.reconnects == 2 and stream.decode_errors == 0
+    assert stream.factor == 4 and stream.frame_size == (320, 180)  # auto: decoded at 1/4 for --imgsz 320
+
+
+def test_grabbed_mjpeg_stream_has_monotonic_timestamps(replay_url):
+    grabber = FrameGrabber(MjpegStream(replay_url, reduce="1", backoff_min=0.01), mode="lossless").start()
+    seen, ts = [], []
+    for _ in range(12):
+        ok, frame = grabber.read(timeout=5.0)
+        assert ok
+        seen.append(level(frame))
+        ts.append(grabber.timestamp)
+    grabber.release()
+    assert seen == [0, 1, 2, 3, 4, 0, 1, 2, 3, 4, 0, 1]  # nothing lost across the reconnects
+    assert all(b > a for a, b in zip(ts, ts[1:]))
+    assert grabber.delivered == 12 and grabber.dropped == 0 and grabber.cap.reconnects >= 2
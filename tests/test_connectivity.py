@@ -0,0 +1,65 @@
+"""Connectivity monitor: outages and recoveries are noticed off the loop, and journaled events drain after."""
+
+import time
+
+from connectivity import ConnectivityMonitor
+from event_journal import EventJournal
+from uploader import PRIO_TRAFFIC, Uploader
+
+
+def wait_for(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return cond()
+
+
+def test_outage_is_detected_and_backlog_drains_on_recovery(stub):
+    db, url = stub
+    uploader = Uploader(url, retries=0, timeout=1.0)
+    monitor = ConnectivityMonitor(url + "/.json", probe_s=0.5, retry_s=0.2, timeout=1.0)
+    uploader.on_result = monitor.report
+    journal = EventJournal(":memory:", uploader, batch=50, retry_s=0.2)
+    changes = []
+    monitor.subscribe(lambda online: changes.append(online))
+    monitor.subscribe(journal.set_online)
+    try:
+        assert wait_for(lambda: monitor.probes > 0) and monitor.online
+
+        db.down = True
+        t = time.monotonic()
+        assert wait_for(lambda: not monitor.online, timeout=3.0)  # no uploads at all: the probe notices
+        assert time.monotonic() - t < 1.5
+        for i in range(5):
+            journal.append("/traffic.json", {"seq": i}, prio=PRIO_TRAFFIC)
+        time.sleep(0.5)
+        assert journal.pending() == 5
+
+        db.down = False
+        t = time.monotonic()
+        assert wait_for(lambda: monitor.online, timeout=3.0)
+        assert time.monotonic() - t < 1.0
+        assert wait_for(lambda: journal.pending() == 0)
+        assert sorted(v["seq"] for v in db.get(["traffic"]).values()) == list(range(5))
+        assert changes == [True, False, True]
+    finally:
+        monitor.close()
+        journal.set_online(False)
+        uploader.close()
+        journal.close()
+
+
+def test_upload_failures_mark_the_link_down_without_a_probe(stub):
+    _, url = stub
+    monitor = ConnectivityMonitor(url + "/.json", probe_s=3600, retry_s=3600, fail_after=2)
+    try:
+        assert wait_for(lambda: monitor.probes > 0)  # the start-up probe, then none for an hour
+        monitor.report(True)
+        monitor.report(False)
+        assert monitor.online  # one failure is not an outage
+        monitor.report(False)
+        assert not monitor.online
+        monitor.report(True)  # any HTTP answer proves the link
+        assert monitor.online
+    finally:
+        monitor.close()
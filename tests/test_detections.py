@@ -0,0 +1,109 @@
+"""
+Detections masks and LineCounter crossings on hand-made geometry: which
+boxes a class filter / ROI keeps, when a track moving across a line counts
+(direction, finite segment, first sighting, untracked boxes) and how the
+cooldown swallows a box jittering over the line.
+"""
+
+import numpy as np
+
+from counting import LineCounter
+from detections import Detections, class_lut
+
+W, H = 1280, 720
+NAMES = {2: "car", 7: "truck"}
+FLAT = ("flat", (100, 400, 1100, 400), ("in", "out"))      # left -> right: "in" = moving down
+SLANT = ("slant", (200, 100, 1000, 600), ("in", "out"))
+
+
+def box(cx, cy, w=60, h=40):
+    return (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+
+def dets(*tracks, cls=2):
+    """Detections from (track_id, cx, cy) tuples."""
+    xyxy = np.array([box(cx, cy) for _, cx, cy in tracks], dtype=np.float32).reshape(-1, 4)
+    return Detections(xyxy, np.ones(len(tracks)), np.full(len(tracks), cls),
+                      np.array([tid for tid, _, _ in tracks], dtype=np.int64))
+
+
+def feed(counter, frames, fps=25.0):
+    """Run frames of (track_id, cx, cy) tuples; -> [(frame index, events)] for frames with events."""
+    out = []
+    for i, tracks in enumerate(frames):
+        counter.update(dets(*tracks), i, i / fps)
+        if counter.events:
+            out.append((i, counter.events))
+    return out
+
+
+def test_class_mask_and_intersects():
+    det = Detections(np.array([(0, 0, 10, 10), (10, 0, 20, 10), (5, 5, 15, 15), (100, 100, 110, 110)], np.float32),
+                     np.ones(4), np.array([2, 7, 0, 99]))
+    np.testing.assert_array_equal(det.class_mask(class_lut(NAMES)), [True, True, False, False])
+    np.testing.assert_array_equal(det.class_mask(NAMES), [True, True, False, False])
+    # a box that only touches the edge does not overlap
+    np.testing.assert_array_equal(det.intersects((10, 0, 30, 10)), [False, True, True, False])
+    assert len(det.filter_classes(NAMES)) == 2 and det.filter_classes({}).xyxy.shape == (0, 4)
+
+
+def test_crossing_direction_and_events():
+    counter = LineCounter([FLAT], NAMES)
+    down = [[(1, 500, 340 + 20 * i)] for i in range(7)]   # 340 .. 460
+    up = [[(2, 700, 460 - 20 * i)] for i in range(7)]
+    got = feed(counter, down + up)
+    assert got == [(3, [(1, "flat", "in", 2)]), (10, [(2, "flat", "out", 2)])]
+    assert counter.total == 2 and counter.line_totals() == [("flat", "in", 1, "out", 1)]
+    assert counter.summary() == {"flat": {"in": {"car": 1}, "out": {"car": 1}}}
+
+
+def test_ending_exactly_on_the_line_counts_once():
+    counter = LineCounter([FLAT], NAMES)
+    got = feed(counter, [[(1, 500, 380)], [(1, 500, 400)], [(1, 500, 400)], [(1, 500, 420)]])
+    assert got == [(1, [(1, "flat", "in", 2)])]
+
+
+def test_finite_segment_and_slanted_line():
+    counter = LineCounter([FLAT, SLANT], NAMES)
+    # passes the flat line's y beyond its right end (x=1100): no crossing
+    assert feed(counter, [[(1, 1200, 380)], [(1, 1200, 420)]]) == []
+    # down and to the left through the slanted line, well inside the segment
+    counter = LineCounter([SLANT], NAMES)
+    got = feed(counter, [[(1, 640, 300)], [(1, 560, 400)]])
+    assert got == [(1, [(1, "slant", "in", 2)])]  # above the line to below it, as for the flat one
+    # moving along a line never crosses it
+    counter = LineCounter([FLAT], NAMES)
+    assert feed(counter, [[(1, 200 + 50 * i, 400)] for i in range(10)]) == []
+
+
+def test_first_sighting_and_untracked_boxes_never_count():
+    counter = LineCounter([FLAT], NAMES)
+    assert feed(counter, [[(1, 500, 420)], [(1, 500, 440)]]) == []  # first seen below the line
+    det = Detections(np.array([box(500, 380), box(500, 420)], np.float32), np.ones(2), np.full(2, 2),
+                     np.array([-1, -1]))
+    assert counter.update(det, 10, 0.4) == 0 and len(counter.store) == 1
+
+
+def test_new_track_while_another_crosses():
+    counter = LineCounter([FLAT], NAMES)
+    got = feed(counter, [[(1, 500, 380)], [(1, 500, 420), (2, 800, 380)], [(1, 500, 440), (2, 800, 420)]])
+    assert got == [(1, [(1, "flat", "in", 2)]), (2, [(2, "flat", "in", 2)])]
+
+
+def test_cooldown_swallows_jitter_on_capture_time():
+    counter = LineCounter([FLAT], NAMES, cooldown_ms=200)
+    # +-8 px around the line every frame at 25 FPS: crossings at 40 ms intervals
+    jitter = [[(1, 500, 392 if i % 2 == 0 else 408)] for i in range(13)]
+    got = feed(counter, jitter)
+    # counted at frame 1 ("in"), then again only once 200 ms (5 frames) have passed: frames 6 (out), 11 (in)
+    assert [(i, ev[0][2]) for i, ev in got] == [(1, "in"), (6, "out"), (11, "in")]
+
+    # the same motion sampled at 5 FPS: every frame is 200 ms apart, so every crossing counts
+    counter = LineCounter([FLAT], NAMES, cooldown_ms=200)
+    assert len(feed(counter, jitter[:5], fps=5.0)) == 4
+
+
+def test_cooldown_is_per_line():
+    counter = LineCounter([FLAT, ("low", (100, 440, 1100, 440), ("in", "out"))], NAMES, cooldown_ms=200)
+    got = feed(counter, [[(1, 500, 380)], [(1, 500, 420)], [(1, 500, 460)]])
+    assert got == [(1, [(1, "flat", "in", 2)]), (2, [(1, "low", "in", 2)])]
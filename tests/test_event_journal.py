@@ -0,0 +1,153 @@
+"""
+Event journal: events appended offline survive a crash (the writer dies with
+os._exit, no close), and once online the backlog drains into the DB exactly
+once -- through a slow, flaky stub that also loses acks after applying the
+write -- while new events keep being appended. The file shrinks back after.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import time
+
+from event_journal import EventJournal
+from uploader import PRIO_ACCIDENT, PRIO_TRAFFIC, PRIO_V2V, Uploader
+
+YOLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yolo")
+KINDS = (("/accidents.json", PRIO_ACCIDENT), ("/traffic.json", PRIO_TRAFFIC), ("/v2v_messages.json", PRIO_V2V))
+LISTS = ("accidents", "traffic", "v2v_messages")
+OFFLINE, LIVE = 1000, 30
+
+
+def event(i):
+    path, prio = KINDS[i % 3]
+    return path, {"seq": i, "latitude": 12.97 + i * 1e-6, "longitude": 77.59, "locationName": "Magadi Road",
+                  "timestamp": 1_700_000_000_000 + i}, prio
+
+
+def crash_after_appending(path, n):
+    """Child process: append n events with the link down, then die without closing anything."""
+    code = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {YOLO!r})
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+        from event_journal import EventJournal
+        from uploader import Uploader
+        from test_event_journal import event
+        journal = EventJournal({path!r}, Uploader("http://127.0.0.1:9"))  # never set online
+        for i in range({n}):
+            journal.append(*event(i))
+        os._exit(0)
+    """)
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=120)
+
+
+def size(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def test_journal_survives_crash_and_drains_exactly_once(stub, tmp_path):
+    db, url = stub
+    db.delay_s, db.fail_rate, db.lose_ack_rate = 0.02, 0.1, 0.1
+    path = str(tmp_path / "event_journal.db")
+    crash_after_appending(path, OFFLINE)
+    backlog = size(path)
+
+    uploader = Uploader(url, retries=0)
+    journal = EventJournal(path, uploader, batch=100, retry_s=0.1)
+    assert journal.pending() == OFFLINE
+    journal.set_online(True)
+    for i in range(OFFLINE, OFFLINE + LIVE):
+        journal.append(*event(i))
+        time.sleep(0.01)
+    deadline = time.monotonic() + 60
+    while journal.pending() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    uploader.close()
+    journal.close()
+
+    seqs = sorted(v["seq"] for name in LISTS for v in (db.get([name]) or {}).values())
+    assert seqs == list(range(OFFLINE + LIVE))  # all there, no duplicates
+    assert size(path) < backlog
+
+
+def test_accidents_drain_first(stub, tmp_path):
+    db, url = stub
+    uploader = Uploader(url)
+    journal = EventJournal(str(tmp_path / "j.db"), uploader, batch=1)
+    for i in range(6):
+        journal.append(*event(i))
+    order = []
+    real_patch = uploader.patch
+
+    def patch(path, body, **kw):
+        order.extend(k.split("/")[0] for k in body)
+        return real_patch(path, body, **kw)
+
+    uploader.patch = patch
+    journal.set_online(True)
+    deadline = time.monotonic() + 10
+    while journal.pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    uploader.close()
+    journal.close()
+    assert order == ["accidents"] * 2 + ["traffic"] * 2 + ["v2v_messages"] * 2
+
+
+def test_refused_event_is_dead_lettered_not_retried_forever(stub, tmp_path):
+    db, url = stub
+    uploader = Uploader(url)
+    path = str(tmp_path / "j.db")
+    journal = EventJournal(path, uploader, batch=16, retry_s=60.0)  # a retry would time the test out
+    bad = 9
+    for i in range(40):
+        p, body, prio = event(i)
+        if i == bad:
+            body["latitude"] = float("nan")  # Firebase answers 400
+        journal.append(p, body, prio)
+    journal.set_online(True)
+    deadline = time.monotonic() + 10
+    while journal.pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    s = journal.stats()
+    uploader.close()
+    journal.close()
+
+    seqs = sorted(v["seq"] for name in LISTS for v in (db.get([name]) or {}).values())
+    assert seqs == [i for i in range(40) if i != bad]
+    assert s["dead"] == 1 and s["failed_batches"] == 0 and s["rejected_batches"] <= 5
+    with sqlite3.connect(path) as conn:
+        (body,), = conn.execute("SELECT body FROM dead_letter").fetchall()
+    assert '"seq": 9' in body
+
+
+
+def test_denied_upload_pauses_drain_without_dead_lettering(stub, tmp_path):
+    db, url = stub
+    db.deny = True  # 401 for every request, as with an expired token
+    uploader = Uploader(url, retries=0)
+    path = str(tmp_path / "j.db")
+    journal = EventJournal(path, uploader, batch=16, retry_s=0.1)
+    for i in range(40):
+        journal.append(*event(i))
+    journal.set_online(True)
+    deadline = time.monotonic() + 10
+    while journal.stats()["failed_batches"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    s = journal.stats()
+    assert s["failed_batches"] >= 3 and s["rejected_batches"] == 0 and s["dead"] == 0
+    assert journal.pending() == 40
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 40
+        assert conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0] == 0
+
+    db.deny = False  # access restored: the backlog goes out
+    deadline = time.monotonic() + 10
+    while journal.pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    uploader.close()
+    journal.close()
+    seqs = sorted(v["seq"] for name in LISTS for v in (db.get([name]) or {}).values())
+    assert seqs == list(range(40))
@@ -0,0 +1,95 @@
+"""
+Batched upload path vs the per-call one against firebase_stub.py: the same
+simulated drive -- vehicle state once per second, accident and traffic
+events, V2V messages -- must leave identical databases (push-ID keyed lists
+compared as ordered lists, since the IDs differ run to run), in far fewer
+requests.
+"""
+
+import random
+import time
+
+import requests
+
+from firebase_stub import start_stub
+from uploader import PRIO_ACCIDENT, PRIO_STATE, PRIO_TRAFFIC, PRIO_V2V, Uploader
+
+LIST_NODES = ("accidents", "traffic", "v2v_messages")
+CAR_ID, REG = "KA01AB1234", "KA01AB1234"
+T0_MS = 1_700_000_000_000
+SECONDS, SPEED, BATCH_MS = 60, 40.0, 1000.0
+
+
+def drive(seed=0):
+    """[(t_s, method, path, body, prio)] in submit order (payloads shaped like accident_traffic.py's)."""
+    rng = random.Random(seed)
+    out = []
+    lat, lng, level = 12.9716, 77.5946, "LOW"
+    for t in range(SECONDS):
+        ts = T0_MS + t * 1000
+        lat += rng.uniform(0, 2e-4)
+        lng += rng.uniform(-1e-4, 1e-4)
+        where = {"latitude": round(lat, 6), "longitude": round(lng, 6), "locationName": f"Road {t // 30}"}
+        if t % 20 == 7:
+            new_level = rng.choice(("LOW", "MEDIUM", "HIGH"))
+            if new_level != level and new_level != "LOW":
+                out.append((t + 0.3, "POST", "/traffic.json",
+                            dict(carId=CAR_ID, regNumber=REG, **where, level=new_level, density=rng.randint(3, 12),
+                                 crossings=t * 2, timestamp=ts + 300, source="YOLO+laptop"), PRIO_TRAFFIC))
+            level = new_level
+        if t % 45 == 30:
+            out.append((t + 0.5, "POST", "/accidents.json",
+                        dict(carId=CAR_ID, regNumber=REG, **where, severity="HIGH",
+                             confidence=round(rng.uniform(0.5, 0.95), 3), timestamp=ts + 500,
+                             source="YOLO+laptop"), PRIO_ACCIDENT))
+        if rng.random() < 0.2:
+            out.append((t + 0.6, "POST", "/v2v_messages.json",
+                        dict(carId=CAR_ID, regNumber=REG, **where, payload=f"ALERT|TRAFFIC|from:C{rng.randint(2, 9)}",
+                             timestamp=ts + 600, source="LoRa+ESP32"), PRIO_V2V))
+        out.append((t + 0.9, "PUT", f"/vehicles/{CAR_ID}.json",
+                    dict(regNumber=REG, **where, trafficLevel=level, isAccident=t % 45 in range(30, 33),
+                         lastUpdate=ts + 900), PRIO_STATE))
+    return sorted(out, key=lambda w: w[0])
+
+
+def pace(t, start):
+    delay = start + t / SPEED - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def normalized(root):
+    """Push-ID keyed lists -> values in key (= creation) order."""
+    root = dict(root or {})
+    for name in LIST_NODES:
+        node = root.get(name) or {}
+        root[name] = [node[k] for k in sorted(node)]
+    return root
+
+
+def test_batched_writes_leave_the_same_database():
+    writes = drive()
+    srv_a, db_a, url_a = start_stub()
+    srv_b, db_b, url_b = start_stub()
+    try:
+        start = time.monotonic()
+        for t, method, path, body, _ in writes:
+            pace(t, start)
+            requests.request(method, url_a + path, json=body, timeout=3)
+
+        # the window is in real time: scale it so it spans the same simulated time
+        up = Uploader(url_b, batch_ms=BATCH_MS / SPEED)
+        start = time.monotonic()
+        for t, method, path, body, prio in writes:
+            pace(t, start)
+            up.submit(method, path, body, prio=prio, what=path, key="state" if prio == PRIO_STATE else None)
+        up.close(timeout=30.0)
+    finally:
+        srv_a.shutdown()
+        srv_b.shutdown()
+
+    a, b = normalized(db_a.root), normalized(db_b.root)
+    assert all(a[name] for name in LIST_NODES)
+    assert a == b
+    assert db_b.requests < 0.75 * db_a.requests
+    assert db_b.methods.get("POST", 0) == 0  # list entries went in with client push IDs
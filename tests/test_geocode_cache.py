@@ -0,0 +1,121 @@
+"""Geohash-keyed reverse-geocode cache: lookups never wait, each cell is asked for once, and survives restarts."""
+
+import threading
+import time
+
+import pytest
+
+from geocode_cache import UNKNOWN, GeocodeCache, geohash
+
+LAT, LNG = 12.9716, 77.5946
+
+
+class FakeAPI:
+    def __init__(self, delay_s=0.05, fail=False):
+        self.calls = []
+        self.delay_s = delay_s
+        self.fail = fail
+        self.answered = threading.Event()
+
+    def __call__(self, lat, lng):
+        self.calls.append((lat, lng))
+        time.sleep(self.delay_s)
+        self.answered.set()
+        return UNKNOWN if self.fail else f"Road {geohash(lat, lng, 7)}, Area"
+
+
+def settle(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with cache._cv:
+            if not cache._pending and cache._inflight is None:
+                return
+        time.sleep(0.01)
+
+
+def test_geohash_reference_values():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash(LAT, LNG, 7) == "tdr1v9q"
+
+
+def test_lookup_does_not_wait_and_asks_once_per_cell():
+    api = FakeAPI(delay_s=0.2)
+    cache = GeocodeCache(api, ":memory:")
+    cache.set_online(True)
+    t = time.perf_counter()
+    names = [cache.lookup(LAT + i * 1e-6, LNG) for i in range(50)]  # all in one ~150 m cell
+    assert time.perf_counter() - t < 0.1
+    assert names[0] == UNKNOWN
+    assert api.answered.wait(2.0)
+    settle(cache)
+    assert len(api.calls) == 1  # queued and in-flight cells are not asked for again
+    assert cache.lookup(LAT, LNG) == f"Road {geohash(LAT, LNG)}, Area"
+    cache.close()
+
+
+def test_repeat_commute_is_served_from_disk(tmp_path):
+    path = str(tmp_path / "geocode_cache.db")
+    route = [(LAT + i * 5e-4, LNG) for i in range(40)]  # ~55 m apart, ~4 km
+    api = FakeAPI(delay_s=0.0)
+    cache = GeocodeCache(api, path)
+    cache.set_online(True)
+    for lat, lng in route:
+        cache.lookup(lat, lng)
+        settle(cache)
+    cache.close()
+    first = len(api.calls)
+    assert first > 10
+
+    cache = GeocodeCache(api, path, capacity=8)  # small LRU: most hits come from disk
+    cache.set_online(True)
+    names = [cache.lookup(lat, lng) for lat, lng in route]
+    settle(cache)
+    s = cache.stats()
+    cache.close()
+    assert len(api.calls) == first
+    assert UNKNOWN not in names
+    assert s["hit_rate"] == 1.0 and s["disk_hits"] >= first and s["api_saved"] == len(route)
+
+
+def test_offline_misses_use_fallback_and_wait_for_the_link():
+    api = FakeAPI(delay_s=0.0)
+    cache = GeocodeCache(api, ":memory:", fallback=lambda lat, lng: "Magadi Road, Kottigepalya")
+    assert cache.lookup(LAT, LNG) == "Magadi Road, Kottigepalya"
+    time.sleep(0.1)
+    assert api.calls == []  # offline: nothing sent
+    cache.set_online(True)
+    assert api.answered.wait(2.0)
+    settle(cache)
+    assert cache.lookup(LAT, LNG) == f"Road {geohash(LAT, LNG)}, Area"  # API answer wins once cached
+    assert cache.stats()["fallback_names"] == 1
+    cache.close()
+
+
+def test_failed_answers_are_not_cached_and_backed_off():
+    api = FakeAPI(delay_s=0.0, fail=True)
+    cache = GeocodeCache(api, ":memory:", retry_s=0.2)
+    cache.set_online(True)
+    cache.lookup(LAT, LNG)
+    assert api.answered.wait(2.0)
+    settle(cache)
+    cache.lookup(LAT, LNG)  # within retry_s: not asked again
+    settle(cache)
+    assert len(api.calls) == 1
+    time.sleep(0.25)
+    cache.lookup(LAT, LNG)
+    settle(cache)
+    assert len(api.calls) == 2
+    assert cache.stats()["cached"] == 0
+    cache.close()
+
+
+@pytest.mark.parametrize("capacity", [1, 3])
+def test_lru_is_bounded(capacity):
+    cache = GeocodeCache(FakeAPI(delay_s=0.0), ":memory:", capacity=capacity)
+    cache.set_online(True)
+    for i in range(10):
+        cache.lookup(LAT + i * 0.01, LNG)
+        settle(cache)
+    assert cache.stats()["cached"] == capacity
+    assert cache.stats()["stored"] == 10
+    cache.close()
@@ -0,0 +1,49 @@
+"""
+MotionGate: a static (noisy) scene reuses the last detections, a small
+change only refreshes the tracker, a large one runs every model, and
+max_skip forces a full inference however quiet the scene stays.
+"""
+
+import numpy as np
+
+from motion_gate import GATE_FULL, GATE_REUSE, GATE_TRACK, MotionGate
+
+W, H = 640, 384  # 4x the default 160x96 thumbnail: a gate block is 32x32 px, 20x12 = 240 blocks
+rng = np.random.default_rng(0)
+
+
+def scene(*boxes):
+    """Gray road with sensor noise and white (x, y, w, h) objects, in gate blocks."""
+    frame = np.clip(80 + rng.normal(0, 4, (H, W, 3)), 0, 255).astype(np.uint8)
+    for x, y, w, h in boxes:
+        frame[y * 32:(y + h) * 32, x * 32:(x + w) * 32] = 255
+    return frame
+
+
+def test_decision_sequence():
+    gate = MotionGate()
+    flicker = scene()
+    flicker[::50, ::50] = 255  # single hot pixels
+    frames = [
+        scene(),                # first frame: nothing to compare against
+        scene(), flicker,       # noise and flicker only
+        scene((2, 2, 2, 2)),    # small car, 4/240 blocks changed
+        scene((2, 2, 8, 6)),    # a truck pulls in, 48/240
+        scene((2, 2, 8, 6)),    # parked
+        scene((3, 2, 8, 6)),    # moves one block: 12/240
+    ]
+    decisions = [gate.decide(f) for f in frames]
+    assert decisions == [GATE_FULL, GATE_REUSE, GATE_REUSE, GATE_TRACK, GATE_FULL, GATE_REUSE, GATE_FULL]
+    assert gate.stats() == {"frames": 7, "full": 3, "track": 1, "reuse": 3, "skip_ratio": 0.571}
+
+
+def test_max_skip_forces_full_inference():
+    gate = MotionGate(max_skip=3)
+    decisions = [gate.decide(scene()) for _ in range(9)]
+    assert decisions == [GATE_FULL] + [GATE_REUSE] * 3 + [GATE_FULL] + [GATE_REUSE] * 3 + [GATE_FULL]
+
+    # a small change that stays small is compared against the last full frame, so it keeps asking
+    # for a tracker refresh only -- until max_skip runs out
+    gate = MotionGate(max_skip=3)
+    decisions = [gate.decide(scene((2, 2, 2, 2) if i else (0, 0, 0, 0))) for i in range(6)]
+    assert decisions == [GATE_FULL, GATE_TRACK, GATE_TRACK, GATE_TRACK, GATE_FULL, GATE_REUSE]
@@ -0,0 +1,73 @@
+"""Offline reverse geocoder: names from the sample road file, and exact nearest road vs brute force."""
+
+import math
+import os
+
+import numpy as np
+import pytest
+
+from offline_geocoder import UNKNOWN, OfflineGeocoder
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yolo",
+                      "offline_roads_sample.geojson")
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return OfflineGeocoder.load(SAMPLE)
+
+
+@pytest.mark.parametrize("lat, lng, name", [
+    (12.9840, 77.5160, "Magadi Road, Kottigepalya"),
+    (12.9772, 77.5500, "Magadi Road, Vijayanagar"),
+    (12.9750, 77.5112, "Outer Ring Road, Kottigepalya"),   # no area on the road: nearest locality
+    (12.9585, 77.5350, "Mysore Road, Deepanjali Nagar"),
+    (12.9935, 77.5300, "Basaveshwara Nagar"),              # off-road: locality only
+    (12.9300, 77.4000, UNKNOWN),                           # outside the extract
+])
+def test_sample_names(sample, lat, lng, name):
+    assert sample.reverse(lat, lng) == name
+
+
+def synthetic_city(rng, n_roads=400, km=6.0, lat0=12.97, lng0=77.59):
+    """Random-walk polylines of 3..12 vertices, ~50..400 m apart."""
+    mx = math.cos(math.radians(lat0)) * 111_320.0
+    roads = []
+    for r in range(n_roads):
+        x, y = rng.uniform(0, km * 1000, 2)
+        heading = rng.uniform(0, 2 * math.pi)
+        line = []
+        for _ in range(rng.integers(3, 13)):
+            line.append((lat0 + y / 111_320.0, lng0 + x / mx))
+            heading += rng.normal(0, 0.4)
+            step = rng.uniform(50, 400)
+            x, y = x + step * math.cos(heading), y + step * math.sin(heading)
+        roads.append((f"Road {r}", None, line))
+    return roads, lat0, lng0, mx, km
+
+
+def brute_nearest(geo, roads, lat, lng):
+    """Distance (m) to the closest original segment over the whole file."""
+    p = np.array(geo._xy(lat, lng))
+    best = math.inf
+    for _, _, line in roads:
+        xy = np.array([geo._xy(a, b) for a, b in line])
+        a, ab = xy[:-1], xy[1:] - xy[:-1]
+        t = np.clip(((p - a) * ab).sum(1) / np.maximum((ab ** 2).sum(1), 1e-9), 0, 1)
+        best = min(best, float(np.hypot(*(a + t[:, None] * ab - p).T).min()))
+    return best
+
+
+@pytest.mark.parametrize("cell_m", [50.0, 100.0, 250.0])
+def test_grid_finds_the_exact_nearest_road(cell_m):
+    rng = np.random.default_rng(0)
+    roads, lat0, lng0, mx, km = synthetic_city(rng)
+    geo = OfflineGeocoder(roads, cell_m=cell_m, max_m=150.0)
+    for x, y in rng.uniform(0, km * 1000, (100, 2)):
+        lat, lng = lat0 + y / 111_320.0, lng0 + x / mx
+        want = brute_nearest(geo, roads, lat, lng)
+        got = geo.nearest_road(lat, lng)
+        if want > 150.0:
+            assert got is None
+        else:
+            assert got is not None and abs(got[2] - want) < 0.05  # float32 storage
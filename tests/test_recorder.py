@@ -0,0 +1,44 @@
+"""
+AsyncVideoWriter must never hang the loop: a blocked write notices a dead
+encoder process and falls back to dropping frames.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from recorder import AsyncVideoWriter
+
+
+@pytest.fixture
+def frame():
+    return np.zeros((120, 160, 3), np.uint8)
+
+
+def test_block_is_default_and_keeps_every_frame(tmp_path, frame):
+    w = AsyncVideoWriter(str(tmp_path / "a.mp4"), 25, (160, 120), slots=2)
+    if not w.isOpened():
+        pytest.skip("no mp4v encoder in this OpenCV build")
+    for _ in range(50):
+        w.write(frame)
+    w.release()
+    s = w.stats()
+    assert s["policy"] == "block"
+    assert (s["written"], s["dropped"]) == (50, 0)
+
+
+def test_blocked_write_survives_dead_encoder(tmp_path, frame, capsys):
+    w = AsyncVideoWriter(str(tmp_path / "b.mp4"), 25, (160, 120), slots=2, policy="block")
+    if not w.isOpened():
+        pytest.skip("no mp4v encoder in this OpenCV build")
+    w._proc.kill()
+    w._proc.join(5)
+    t = time.monotonic()
+    for _ in range(5):
+        w.write(frame)
+    assert time.monotonic() - t < 5.0
+    assert w.encoder_died
+    assert w.written <= 2 and w.dropped >= 3
+    assert "encoder process died" in capsys.readouterr().out
+    w.release()
@@ -0,0 +1,67 @@
+"""
+Renderer draws on its own thread, but every HighGUI call (imshow / waitKey /
+destroyAllWindows) must happen on the thread that calls submit() / close().
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import render
+from render import Renderer
+
+
+class FakeGUI:
+    def __init__(self, quit_after=None):
+        self.calls = []          # (function, thread)
+        self.shown = 0
+        self.quit_after = quit_after
+
+    def imshow(self, title, img):
+        self.calls.append(("imshow", threading.current_thread()))
+        self.shown += 1
+
+    def waitKey(self, delay):
+        self.calls.append(("waitKey", threading.current_thread()))
+        return ord("q") if self.quit_after is not None and self.shown >= self.quit_after else -1
+
+    def destroyAllWindows(self):
+        self.calls.append(("destroyAllWindows", threading.current_thread()))
+
+
+def patch_gui(monkeypatch, gui):
+    for name in ("imshow", "waitKey", "destroyAllWindows"):
+        monkeypatch.setattr(render.cv2, name, getattr(gui, name))
+
+
+def test_gui_calls_stay_on_the_calling_thread(monkeypatch):
+    gui = FakeGUI()
+    patch_gui(monkeypatch, gui)
+    r = Renderer(title="test")
+    frame = np.zeros((48, 64, 3), np.uint8)
+    for i in range(30):
+        ov = r.overlay(i)
+        ov.rectangle((1, 1), (20, 20), (0, 0, 255))
+        r.submit(frame, ov)
+        time.sleep(0.005)
+    r.close()
+    assert gui.shown > 0 and r.rendered > 0
+    assert {t for _, t in gui.calls} == {threading.main_thread()}
+    assert gui.calls[-1][0] == "destroyAllWindows"
+
+
+def test_q_in_the_window_sets_quit(monkeypatch):
+    gui = FakeGUI(quit_after=1)
+    patch_gui(monkeypatch, gui)
+    r = Renderer(title="test")
+    frame = np.zeros((48, 64, 3), np.uint8)
+    deadline = time.monotonic() + 5
+    i = 0
+    while not r.quit and time.monotonic() < deadline:
+        r.submit(frame, r.overlay(i))
+        i += 1
+        time.sleep(0.005)
+    r.close()
+    assert r.quit
+    assert r.overlay(i) is None  # nothing more is drawn once quit
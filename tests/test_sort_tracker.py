@@ -0,0 +1,98 @@
+"""
+Builtin SORT/ByteTrack tracker: a car keeps its ID through a short
+occlusion, a weak detection of a track seen last frame is taken by the
+second stage (but neither starts nor revives a track), and association
+falls back to greedy matching when scipy is not installed.
+"""
+
+import numpy as np
+import pytest
+
+import sort_tracker
+from detections import Detections
+from sort_tracker import SortTracker, match
+
+FPS = 25.0
+
+
+def det(*boxes):
+    """Detections from (cx, cy, conf) tuples, 80x60 px cars."""
+    xyxy = np.array([(cx - 40, cy - 30, cx + 40, cy + 30) for cx, cy, _ in boxes], np.float32).reshape(-1, 4)
+    return Detections(xyxy, [c for _, _, c in boxes], np.full(len(boxes), 2))
+
+
+def car(i, x0=200, y0=300, vx=12.0):
+    return x0 + vx * i, y0
+
+
+def test_id_survives_short_occlusion():
+    trk = SortTracker()
+    ids = {}
+    for i in range(40):
+        if 15 <= i < 22:  # hidden behind a truck for 280 ms
+            out = trk.update(det(), i / FPS)
+            assert len(out) == 0
+            continue
+        out = trk.update(det((*car(i), 0.9), (*car(i, 900, 500, -8.0), 0.8)), i / FPS)
+        assert len(out) == 2
+        for y1, tid in zip(out.xyxy[:, 1].tolist(), out.track_id.tolist()):
+            ids.setdefault(y1, set()).add(tid)
+    assert ids == {270: {1}, 470: {2}}  # one ID per car from start to end
+    assert trk.created == 2
+
+
+def test_track_is_dropped_after_the_buffer():
+    trk = SortTracker(buffer_ms=200)
+    for i in range(5):
+        trk.update(det((*car(i), 0.9)), i / FPS)
+    for i in range(5, 12):  # 280 ms without the car
+        trk.update(det(), i / FPS)
+    out = trk.update(det((*car(12), 0.9)), 12 / FPS)
+    assert len(trk) == 1 and trk.created == 2
+    assert len(out) == 0  # the new track needs min_hits before its ID is reported
+
+
+def test_low_score_detection_keeps_a_seen_track():
+    trk = SortTracker()
+    for i in range(5):
+        first = trk.update(det((*car(i), 0.9)), i / FPS)
+    assert first.track_id.tolist() == [1]
+    # partly hidden: the detector is unsure, second stage still matches it
+    for i in range(5, 10):
+        out = trk.update(det((*car(i), 0.3)), i / FPS)
+        assert out.track_id.tolist() == [1]
+        assert out.conf[0] == pytest.approx(0.3)
+    assert trk.created == 1
+
+
+def test_low_score_detection_neither_starts_nor_revives_a_track():
+    trk = SortTracker()
+    out = trk.update(det((*car(0), 0.3)), 0.0)
+    assert len(out) == 0 and len(trk) == 0  # below --track-new
+    for i in range(1, 5):
+        trk.update(det((*car(i), 0.9)), i / FPS)
+    trk.update(det(), 5 / FPS)  # missed once: no longer "seen last frame"
+    out = trk.update(det((*car(6), 0.3)), 6 / FPS)
+    assert len(out) == 0
+    out = trk.update(det((*car(7), 0.9)), 7 / FPS)  # a confident detection does re-acquire it
+    assert out.track_id.tolist() == [1]
+
+
+def test_greedy_fallback_without_scipy(monkeypatch):
+    monkeypatch.setattr(sort_tracker, "linear_sum_assignment", None)
+    iou = np.array([[0.9, 0.8], [0.85, 0.1]])
+    rows, cols = match(iou, 0.2)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0)]  # highest IoU first, (1, 1) is below thresh
+    assert match(np.empty((0, 3)), 0.2)[0].size == 0
+
+    trk = SortTracker()
+    assert trk.stats()["assignment"] == "greedy"
+    for i in range(20):  # two cars side by side, moving together
+        out = trk.update(det((*car(i), 0.9), (*car(i, 200, 380), 0.9)), i / FPS)
+        assert sorted(zip(out.xyxy[:, 1].tolist(), out.track_id.tolist())) == [(270, 1), (350, 2)]
+
+
+def test_hungarian_when_scipy_is_installed():
+    pytest.importorskip("scipy")
+    rows, cols = match(np.array([[0.9, 0.8], [0.85, 0.1]]), 0.2)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]  # best total IoU
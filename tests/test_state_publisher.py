@@ -0,0 +1,100 @@
+"""Change-driven vehicle state: full PUT once, then PATCHes of changed fields on moves, flips and heartbeats."""
+
+import random
+import time
+
+from state_publisher import StatePublisher, moved_m
+from uploader import Uploader
+
+LAT, LNG = 12.9716, 77.5946
+M = 1 / 111_320.0  # degrees of latitude per metre
+
+
+class FakeUploader:
+    """Records submits; acks them when told to."""
+
+    def __init__(self):
+        self.sent = []
+        self.pending = []
+
+    def submit(self, method, path, body, on_done=None, **kw):
+        self.sent.append((method, path, body))
+        self.pending.append(on_done)
+        return True
+
+    def ack(self, ok=True):
+        for on_done in self.pending:
+            on_done(ok, True)
+        self.pending = []
+
+
+def publisher(**kw):
+    up = FakeUploader()
+    return up, StatePublisher(up, "C1", "KA01", **kw)
+
+
+def test_first_write_is_full_then_only_changed_fields():
+    up, pub = publisher()
+    assert pub.update(LAT, LNG, "Magadi Road", "LOW", False, now=0.0)
+    method, path, body = up.sent[-1]
+    assert (method, path) == ("PUT", "/vehicles/C1.json")
+    assert set(body) == {"regNumber", "latitude", "longitude", "locationName", "trafficLevel", "isAccident",
+                         "lastUpdate"}
+    up.ack()
+    assert pub.update(LAT, LNG, "Magadi Road", "HIGH", False, now=2.0)
+    method, _, body = up.sent[-1]
+    assert method == "PATCH" and set(body) == {"trafficLevel", "lastUpdate"}
+
+
+def test_jitter_is_not_published_but_moves_flips_and_heartbeats_are():
+    up, pub = publisher(min_move_m=25.0, heartbeat_s=30.0, min_interval_s=1.0)
+    pub.update(LAT, LNG, "A", "LOW", False, now=0.0)
+    up.ack()
+    for t in range(1, 20):  # parked, GPS jitter of a few metres
+        assert not pub.update(LAT + 5 * M * (t % 2), LNG, "A", "LOW", False, now=float(t))
+    assert pub.update(LAT + 30 * M, LNG, "A", "LOW", False, now=20.0)  # moved
+    up.ack()
+    assert pub.update(LAT + 30 * M, LNG, "A", "LOW", True, now=21.0)   # flipped
+    up.ack()
+    assert not pub.update(LAT + 30 * M, LNG, "A", "LOW", True, now=50.0)
+    assert pub.update(LAT + 30 * M, LNG, "A", "LOW", True, now=51.0)   # heartbeat
+    assert set(up.sent[-1][2]) == {"lastUpdate"}
+    s = pub.stats()
+    assert (s["full"], s["moves"], s["flips"], s["heartbeats"]) == (1, 1, 1, 1)
+
+
+def test_one_write_in_flight_and_failed_writes_are_rediffed():
+    up, pub = publisher()
+    pub.update(LAT, LNG, "A", "LOW", False, now=0.0)
+    assert not pub.update(LAT, LNG, "A", "HIGH", False, now=5.0)  # first write not acked yet
+    up.ack()
+    assert pub.update(LAT, LNG, "A", "HIGH", False, now=6.0)
+    up.ack(ok=False)
+    assert not pub.update(LAT, LNG, "A", "HIGH", True, now=6.5)  # min interval
+    assert pub.update(LAT, LNG, "A", "HIGH", True, now=7.0)
+    # diffed against what Firebase acknowledged: the lost trafficLevel goes out again
+    assert set(up.sent[-1][2]) == {"trafficLevel", "isAccident", "lastUpdate"}
+
+
+def test_database_matches_full_puts_with_far_fewer_bytes(stub):
+    db, url = stub
+    rng = random.Random(0)
+    up = Uploader(url)
+    pub = StatePublisher(up, "C1", "KA01", min_move_m=25.0, heartbeat_s=30.0)
+    lat = LAT
+    for i in range(600):  # 60 s at 10 updates/s, half parked, half at 12 m/s
+        t = i / 10.0
+        lat += (12.0 if t >= 30 else 0.0) / 10.0 * M
+        level = "HIGH" if 20 <= t < 40 else "LOW"
+        pub.update(lat + rng.gauss(0, 3) * M, LNG, f"Road {int(t // 20)}", level, 45 <= t < 50, now=t)
+        if i % 20 == 0:
+            time.sleep(0.01)  # let acks come back
+    time.sleep(0.2)
+    pub.update(lat, LNG, "Road 2", "LOW", False, now=61.0)
+    up.close(timeout=5.0)
+    doc = db.get(["vehicles", "C1"])
+    assert {k: doc[k] for k in ("regNumber", "locationName", "trafficLevel", "isAccident")} == \
+        {"regNumber": "KA01", "locationName": "Road 2", "trafficLevel": "LOW", "isAccident": False}
+    assert moved_m(doc["latitude"], doc["longitude"], lat, LNG) < 25.0 + 15.0
+    s = pub.stats()
+    assert s["writes"] < s["baseline_writes"] / 2 and s["bytes"] < s["baseline_bytes"] / 4
@@ -0,0 +1,169 @@
+"""
+The temporal rules (accident rise/fall, crossing cooldown, traffic-level
+dwell) must give the same answers whatever the processing rate. One
+synthetic 20 s scene is sampled at several rates -- steady FPS, a gate that
+skips frames, jittery frame timing -- and fed with its capture timestamps to
+AccidentSmoother, LineCounter and ZoneSet. Every event time must land within
+the sampling error of the continuous-time answer and counts must match.
+
+Scene:
+  - accident box visible 2.0 s .. 6.0 s
+  - 12 cars drive down through the count line, one every 1.2 s
+  - a car that jitters back and forth over the line for 0.15 s at t=17 s
+    before parking below it (counted once thanks to the cooldown)
+  - zone crowded (HIGH) 10.0 s .. 13.0 s, plus a 0.4 s spike at 15.0 s that
+    the dwell must swallow
+"""
+
+import numpy as np
+import pytest
+
+from accident_smoother import AccidentSmoother
+from counting import LineCounter
+from detections import Detections
+from zones import ZoneSet
+
+W, H = 1280, 720
+LINE_Y = 400
+DURATION = 20.0
+ACC_BOX = (600, 300, 760, 420)
+ACC_ON, ACC_OFF = 2.0, 6.0
+CAR_EVERY, CAR_SPEED, N_CARS = 1.2, 300.0, 12  # s, px/s
+JAM = (10.0, 13.0)
+SPIKE = (15.0, 15.4)
+BOUNCE_T = 17.0
+
+RISE_MS, FALL_MS, COOLDOWN_MS, DWELL_MS = 80.0, 240.0, 200.0, 1000.0
+
+
+def timelines():
+    """{name: (sorted capture timestamps, max frame gap)}"""
+    out = {}
+    for r in (25.0, 12.5, 6.0):
+        out[f"{r:g}fps"] = (np.arange(0.0, DURATION, 1.0 / r), 1.0 / r)
+    # 25 FPS capture, motion gate keeps 1 of 3 frames
+    out["25fps-gated"] = (np.arange(0.0, DURATION, 1 / 25.0)[::3], 3 / 25.0)
+    # CPU-bound loop: 60..220 ms per frame
+    ts = np.cumsum(np.random.default_rng(0).uniform(0.06, 0.22, int(DURATION / 0.06)))
+    ts = ts[ts < DURATION]
+    out["jitter"] = (ts, float(np.diff(ts).max()))
+    return out
+
+
+TIMELINES = timelines()
+
+
+def scene(t):
+    """(accident boxes, vehicle Detections) visible at time t."""
+    acc = [ACC_BOX] if ACC_ON <= t < ACC_OFF else []
+
+    boxes, ids = [], []
+    for k in range(N_CARS):
+        y = (t - k * CAR_EVERY) * CAR_SPEED  # car centre; enters at y=0
+        if 0 <= y <= H:
+            x = 100 + 80 * (k % 6)
+            boxes.append((x, y - 30, x + 60, y + 30))
+            ids.append(k + 1)
+    if BOUNCE_T - 0.5 <= t < BOUNCE_T + 1.0:
+        # waits above the line, jitters +-8 px around it (period 50 ms) for 0.15 s, then parks below
+        if t < BOUNCE_T:
+            y = LINE_Y - 40
+        elif t < BOUNCE_T + 0.15:
+            y = LINE_Y + (8 if int((t - BOUNCE_T) / 0.025) % 2 else -8)
+        else:
+            y = LINE_Y + 40
+        boxes.append((1000, y - 30, 1060, y + 30))
+        ids.append(999)
+
+    if JAM[0] <= t < JAM[1] or SPIKE[0] <= t < SPIKE[1]:
+        for j in range(10):
+            x = 800 + 40 * (j % 5)
+            y = 560 + 60 * (j // 5)
+            boxes.append((x, y - 30, x + 30, y))
+            ids.append(500 + j)
+
+    xyxy = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    n = len(xyxy)
+    return acc, Detections(xyxy, np.ones(n), np.full(n, 2), np.array(ids, dtype=np.int64))
+
+
+def run(ts):
+    smoother = AccidentSmoother(rise_ms=RISE_MS, fall_ms=FALL_MS)
+    counter = LineCounter([("line", (0, LINE_Y, W, LINE_Y), ("in", "out"))], {2: "car"},
+                          cooldown_ms=COOLDOWN_MS)
+    zone = np.array([(760, 480), (1000, 480), (1000, 640), (760, 640)], dtype=np.int32)
+    zones = ZoneSet([("jam", zone, (3, 8))], W, H, dwell_ms=DWELL_MS)
+
+    got = {"acc_on": [], "acc_off": [], "high_on": [], "high_off": [], "crossings": 0}
+    prev_level = "LOW"
+    for i, t in enumerate(ts, 1):
+        acc, veh = scene(t)
+        smoother.update(acc, [0.9] * len(acc), t)
+        for kind, _, _, _ in smoother.events:
+            got[f"acc_{kind}"].append(t)
+        got["crossings"] += counter.update(veh, i, t)
+        level = zones.update(veh, t).levels[0]
+        if level != prev_level:
+            got["high_on" if level == "HIGH" else "high_off"].append(t)
+            prev_level = level
+    return got
+
+
+@pytest.fixture(scope="module", params=sorted(TIMELINES))
+def sampled(request):
+    ts, max_gap = TIMELINES[request.param]
+    return run(ts), ts, max_gap
+
+
+def anchor(ts, rule):
+    """Capture time the rule's timer starts from: the first (last, for acc_off) frame that shows the change."""
+    if rule == "acc_on":
+        return ts[ts >= ACC_ON][0] + RISE_MS / 1000.0
+    if rule == "acc_off":
+        return ts[ts < ACC_OFF][-1] + FALL_MS / 1000.0
+    start = JAM[0] if rule == "high_on" else JAM[1]
+    return ts[ts >= start][0] + DWELL_MS / 1000.0
+
+
+@pytest.mark.parametrize("rule", ["acc_on", "acc_off", "high_on", "high_off"])
+def test_event_time_is_rate_independent(sampled, rule):
+    # the decision lands on the first frame at or after the deadline: at most one frame interval late
+    got, ts, max_gap = sampled
+    assert len(got[rule]) == 1, got[rule]
+    due = anchor(ts, rule)
+    assert due - 1e-6 <= got[rule][0] < due + max_gap
+
+
+def test_exact_frames_at_25fps():
+    # file frames stamped i / 25: rise 80 ms = seen on 3 frames, fall 240 ms = 6 frames after the last box
+    for start in range(500):
+        smoother = AccidentSmoother(rise_ms=RISE_MS, fall_ms=FALL_MS)
+        on = off = None
+        for i in range(start, start + 40):
+            visible = start + 5 <= i < start + 20
+            smoother.update([ACC_BOX] if visible else [], [0.9] * visible, i / 25)
+            for kind, _, _, _ in smoother.events:
+                if kind == "on":
+                    on = i
+                else:
+                    off = i
+        assert (on, off) == (start + 7, start + 25), start
+
+
+def test_crossings_are_rate_independent(sampled):
+    got, _, _ = sampled
+    cars = sum(1 for k in range(N_CARS) if k * CAR_EVERY + LINE_Y / CAR_SPEED < DURATION)
+    assert got["crossings"] == cars + 1  # + the jittering car, once
+
+
+def test_exact_dwell_at_25fps():
+    zone = np.array([(760, 480), (1000, 480), (1000, 640), (760, 640)], dtype=np.int32)
+    jam = Detections(np.array([(800 + 40 * j, 560, 830 + 40 * j, 590) for j in range(5)] * 2, np.float32),
+                     np.ones(10), np.full(10, 2), np.arange(10))
+    for start in range(0, 500, 7):
+        zones = ZoneSet([("jam", zone, (3, 8))], W, H, dwell_ms=DWELL_MS)
+        high = None
+        for i in range(start, start + 40):
+            if zones.update(jam if i >= start + 5 else Detections.empty(), i / 25).levels[0] == "HIGH" and high is None:
+                high = i
+        assert high == start + 30, start  # 1 s of disagreement = 25 frame intervals
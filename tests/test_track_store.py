@@ -0,0 +1,56 @@
+"""
+TrackStore stays bounded: tracks not seen for max_age frames / seconds are
+evicted, a full store evicts its stalest track, and a slot handed to a new
+track carries none of the old track's state (counting cooldown, centroid).
+"""
+
+import numpy as np
+
+from counting import LineCounter
+from detections import Detections
+from track_store import TrackStore
+
+
+def test_stale_tracks_are_evicted_by_frames_and_by_time():
+    st = TrackStore(capacity=8, max_age_frames=10)
+    st.insert([1, 2], frame_idx=0)
+    st.insert([3], frame_idx=5)
+    slot = st.lookup([2])
+    st.last_frame[slot] = 8  # track 2 seen again at frame 8
+    assert st.evict(10) == 0
+    assert st.evict(11) == 1  # track 1: last seen 11 frames ago
+    assert st.lookup([1]).tolist() == [-1] and (st.lookup([2, 3]) >= 0).all()
+    assert st.evict(16) == 1 and len(st) == 1  # then track 3
+    assert st.evicted == 2
+
+    st = TrackStore(capacity=8, max_age_frames=0, max_age_s=2.0)
+    st.insert([7], frame_idx=0, t=100.0)
+    assert st.evict(10_000, t=102.0) == 0 and st.evict(10_001, t=102.1) == 1
+
+
+def test_full_store_evicts_the_stalest():
+    st = TrackStore(capacity=3, max_age_frames=0)
+    for f, tid in enumerate((10, 11, 12)):
+        st.insert([tid], frame_idx=f)
+    st.insert([13], frame_idx=3)
+    assert st.lookup([10]).tolist() == [-1] and (st.lookup([11, 12, 13]) >= 0).all()
+    assert st.forced == 1 and st.peak == 3
+
+
+def test_reused_slot_does_not_leak_state():
+    counter = LineCounter([("line", (0, 400, 1280, 400), ("in", "out"))], {2: "car"}, cooldown_ms=10_000,
+                          store=TrackStore(capacity=1, max_age_frames=5))
+
+    def frame(tid, cy, i):
+        return counter.update(Detections(np.array([(600, cy - 30, 680, cy + 30)], np.float32), [0.9], [2], [tid]),
+                              i, i / 25.0)
+
+    assert frame(1, 380, 0) == 0 and frame(1, 420, 1) == 1  # track 1 crosses: long cooldown on its slot
+    slot = counter.store.lookup([1])[0]
+
+    # track 1 leaves; 6 frames later track 2 gets the same (only) slot
+    assert frame(2, 420, 7) == 0  # first sighting below the line: no crossing from track 1's centroid
+    assert counter.store.lookup([1, 2]).tolist() == [-1, slot]
+    assert counter.store.first_frame[slot] == 7 and counter.store.last_count[slot] == -np.inf
+    # and it is not under track 1's cooldown
+    assert frame(2, 380, 8) == 1 and counter.events == [(2, "line", "out", 2)]
@@ -0,0 +1,80 @@
+"""Background uploader against firebase_stub.py: priority, coalescing, bounded queue, retries, refused writes."""
+
+import time
+
+from uploader import PRIO_ACCIDENT, PRIO_STATE, PRIO_TRAFFIC, PRIO_V2V, Uploader, push_id
+
+
+def busy(up, db, delay_s=0.2):
+    """Slow the stub down and park the worker on one request, so later submits queue up."""
+    db.delay_s = delay_s
+    up.put("/warmup.json", 1)
+    time.sleep(0.05)
+
+
+def test_accident_jumps_the_queue(stub):
+    db, url = stub
+    up = Uploader(url)
+    busy(up, db)
+    done = []
+    for prio, name in ((PRIO_STATE, "state"), (PRIO_V2V, "v2v"), (PRIO_TRAFFIC, "traffic"),
+                       (PRIO_ACCIDENT, "accident")):
+        up.put(f"/{name}.json", 1, prio=prio, on_done=lambda ok, retryable, n=name: done.append((n, ok)))
+    up.close(timeout=10.0)
+    assert done == [("accident", True), ("traffic", True), ("v2v", True), ("state", True)]
+
+
+def test_keyed_state_updates_coalesce(stub):
+    db, url = stub
+    up = Uploader(url)
+    busy(up, db)
+    for i in range(5):
+        up.put("/vehicles/C1.json", {"i": i}, key="state")
+    up.close(timeout=10.0)
+    assert db.get(["vehicles", "C1"]) == {"i": 4}
+    assert up.coalesced == 4
+    assert db.methods["PUT"] == 2  # warm-up + one state write
+
+
+def test_full_queue_evicts_lowest_priority(stub):
+    db, url = stub
+    up = Uploader(url, max_queue=2)
+    busy(up, db)
+    results = {}
+    assert up.put("/a.json", 1, on_done=lambda ok, retryable: results.setdefault("a", ok))
+    assert up.put("/b.json", 1, on_done=lambda ok, retryable: results.setdefault("b", ok))
+    assert up.put("/acc.json", 1, prio=PRIO_ACCIDENT)  # evicts the newest state write
+    assert results == {"b": False}
+    assert not up.put("/c.json", 1)  # outranks nothing queued: dropped
+    up.close(timeout=10.0)
+    assert results == {"a": True, "b": False}
+    assert db.get(["acc"]) == 1 and db.get(["b"]) is None
+    assert up.dropped == 2
+
+
+def test_5xx_is_retried_until_it_lands(stub):
+    db, url = stub
+    db.fail_rate = 0.5
+    up = Uploader(url, retries=8, backoff=0.01)
+    for i in range(20):
+        up.put(f"/n/{i}.json", i)
+    up.close(timeout=20.0)
+    assert db.get(["n"]) == {str(i): i for i in range(20)}
+    assert up.retried > 0 and up.failed == 0
+
+
+def test_push_ids_sort_in_creation_order():
+    ids = [push_id() for _ in range(1000)]
+    assert len(set(ids)) == 1000 and ids == sorted(ids)
+    assert all(len(i) == 20 for i in ids)
+
+
+def test_uploader_isolates_refused_job_in_combined_request(stub):
+    db, url = stub
+    uploader = Uploader(url, batch_ms=50)
+    done = {}
+    uploader.put("/good.json", 1, on_done=lambda ok, retryable: done.setdefault("good", (ok, retryable)))
+    uploader.put("/bad.json", float("inf"), on_done=lambda ok, retryable: done.setdefault("bad", (ok, retryable)))
+    uploader.close()
+    assert done == {"good": (True, False), "bad": (False, False)}
+    assert db.get(["good"]) == 1
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+accident_smoother.py
+
+Temporal smoothing of accident boxes with several incidents at once
+(replaces the single best_box AccidentSmoother copied into the scripts).
+
+- every frame, accident boxes are matched to the open incidents with a
+  pairwise IoU matrix (greedy, highest IoU first, >= iou_match)
+- one crash stays one incident: boxes of a frame that overlap or touch
+  (the detector split the crash into pieces) are joined first; a box lying
+  mostly inside an incident (>= part_min of its area) is a part of it, and
+  the incident's box is the union of its parts; incidents that come to
+  overlap (a box that jittered away and back) are merged into one, keeping
+  the id that was already announced 'on' (or the older one), silently
+- each incident has its own hysteresis on capture timestamps (seconds,
+  e.g. FrameGrabber.timestamp), so it means the same at 25 FPS and at 6 FPS:
+    'on'  once it has been matched in every frame for >= rise_ms
+    'off' once no box has matched it for >= fall_ms
+  other unmatched boxes open new (not yet 'on') incidents
+- update() returns the old (state_on, best_box, best_conf) triple, where
+  best = highest-confidence incident that is on; per-incident transitions of
+  the last update are in .events as ("on" | "off", incident_id, box, conf).
+  Each "on" is one accident: the scripts alert once per incident
+"""
+
+import time
+
+import numpy as np
+
+
+def _area(a):
+    return np.clip(a[..., 2] - a[..., 0], 0, None) * np.clip(a[..., 3] - a[..., 1], 0, None)
+
+
+def _inter(a, b):
+    """Intersection areas of broadcast (..., 4) xyxy arrays."""
+    iw = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    ih = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    return np.clip(iw, 0, None) * np.clip(ih, 0, None)
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays -> (N, M)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    inter = _inter(a[:, None], b[None])
+    return inter / np.maximum(_area(a)[:, None] + _area(b)[None, :] - inter, 1e-6)
+
+
+def ioa_matrix(a, b):
+    """Share of each box of a covered by each box of b: intersection / area(a) -> (N, M)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    return _inter(a[:, None], b[None]) / np.maximum(_area(a)[:, None], 1e-6)
+
+
+def group_boxes(boxes, confs, touch=0.1):
+    """
+    Boxes of one frame that overlap or touch (closer than `touch` x their size)
+    as one box each: their union, with the highest confidence. A detector that
+    splits a crash into pieces still reports one crash.
+    """
+    n = len(boxes)
+    if n < 2:
+        return boxes, confs
+    pad = (boxes[:, 2:] - boxes[:, :2]) * (touch / 2)
+    grown = np.concatenate((boxes[:, :2] - pad, boxes[:, 2:] + pad), axis=1)
+    near = _inter(grown[:, None], grown[None]) > 0
+    if near.sum() == n:  # nothing but the diagonal
+        return boxes, confs
+    label = np.arange(n)
+    while True:  # connected components: every box takes the smallest label it can reach
+        nxt = np.where(near, label[None, :], n).min(axis=1)
+        if (nxt == label).all():
+            break
+        label = nxt
+    groups, k = np.unique(label, return_inverse=True)
+    out = np.tile(np.array((np.inf, np.inf, -np.inf, -np.inf), dtype=np.float32), (len(groups), 1))
+    np.minimum.at(out[:, 0], k, boxes[:, 0])
+    np.minimum.at(out[:, 1], k, boxes[:, 1])
+    np.maximum.at(out[:, 2], k, boxes[:, 2])
+    np.maximum.at(out[:, 3], k, boxes[:, 3])
+    conf = np.zeros(len(groups), dtype=np.float32)
+    np.maximum.at(conf, k, confs)
+    return out, conf
+
+
+def greedy_match(iou, thresh):
+    """(rows, cols) of a one-to-one matching, highest IoU first, only pairs >= thresh."""
+    rows, cols = [], []
+    if iou.size == 0:
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+    cand = np.argwhere(iou >= thresh)
+    if len(cand):
+        cand = cand[np.argsort(-iou[cand[:, 0], cand[:, 1]], kind="stable")]
+        used_r, used_c = set(), set()
+        for r, c in cand.tolist():
+            if r in used_r or c in used_c:
+                continue
+            used_r.add(r)
+            used_c.add(c)
+            rows.append(r)
+            cols.append(c)
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+class AccidentSmoother:
+    def __init__(self, rise_ms=80, fall_ms=240, iou_match=0.3, part_min=0.6, touch=0.1, max_incidents=32):
+        self.rise_s = rise_ms / 1000.0
+        self.fall_s = fall_ms / 1000.0
+        self.iou_match = iou_match
+        self.part_min = part_min
+        self.touch = touch
+        self.max_incidents = max_incidents
+        # one row per open incident
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.conf = np.empty(0, dtype=np.float32)
+        self.since = np.empty(0, dtype=np.float64)      # start of the current matched run (inf = broken)
+        self.last_seen = np.empty(0, dtype=np.float64)  # time of the last matching box
+        self.on = np.empty(0, dtype=bool)
+        self._next_id = 1
+        self.events = []
+
+    @property
+    def state_on(self):
+        return bool(self.on.any())
+
+    def active(self):
+        """[(incident_id, (x1, y1, x2, y2), conf)] for incidents that are on."""
+        return [(int(i), tuple(int(v) for v in b), float(c))
+                for i, b, c in zip(self.ids[self.on], self.boxes[self.on], self.conf[self.on])]
+
+    def update(self, acc_boxes, acc_confs, t=None):
+        """Feed one frame's accident boxes captured at time t (s, monotonic; default now)."""
+        t = time.monotonic() if t is None else float(t)
+        boxes = np.asarray(acc_boxes, dtype=np.float32).reshape(-1, 4)
+        confs = np.asarray(acc_confs, dtype=np.float32).reshape(-1)
+        self.events = []
+
+        boxes, confs = group_boxes(boxes, confs, self.touch)
+
+        rows, cols = greedy_match(iou_matrix(self.boxes, boxes), self.iou_match)
+        owner = np.full(len(boxes), -1, dtype=np.int64)  # incident row of each box
+        owner[cols] = rows
+        free = np.flatnonzero(owner < 0)
+        if len(free) and len(self.ids):
+            # a box lying mostly inside an incident (a partial detection) belongs to it
+            ioa = ioa_matrix(boxes[free], self.boxes)
+            part = ioa.max(axis=1) >= self.part_min
+            owner[free[part]] = ioa.argmax(axis=1)[part]
+        mine = owner >= 0
+        seen = np.zeros(len(self.ids), dtype=bool)
+        seen[owner[mine]] = True
+
+        # seen incidents follow the union of their boxes; a miss breaks the run
+        if mine.any():
+            k, b = owner[mine], boxes[mine]
+            self.boxes[seen] = (np.inf, np.inf, -np.inf, -np.inf)
+            self.conf[seen] = 0.0
+            np.minimum.at(self.boxes[:, 0], k, b[:, 0])
+            np.minimum.at(self.boxes[:, 1], k, b[:, 1])
+            np.maximum.at(self.boxes[:, 2], k, b[:, 2])
+            np.maximum.at(self.boxes[:, 3], k, b[:, 3])
+            np.maximum.at(self.conf, k, confs[mine])
+        self.since[seen] = np.minimum(self.since[seen], t)
+        self.last_seen[seen] = t
+        self.since[~seen] = np.inf
+        self._merge()
+
+        # tolerate timestamp rounding: file frames are stamped i / fps
+        rising = ~self.on & (t - self.since >= self.rise_s - 1e-6)
+        self.on |= rising
+        falling = t - self.last_seen >= self.fall_s - 1e-6
+        for i in np.flatnonzero(rising):
+            self.events.append(("on", int(self.ids[i]), tuple(int(v) for v in self.boxes[i]), float(self.conf[i])))
+        for i in np.flatnonzero(falling & self.on):
+            self.events.append(("off", int(self.ids[i]), tuple(int(v) for v in self.boxes[i]), float(self.conf[i])))
+        self._keep(~falling)
+
+        # boxes that belong to no incident open new ones
+        new = owner < 0
+        n = int(new.sum())
+        if n:
+            self.ids = np.concatenate((self.ids, np.arange(self._next_id, self._next_id + n)))
+            self._next_id += n
+            self.boxes = np.concatenate((self.boxes, boxes[new]))
+            self.conf = np.concatenate((self.conf, confs[new]))
+            self.since = np.concatenate((self.since, np.full(n, t)))
+            self.last_seen = np.concatenate((self.last_seen, np.full(n, t)))
+            self.on = np.concatenate((self.on, np.full(n, self.rise_s <= 0)))
+            for i in np.flatnonzero(self.on[-n:]) + len(self.ids) - n:
+                self.events.append(("on", int(self.ids[i]), tuple(int(v) for v in self.boxes[i]),
+                                    float(self.conf[i])))
+            if len(self.ids) > self.max_incidents:
+                # drop the weakest candidates that are not on yet
+                order = np.lexsort((self.conf, self.on))[::-1][:self.max_incidents]
+                keep = np.zeros(len(self.ids), dtype=bool)
+                keep[order] = True
+                self._keep(keep)
+
+        if not self.on.any():
+            return False, None, 0.0
+        best = int(np.flatnonzero(self.on)[np.argmax(self.conf[self.on])])
+        return True, tuple(int(v) for v in self.boxes[best]), float(self.conf[best])
+
+    def _merge(self):
+        """Fold incidents covering the same spot into the older one (rows are in id order)."""
+        if len(self.ids) < 2:
+            return
+        iou = iou_matrix(self.boxes, self.boxes)
+        ioa = ioa_matrix(self.boxes, self.boxes)
+        same = (iou >= self.iou_match) | (ioa >= self.part_min) | (ioa.T >= self.part_min)
+        same = np.triu(same, k=1)
+        if not same.any():
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        for i, j in np.argwhere(same).tolist():
+            if not (keep[i] and keep[j]):
+                continue
+            if self.last_seen[j] > self.last_seen[i]:  # the newer one holds the current box
+                self.boxes[i], self.conf[i] = self.boxes[j], self.conf[j]
+            self.since[i] = min(self.since[i], self.since[j])
+            self.last_seen[i] = max(self.last_seen[i], self.last_seen[j])
+            if self.on[j] and not self.on[i]:
+                self.ids[i] = self.ids[j]  # keep the id that was announced
+            self.on[i] |= self.on[j]
+            keep[j] = False
+        self._keep(keep)
+
+    def _keep(self, mask):
+        self.ids, self.boxes, self.conf = self.ids[mask], self.boxes[mask], self.conf[mask]
+        self.since, self.last_seen, self.on = self.since[mask], self.last_seen[mask], self.on[mask]
+
+
+def draw_incidents(ov, smoother, color=(0, 0, 255)):
+    """Red box + '#id conf' on a render.Overlay for every incident that is on."""
+    for iid, (x1, y1, x2, y2), conf in smoother.active():
+        ov.rectangle((x1, y1), (x2, y2), color, 3)
+        ov.text(f"#{iid} {conf:.2f}", (x1, max(0, y2 + 20)), 0.7, color, 2)
+
+
+def banner_text(smoother, best_conf):
+    n = int(smoother.on.sum())
+    return f"ACCIDENT DETECTED ({best_conf:.2f})" + (f" x{n}" if n > 1 else "")
+
+
+def add_smoother_args(ap):
+    ap.add_argument("--rise-ms", type=float, default=80.0,
+                    help="an incident must be seen in every frame for this long before ACCIDENT lights up")
+    ap.add_argument("--fall-ms", type=float, default=240.0,
+                    help="ACCIDENT clears after no matching box for this long")
+
+
+def make_smoother(args):
+    return AccidentSmoother(rise_ms=args.rise_ms, fall_ms=args.fall_ms)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+backends.py
+
+Pluggable CPU inference backend for the YOLO models.
+- torch    : plain ultralytics YOLO(.pt) (default, same as before)
+- onnx     : .pt exported to ONNX, run through ONNX Runtime
+- openvino : .pt exported to OpenVINO IR, run through the OpenVINO CPU plugin
+
+Exports happen once and are cached under --export-cache keyed by
+<weights stem>_<sha1 of the weights>_<imgsz>, so retraining or changing
+--imgsz produces a new artifact instead of silently reusing a stale one.
+
+The exported model is loaded back through ultralytics YOLO(), so predict()
+and track() still return the same Results/Boxes objects the post-processing
+code expects. Thread counts are tuned after a warm-up call by rebuilding the
+ONNX Runtime session / recompiling the OpenVINO model with the requested
+intra-op thread count.
+"""
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ("torch", "onnx", "openvino")
+_EXPORT_FORMATS = {"onnx": "onnx", "openvino": "openvino"}
+
+
+def file_sha1(path, chunk=1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def export_cached(weights: str, backend: str, imgsz: int, cache_dir: str = "export_cache") -> str:
+    """Path of the exported artifact for (weights, backend, imgsz), exporting on first use."""
+    src_model = None
+    if not os.path.exists(weights):
+        # hub names like "yolov8s.pt" are downloaded by ultralytics on first load
+        src_model = YOLO(weights)
+        weights = str(getattr(src_model, "ckpt_path", None) or weights)
+
+    key = f"{Path(weights).stem}_{file_sha1(weights)[:12]}_{imgsz}"
+    suffix = ".onnx" if backend == "onnx" else "_openvino_model"
+    target = Path(cache_dir) / f"{key}{suffix}"
+    if target.exists():
+        return str(target)
+
+    print(f"📦 Exporting {weights} -> {backend} (imgsz={imgsz}), first use only...")
+    if src_model is None:
+        src_model = YOLO(weights)
+    exported = src_model.export(format=_EXPORT_FORMATS[backend], imgsz=imgsz,
+                                dynamic=False, simplify=True, verbose=False)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), str(target))
+    print(f"📦 Cached: {target}")
+    return str(target)
+
+
+def _tune_threads(model, backend, threads):
+    """Rebuild the runtime session with `threads` intra-op threads. Best effort."""
+    backend_obj = getattr(getattr(model, "predictor", None), "model", None)
+    if backend_obj is None:
+        return False
+    try:
+        if backend == "onnx" and hasattr(backend_obj, "session"):
+            import onnxruntime as ort
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+            opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            path = str(model.ckpt_path or model.model_name)
+            backend_obj.session = ort.InferenceSession(path, sess_options=opts,
+                                                       providers=["CPUExecutionProvider"])
+            return True
+        if backend == "openvino" and hasattr(backend_obj, "ov_compiled_model"):
+            import openvino as ov
+            core = ov.Core()
+            xml = next(Path(str(model.ckpt_path or model.model_name)).glob("*.xml"))
+            backend_obj.ov_compiled_model = core.compile_model(
+                core.read_model(xml), "CPU",
+                config={"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": threads},
+            )
+            return True
+    except Exception as e:
+        print(f"⚠️ Could not set {backend} threads: {e}")
+    return False
+
+
+def load_model(weights: str, backend: str = "torch", imgsz: int = 640,
+               threads: int = 0, cache_dir: str = "export_cache"):
+    """
+    YOLO model on the requested backend. threads=0 keeps the runtime default.
+    Non-torch models get a warm-up predict() so the first real frame isn't slow.
+    Weights that are already exported (.onnx, OpenVINO dir) are loaded directly.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {backend}")
+
+    if os.path.isdir(weights) or Path(weights).suffix.lower() in (".onnx", ".xml", ".engine"):
+        # already exported (e.g. the INT8 model from quantize_accident.py): load as-is
+        model = YOLO(weights, task="detect")
+        model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        return model
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return YOLO(weights)
+
+    model = YOLO(export_cached(weights, backend, imgsz, cache_dir), task="detect")
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    if threads and _tune_threads(model, backend, threads):
+        print(f"⚙️ {backend}: {threads} intra-op threads")
+    return model
+
+
+def add_backend_args(ap):
+    ap.add_argument("--backend", choices=BACKENDS, default="torch",
+                    help="inference runtime (onnx/openvino export once and cache)")
+    ap.add_argument("--backend-threads", type=int, default=0,
+                    help="intra-op threads for the backend (0 = runtime default)")
+    ap.add_argument("--export-cache", type=str, default="export_cache",
+                    help="directory for exported ONNX / OpenVINO models")
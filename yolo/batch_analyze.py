@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+batch_analyze.py
+
+Fast offline analysis of recorded video (dashcam review after an incident).
+
+- the file is split into frame ranges [start, end); each range is handed to a
+  worker process together with `--overlap` frames before it
+- workers run batched predict() (no display pacing, --batch frames per call)
+  and a ByteTrack/BoT-SORT (or --tracker builtin) tracker over their own frames
+- the parent takes chunk results in order as they arrive (at most
+  2 x --workers chunks in flight) and stitches each one to the previous:
+  local track IDs of chunk k are mapped to global IDs by IoU-voting against
+  chunk k-1 inside the overlap frames, then crossings / zone levels /
+  per-incident accident on-off are evaluated over the stitched tracks, so
+  counts don't restart at chunk boundaries, and the chunk's lines are
+  written out before the next one is taken
+- output: one JSON line per frame (detections + events) and a summary line
+  (wait_seconds = time the parent sat blocked on workers, out of seconds)
+
+    python batch_analyze.py --source dashcam.mp4 --workers 8 --out dashcam.jsonl \
+        --accident-weights accident/v1/weights/best.pt
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from accident_smoother import add_smoother_args, iou_matrix, make_smoother
+from counting import LineCounter, add_counting_args, parse_count_lines
+from detections import Detections, class_lut
+from sort_tracker import add_sort_args, is_builtin, make_tracker
+from zones import add_zone_args, make_zones
+from vehicles import VEHICLE_CLASS_IDS, vehicle_class_map
+
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm"}
+_W = {}  # per-worker globals (models are loaded once per process)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Offline multi-process video analysis")
+    ap.add_argument("--source", required=True, help="video file")
+    ap.add_argument("--out", default="", help="JSON-lines output (default: <source>.analysis.jsonl)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--chunk", type=int, default=600, help="frames per chunk")
+    ap.add_argument("--overlap", type=int, default=30, help="extra frames before each chunk for tracker warm-up/stitching")
+    ap.add_argument("--batch", type=int, default=8, help="frames per predict() call")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--traffic-model", default="yolov8s.pt")
+    ap.add_argument("--traffic-conf", type=float, default=0.35)
+    ap.add_argument("--tracker", default="bytetrack.yaml", help="ultralytics tracker config or 'builtin'")
+    add_sort_args(ap)
+    ap.add_argument("--accident-weights", default="", help="optional accident model")
+    ap.add_argument("--accident-conf", type=float, default=0.35)
+    add_smoother_args(ap)
+    ap.add_argument("--line", type=str, default="0.15,0.80,0.85,0.80")
+    ap.add_argument("--roi", type=str, default="0.25,0.35,0.75,0.95")
+    add_counting_args(ap)
+    add_zone_args(ap)
+    ap.add_argument("--threads-per-worker", type=int, default=1)
+    return ap.parse_args()
+
+
+def is_video(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTS
+
+
+# ------------------- WORKER -------------------
+
+def _init_worker(args):
+    import torch
+    from ultralytics import YOLO
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    torch.set_num_threads(args.threads_per_worker)
+    _W["args"] = args
+    _W["traffic"] = YOLO(args.traffic_model)
+    _W["accident"] = YOLO(args.accident_weights) if args.accident_weights else None
+    if not is_builtin(args.tracker):
+        _W["tracker_cfg"] = IterableSimpleNamespace(**yaml_load(check_yaml(args.tracker)))
+
+
+def _make_tracker(fps):
+    if is_builtin(_W["args"].tracker):
+        return make_tracker(_W["args"])
+    from ultralytics.trackers.bot_sort import BOTSORT
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    cfg = _W["tracker_cfg"]
+    cls = BOTSORT if cfg.tracker_type == "botsort" else BYTETracker
+    return cls(args=cfg, frame_rate=int(round(fps)))
+
+
+def _process_chunk(job):
+    """Detect + track frames [lo, end). Returns per-frame arrays with chunk-local track IDs."""
+    lo, end = job
+    args = _W["args"]
+    cap = cv2.VideoCapture(args.source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, lo)
+    tracker = _make_tracker(fps)
+
+    out = []
+    idx = lo
+    while idx < end:
+        frames = []
+        while len(frames) < args.batch and idx + len(frames) < end:
+            ok, f = cap.read()
+            if not ok:
+                break
+            frames.append(f)
+        if not frames:
+            break
+
+        conf = min(args.traffic_conf, args.track_low) if is_builtin(args.tracker) else args.traffic_conf
+        tr = _W["traffic"].predict(frames, imgsz=args.imgsz, conf=conf,
+                                   classes=VEHICLE_CLASS_IDS, verbose=False)
+        ac = (_W["accident"].predict(frames, imgsz=args.imgsz, conf=args.accident_conf, verbose=False)
+              if _W["accident"] is not None else [None] * len(frames))
+
+        for f, r, a in zip(frames, tr, ac):
+            if is_builtin(args.tracker):
+                trk = tracker.update(Detections.from_results(r), idx / fps)
+                rec = {"frame": idx, "xyxy": trk.xyxy, "id": trk.track_id, "conf": trk.conf, "cls": trk.cls}
+            else:
+                det = r.boxes.cpu().numpy()
+                tracks = tracker.update(det, f) if len(det) else np.empty((0, 8))
+                tracks = np.asarray(tracks, dtype=np.float32).reshape(-1, 8)
+                rec = {
+                    "frame": idx,
+                    "xyxy": tracks[:, :4],
+                    "id": tracks[:, 4].astype(np.int64),
+                    "conf": tracks[:, 5],
+                    "cls": tracks[:, 6].astype(np.int64),
+                }
+            if a is not None and a.boxes is not None and len(a.boxes):
+                rec["acc_xyxy"] = a.boxes.xyxy.cpu().numpy()
+                rec["acc_conf"] = a.boxes.conf.cpu().numpy()
+                rec["acc_cls"] = a.boxes.cls.cpu().numpy().astype(np.int64)
+            out.append(rec)
+            idx += 1
+        if len(frames) < args.batch and idx < end:
+            break  # short read: end of file
+    cap.release()
+    return lo, out
+
+
+def ordered_results(pool, fn, jobs, ahead):
+    """
+    Iterator over fn(job) results in job order (like Pool.imap). The first
+    `ahead` jobs are submitted right away; after that one more is submitted
+    per result taken, so finished-but-unconsumed chunks stay bounded.
+    """
+    jobs = iter(jobs)
+    pending = deque(pool.submit(fn, job) for _, job in zip(range(max(1, ahead)), jobs))
+
+    def results():
+        while pending:
+            res = pending.popleft().result()
+            for job in jobs:
+                pending.append(pool.submit(fn, job))
+                break
+            yield res
+    return results()
+
+
+# ------------------- STITCHING -------------------
+
+def stitch_ids(prev_frames, cur_frames, id_map_prev, min_iou=0.5):
+    """
+    local->global ID mapping for the chunk that produced cur_frames.
+    prev_frames / cur_frames: records of the same frames from the previous
+    chunk (authoritative) and the current chunk (overlap warm-up).
+    id_map_prev: local->global mapping of the previous chunk.
+    Each overlap frame votes for (local, global) pairs via greedy IoU matching;
+    pairs are then assigned one-to-one by vote count.
+    """
+    votes = Counter()
+    for p, c in zip(prev_frames, cur_frames):
+        ious = iou_matrix(c["xyxy"], p["xyxy"])
+        while ious.size and ious.max() >= min_iou:
+            i, j = np.unravel_index(int(ious.argmax()), ious.shape)
+            votes[(int(c["id"][i]), id_map_prev[int(p["id"][j])])] += 1
+            ious[i, :] = -1
+            ious[:, j] = -1
+
+    mapping, used = {}, set()
+    for (local, glob), _ in votes.most_common():
+        if local in mapping or glob in used:
+            continue
+        mapping[local] = glob
+        used.add(glob)
+    return mapping
+
+
+class ChunkAnalysis:
+    """
+    The parent's sequential pass. add_chunk() takes chunk results in chunk
+    order, maps their local track IDs to global ones (stitch_ids against the
+    previous chunk's overlap frames) and evaluates crossings / zone levels /
+    accidents over the stitched tracks -> one output dict per owned frame.
+    """
+
+    def __init__(self, fps, counter, zones, traffic_names, smoother=None, acc_names=None, acc_ids=()):
+        self.fps = fps
+        self.counter = counter
+        self.zones = zones
+        self.traffic_names = traffic_names
+        self.vehicle_lut = class_lut(traffic_names)
+        self.smoother = smoother
+        self.acc_names = acc_names or {}
+        self.acc_ids = set(acc_ids)
+        self.level = None  # level of the most congested zone
+        self.n_events = Counter()
+        self.next_id = 1
+        self._prev_owned = []  # records of the previous chunk (for overlap matching)
+        self._prev_map = {}    # previous chunk local id -> global id
+
+    @property
+    def tracks(self):
+        return self.next_id - 1
+
+    def add_chunk(self, start, recs):
+        """Records of the chunk owning frames >= start (earlier ones are its overlap) -> output dicts."""
+        overlap = [r for r in recs if r["frame"] < start]
+        owned = [r for r in recs if r["frame"] >= start]
+
+        mapping = {}
+        if overlap and self._prev_owned:
+            by_frame = {r["frame"]: r for r in self._prev_owned}
+            pairs = [(by_frame[r["frame"]], r) for r in overlap if r["frame"] in by_frame]
+            if pairs:
+                mapping = stitch_ids([p for p, _ in pairs], [c for _, c in pairs], self._prev_map)
+
+        out = [self._frame(rec, mapping) for rec in owned]
+        self._prev_owned, self._prev_map = owned, mapping
+        return out
+
+    def _frame(self, rec, mapping):
+        gids = []
+        for lid in rec["id"].tolist():
+            if lid not in mapping:
+                mapping[lid] = self.next_id
+                self.next_id += 1
+            gids.append(mapping[lid])
+
+        i = rec["frame"]
+        t = i / self.fps
+        names = self.traffic_names
+        veh = Detections(rec["xyxy"], rec["conf"], rec["cls"], gids).filter_classes(self.vehicle_lut)
+        dets = [{"id": gid, "cls": names[c], "conf": round(p, 3), "xyxy": [round(v, 1) for v in box]}
+                for box, gid, c, p in zip(veh.xyxy.tolist(), veh.track_id.tolist(),
+                                          veh.cls.tolist(), veh.conf.tolist())]
+        self.zones.update(veh, t)
+        new_level, density = self.zones.worst()
+        self.counter.update(veh, i, t)
+        events = [{"type": "crossing", "id": gid, "line": line, "direction": d, "cls": names.get(c, str(c))}
+                  for gid, line, d, c in self.counter.events]
+
+        if new_level != self.level:
+            events.append({"type": "traffic_level", "level": new_level, "density": density})
+            self.level = new_level
+
+        acc = []
+        if "acc_xyxy" in rec:
+            for (x1, y1, x2, y2), c, p in zip(rec["acc_xyxy"], rec["acc_cls"], rec["acc_conf"]):
+                if int(c) in self.acc_ids:
+                    acc.append({"cls": str(self.acc_names.get(int(c), c)), "conf": round(float(p), 3),
+                                "xyxy": [round(float(v), 1) for v in (x1, y1, x2, y2)]})
+        if self.smoother is not None:
+            self.smoother.update([a["xyxy"] for a in acc], [a["conf"] for a in acc], t)
+            events.extend({"type": f"accident_{kind}", "incident": iid, "conf": round(p, 3), "xyxy": list(box)}
+                          for kind, iid, box, p in self.smoother.events)
+
+        for e in events:
+            self.n_events[e["type"]] += 1
+        return {
+            "frame": i,
+            "t": round(t, 3),
+            "vehicles": dets,
+            "accidents": acc,
+            "density": density,
+            "zones": self.zones.summary(),
+            "crossings": self.counter.total,
+            "events": events,
+        }
+
+
+def main():
+    args = parse_args()
+    if not is_video(args.source):
+        print(f"❌ Offline analysis needs a video file, got: {args.source}")
+        return
+    out_path = args.out or os.path.splitext(args.source)[0] + ".analysis.jsonl"
+
+    cap = cv2.VideoCapture(args.source)
+    if not cap.isOpened():
+        print(f"❌ Cannot open {args.source}")
+        return
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
+    cap.release()
+
+    starts = list(range(0, total, args.chunk))
+    jobs = [(max(0, s - args.overlap), min(total, s + args.chunk)) for s in starts]
+    print(f"📼 {total} frames @ {fps:.1f} FPS -> {len(jobs)} chunks on {args.workers} workers")
+
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args,)) as pool, open(out_path, "w") as fout:
+        results = ordered_results(pool, _process_chunk, jobs, ahead=2 * args.workers)
+
+        # --- names for output (workers are already busy on the first chunks) ---
+        from ultralytics import YOLO
+        traffic_names = vehicle_class_map(YOLO(args.traffic_model).names)
+        acc_names, acc_ids = {}, set()
+        if args.accident_weights:
+            acc_names = YOLO(args.accident_weights).names
+            acc_ids = {int(i) for i, n in acc_names.items()
+                       if any(k in str(n).lower() for k in ("accident", "collision", "fire", "smoke"))} or {0}
+
+        # --- sequential pass, one stitched chunk at a time ---
+        counter = LineCounter(parse_count_lines(args.count_lines, W, H, default_line=args.line),
+                              traffic_names, args.count_cooldown_ms)
+        analysis = ChunkAnalysis(fps, counter, make_zones(args, W, H), traffic_names,
+                                 make_smoother(args) if args.accident_weights else None, acc_names, acc_ids)
+        t_wait = 0.0  # parent blocked on the workers (the rest of the time it stitches / writes)
+        t = time.time()
+        for s, (lo, recs) in zip(starts, results):
+            t_wait += time.time() - t
+            for line in analysis.add_chunk(s, recs):
+                fout.write(json.dumps(line) + "\n")
+            t = time.time()
+
+        summary = {
+            "summary": True,
+            "source": args.source,
+            "frames": total,
+            "fps": fps,
+            "chunks": len(jobs),
+            "workers": args.workers,
+            "crossings": counter.total,
+            "counts": counter.summary(),
+            "tracks": analysis.tracks,
+            "events": dict(analysis.n_events),
+            "wait_seconds": round(t_wait, 1),
+            "seconds": round(time.time() - t0, 1),
+        }
+        fout.write(json.dumps(summary) + "\n")
+
+    dt = time.time() - t0
+    print(f"✅ Analysed {total} frames in {dt:.1f}s ({total / max(dt, 1e-6):.1f} FPS, "
+          f"{total / fps / max(dt, 1e-6):.1f}x real time)")
+    print(f"   crossings={counter.total} tracks={analysis.tracks} events={dict(analysis.n_events)} "
+          f"(waited {t_wait:.1f}s on the workers)")
+    print(f"💾 {out_path}")
+
+
+if __name__ == "__main__":
+    main()
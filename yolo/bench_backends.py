@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+bench_backends.py
+
+predict() latency per backend (torch / onnx / openvino) on the same video,
+plus mean boxes per frame as a quick sanity check that the exported model
+still detects the same things.
+
+    python bench_backends.py --weights accident/v1/weights/best.pt --threads 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backends import BACKENDS, load_model
+from capture import open_source
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("YOLO backend latency comparison")
+    ap.add_argument("--weights", default="accident/v1/weights/best.pt")
+    ap.add_argument("--source", default="head_on_collision_2.mp4")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.35)
+    ap.add_argument("--backends", type=str, default=",".join(BACKENDS))
+    ap.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = runtime default)")
+    ap.add_argument("--frames", type=int, default=100)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--export-cache", type=str, default="export_cache")
+    return ap.parse_args()
+
+
+def bench(args, backend):
+    try:
+        model = load_model(args.weights, backend, args.imgsz, args.threads, args.export_cache)
+    except Exception as e:
+        print(f"⚠️ {backend}: unavailable ({e})")
+        return None
+
+    cap, _ = open_source(args.source, mode="lossless")
+    lat, boxes = [], []
+    n = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok or n >= args.frames + args.warmup:
+            break
+        t = time.perf_counter()
+        res = model.predict(frame, imgsz=args.imgsz, conf=args.conf, verbose=False)
+        dt = (time.perf_counter() - t) * 1000.0
+        if n >= args.warmup:
+            lat.append(dt)
+            boxes.append(len(res[0].boxes) if res and res[0].boxes is not None else 0)
+        n += 1
+    cap.release()
+
+    lat = np.asarray(lat)
+    return {
+        "backend": backend,
+        "mean": lat.mean(),
+        "p50": np.percentile(lat, 50),
+        "p95": np.percentile(lat, 95),
+        "fps": 1000.0 / lat.mean(),
+        "boxes": float(np.mean(boxes)) if boxes else 0.0,
+    }
+
+
+def main():
+    args = parse_args()
+    rows = [r for r in (bench(args, b.strip()) for b in args.backends.split(",")) if r]
+    if not rows:
+        return
+    base = next((r["mean"] for r in rows if r["backend"] == "torch"), rows[0]["mean"])
+
+    print()
+    print(f"{'backend':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'FPS':>8}{'speedup':>9}{'boxes/frame':>13}")
+    for r in rows:
+        print(f"{r['backend']:<10}{r['mean']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+              f"{r['fps']:>8.1f}{base / r['mean']:>8.2f}x{r['boxes']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+bench_detections.py
+
+Micro-benchmark of traffic post-processing per frame (class filter, ROI
+density, centroid + line crossing; no drawing): the old per-box Python loop
+vs the Detections / LineCounter whole-array version, on synthetic tracks
+moving down across the count line. Crossings must match; the ROI counts
+differ slightly because the old loop truncated boxes to int pixels.
+
+    python bench_detections.py --boxes 5,50,200 --frames 2000
+"""
+
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from counting import LineCounter
+from detections import Detections, class_lut
+from vehicles import VEHICLE_CLASS_IDS
+
+W, H = 1280, 720
+ROI = (320, 252, 960, 684)
+COUNT_Y = 576
+FPS = 25.0  # synthetic capture rate (cooldown 200 ms = 5 frames)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Per-box loop vs vectorized post-processing")
+    ap.add_argument("--boxes", type=str, default="5,50,200")
+    ap.add_argument("--frames", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    return ap.parse_args()
+
+
+def synth_frames(n_boxes, n_frames, rng):
+    """Per-frame (xyxy, conf, cls, ids) for n_boxes tracks drifting downwards."""
+    x = rng.uniform(0, W - 80, n_boxes)
+    y = rng.uniform(0, H - 60, n_boxes)
+    vy = rng.uniform(2, 12, n_boxes)
+    cls = rng.choice(VEHICLE_CLASS_IDS + [0, 9], n_boxes)  # a few non-vehicles to filter out
+    ids = np.arange(n_boxes)
+    out = []
+    for _ in range(n_frames):
+        y = (y + vy) % (H - 60)
+        xyxy = np.stack((x, y, x + 80, y + 60), axis=1).astype(np.float32)
+        out.append((xyxy, rng.uniform(0.3, 1.0, n_boxes).astype(np.float32), cls, ids))
+    return out
+
+
+def run_loop(frames, names):
+    """Post-processing as in the original scripts (minus drawing)."""
+    prev_cy = {}
+    cooldown = 5
+    last_count_frame = defaultdict(lambda: -cooldown)  # never counted = no cooldown (as LineCounter)
+    total = in_roi = 0
+    t = time.perf_counter()
+    for i, (xyxy, conf, cls, ids) in enumerate(frames, 1):
+        for (x1, y1, x2, y2), c, tid in zip(xyxy, cls, ids):
+            label = names.get(int(c))
+            if label is None:
+                continue
+            x1i, y1i, x2i, y2i = map(int, (x1, y1, x2, y2))
+            ix1, iy1 = max(x1i, ROI[0]), max(y1i, ROI[1])
+            ix2, iy2 = min(x2i, ROI[2]), min(y2i, ROI[3])
+            if (ix2 > ix1) and (iy2 > iy1):
+                in_roi += 1
+            cy = int((y1 + y2) / 2)
+            pcy = prev_cy.get(tid, None)
+            prev_cy[tid] = cy
+            if pcy is None:
+                continue
+            if (pcy < COUNT_Y <= cy) or (pcy > COUNT_Y >= cy):
+                if i - last_count_frame[tid] >= cooldown:
+                    total += 1
+                    last_count_frame[tid] = i
+    return (time.perf_counter() - t) * 1e6 / len(frames), total, in_roi
+
+
+def run_vectorized(frames, names):
+    counter = LineCounter([("line", (0, COUNT_Y, W, COUNT_Y), ("in", "out"))], names, cooldown_ms=200)
+    lut = class_lut(names)
+    total = in_roi = 0
+    t = time.perf_counter()
+    for i, (xyxy, conf, cls, ids) in enumerate(frames, 1):
+        veh = Detections(xyxy, conf, cls, ids).filter_classes(lut)
+        in_roi += int(veh.intersects(ROI).sum())
+        total += counter.update(veh, i, i / FPS)
+    return (time.perf_counter() - t) * 1e6 / len(frames), total, in_roi
+
+
+def main():
+    args = parse_args()
+    names = {1: "bicycle", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'boxes':>6}{'loop us/frame':>16}{'vector us/frame':>18}{'speedup':>9}{'crossings':>14}{'in ROI':>16}")
+    for n in (int(v) for v in args.boxes.split(",")):
+        frames = synth_frames(n, args.frames, rng)
+        us_loop, c_loop, r_loop = run_loop(frames, names)
+        us_vec, c_vec, r_vec = run_vectorized(frames, names)
+        print(f"{n:>6}{us_loop:>16.1f}{us_vec:>18.1f}{us_loop / us_vec:>8.2f}x{c_loop:>7} / {c_vec:<6}"
+              f"{r_loop:>7} / {r_vec}")
+
+
+if __name__ == "__main__":
+    main()
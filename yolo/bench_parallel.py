@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+bench_parallel.py
+
+Per-frame latency of accident predict() + traffic track(): serial vs parallel
+on the same video.
+
+    python bench_parallel.py --source head_on_collision_2.mp4 \
+        --accident-weights accident/v1/weights/best.pt --traffic-model yolov8s.pt
+"""
+
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+from ultralytics import YOLO
+
+from capture import open_source
+from parallel_infer import SerialInference, ParallelInference
+
+VEHICLE_CLASS_IDS = [1, 2, 3, 5, 7]
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Serial vs parallel model latency")
+    ap.add_argument("--source", default="head_on_collision_2.mp4")
+    ap.add_argument("--accident-weights", default="accident/v1/weights/best.pt")
+    ap.add_argument("--traffic-model", default="yolov8s.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--tracker", default="botsort.yaml")
+    ap.add_argument("--frames", type=int, default=120, help="frames per run (0 = whole file)")
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--threads-per-model", type=int, default=0)
+    return ap.parse_args()
+
+
+def run(args, runner, label):
+    # fresh models per run so tracker state and caches don't leak between modes
+    accident_model = YOLO(args.accident_weights)
+    traffic_model = YOLO(args.traffic_model)
+    cap, _ = open_source(args.source, mode="lossless")
+
+    lat = []
+    n = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok or (args.frames and n >= args.frames + args.warmup):
+            break
+        acc_job = partial(accident_model.predict, frame, imgsz=args.imgsz, verbose=False)
+        trk_job = partial(traffic_model.track, frame, imgsz=args.imgsz, tracker=args.tracker,
+                          persist=True, classes=VEHICLE_CLASS_IDS, verbose=False)
+        t = time.perf_counter()
+        runner.run(acc_job, trk_job)
+        dt = (time.perf_counter() - t) * 1000.0
+        if n >= args.warmup:
+            lat.append(dt)
+        n += 1
+    cap.release()
+    runner.shutdown()
+
+    lat = np.asarray(lat)
+    return {
+        "mode": label,
+        "frames": len(lat),
+        "mean": lat.mean(),
+        "p50": np.percentile(lat, 50),
+        "p95": np.percentile(lat, 95),
+        "fps": 1000.0 / lat.mean(),
+    }
+
+
+def main():
+    args = parse_args()
+    rows = [
+        run(args, SerialInference(), "serial"),
+        run(args, ParallelInference(threads_per_worker=args.threads_per_model or None), "parallel"),
+    ]
+
+    print()
+    print(f"{'mode':<10}{'frames':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'FPS':>8}")
+    for r in rows:
+        print(f"{r['mode']:<10}{r['frames']:>8}{r['mean']:>10.1f}{r['p50']:>10.1f}"
+              f"{r['p95']:>10.1f}{r['fps']:>8.1f}")
+    print(f"\nSpeedup (mean): {rows[0]['mean'] / rows[1]['mean']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,30 @@
 #!/usr/bin/env python3
 import argparse, os, time
-from collections import defaultdict
-from typing import List, Tuple
+from functools import partial
 
 import cv2
-import numpy as np
-from ultralytics import YOLO
+
+from accident_smoother import add_smoother_args, banner_text, draw_incidents, make_smoother
+from backends import load_model, add_backend_args
+from counting import (LineCounter, add_counting_args, draw_lines, lines_extent,
+                      parse_count_lines, print_count_summary)
+from detections import Detections, class_lut
+from zones import LEVEL_COLORS, add_zone_args, draw_zones, make_zones
+from capture import open_source, add_capture_args, print_capture_stats
+from recorder import add_recorder_args
+from render import add_render_args, make_renderer, print_render_stats
+from motion_gate import GATE_FULL, GATE_REUSE, add_gate_args, make_gate, print_gate_stats
+from parallel_infer import add_parallel_args, make_inference
+from track_store import add_track_store_args, make_track_store, print_track_stats
+from sort_tracker import add_sort_args, make_tracker, print_tracker_stats
+from roi_crop import crop_region, crop_view, shift_results, add_crop_args
+from vehicles import TRAFFIC_SOURCES, VEHICLE_CLASS_IDS, vehicle_class_map
 
 VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm"}
-VEHICLE_NAMES = {"car", "bus", "truck", "motorcycle", "bicycle"}
-VEHICLE_CLASS_IDS = [1, 2, 3, 5, 7]  # COCO: bicycle=1, car=2, motorcycle=3, bus=5, truck=7
 
 def is_video(path: str) -> bool:
     return os.path.splitext(path)[1].lower() in VIDEO_EXTS
 
-def safe_imshow(title, frame):
-    try:
-        cv2.imshow(title, frame); return True
-    except cv2.error:
-        return False
-
-def iou_xyxy(a, b) -> float:
-    ax1, ay1, ax2, ay2 = a
-    bx1, by1, bx2, by2 = b
-    ix1, iy1 = max(ax1, bx1), max(ay1, by1)
-    ix2, iy2 = min(ax2, bx2), min(ay2, by2)
-    iw, ih = max(0, ix2 - ix1), max(0, iy2 - iy1)
-    inter = iw * ih
-    if inter <= 0: return 0.0
-    area_a = max(0, ax2 - ax1) * max(0, ay2 - ay1)
-    area_b = max(0, bx2 - bx1) * max(0, by2 - by1)
-    return inter / max(area_a + area_b - inter, 1e-6)
-
-class AccidentSmoother:
-    """
-    - 'on' if an accident-class box appears for >= rise_frames
-    - 'off' when no accident boxes for >= fall_frames
-    - maintains a persistent best_box using IoU + confidence
-    """
-    def __init__(self, rise_frames=3, fall_frames=6, iou_match=0.3):
-        self.rise_frames = rise_frames
-        self.fall_frames = fall_frames
-        self.iou_match = iou_match
-        self.acc_count = 0
-        self.noacc_count = 0
-        self.state_on = False
-        self.best_box = None
-        self.best_conf = 0.0
-        self.last_seen_time = 0.0
-
-    def update(self, acc_boxes: List[Tuple[int,int,int,int]], acc_confs: List[float]):
-        now = time.time()
-        if acc_boxes:
-            max_idx = int(np.argmax(acc_confs))
-            cur_box = acc_boxes[max_idx]
-            cur_conf = float(acc_confs[max_idx])
-            if self.best_box is None or iou_xyxy(self.best_box, cur_box) < self.iou_match or cur_conf > self.best_conf:
-                self.best_box = cur_box
-                self.best_conf = cur_conf
-            self.acc_count += 1
-            self.noacc_count = 0
-            self.last_seen_time = now
-            if not self.state_on and self.acc_count >= self.rise_frames:
-                self.state_on = True
-        else:
-            self.acc_count = 0
-            self.noacc_count += 1
-            if self.state_on and self.noacc_count >= self.fall_frames:
-                self.state_on = False
-                self.best_box = None
-                self.best_conf = 0.0
-        return self.state_on, self.best_box, self.best_conf
-
-def norm_to_abs(rect_str, W, H):
-    x1, y1, x2, y2 = [float(v) for v in rect_str.split(",")]
-    return int(x1 * W), int(y1 * H), int(x2 * W), int(y2 * H)
-
-def intersect(a, b):
-    ax1, ay1, ax2, ay2 = a
-    bx1, by1, bx2, by2 = b
-    ix1, iy1 = max(ax1, bx1), max(ay1, by1)
-    ix2, iy2 = min(ax2, bx2), min(ay2, by2)
-    return (ix2 > ix1) and (iy2 > iy1)
-
-def open_capture(src_str: str):
-    use_cam = src_str.isdigit() and not os.path.exists(src_str)
-    if use_cam:
-        cam_idx = int(src_str)
-        cap = cv2.VideoCapture(cam_idx, cv2.CAP_DSHOW)  # Windows-friendly
-        if not cap.isOpened():
-            cap.release()
-            cap = cv2.VideoCapture(cam_idx)  # fallback
-        return cap, True
-    else:
-        return cv2.VideoCapture(src_str), False
-
 def parse_args():
     ap = argparse.ArgumentParser("Road AI: Accident Detection + Traffic Analysis (YOLO)")
     # Common
@@ -104,6 +34,16 @@ def parse_args():
     ap.add_argument("--show-fps", action="store_true", help="overlay live FPS")
     ap.add_argument("--save", type=str, default="", help="optional output mp4 path")
     ap.add_argument("--fps_out", type=int, default=25, help="save FPS")
+    add_capture_args(ap)
+    add_recorder_args(ap)
+    add_render_args(ap)
+    add_gate_args(ap)
+    add_backend_args(ap)
+    add_crop_args(ap)
+    add_track_store_args(ap)
+    add_counting_args(ap)
+    add_zone_args(ap)
+    add_parallel_args(ap)
 
     # Accident
     ap.add_argument("--enable-accident", action="store_true", help="run accident detector")
@@ -113,19 +53,26 @@ def parse_args():
     ap.add_argument("--accident-conf", type=float, default=0.35)
     ap.add_argument("--accident-iou", type=float, default=0.5)
     ap.add_argument("--accident-device", type=str, default=None, help="CUDA id like 0, or cpu")
-    ap.add_argument("--rise-frames", type=int, default=3)
-    ap.add_argument("--fall-frames", type=int, default=6)
+    add_smoother_args(ap)
 
     # Traffic
     ap.add_argument("--enable-traffic", action="store_true", help="run traffic analysis")
     ap.add_argument("--traffic-model", type=str, default="yolov8s.pt", help="YOLOv8 model or path to .pt")
+    ap.add_argument("--traffic-source", choices=TRAFFIC_SOURCES, default="coco",
+                    help="coco = separate --traffic-model, accident = reuse the accident model's vehicle classes")
     ap.add_argument("--traffic-conf", type=float, default=0.35)
     ap.add_argument("--traffic-iou", type=float, default=0.5)
     ap.add_argument("--traffic-device", type=str, default=None, help="CUDA id like 0, or cpu")
-    ap.add_argument("--tracker", default="botsort.yaml")
+    ap.add_argument("--tracker", default="botsort.yaml",
+                    help="ultralytics tracker config, or 'builtin' for the NumPy SORT tracker on predict()")
+    add_sort_args(ap)
     ap.add_argument("--line", type=str, default="0.15,0.80,0.85,0.80", help="count line x1,y1,x2,y2 (normalized 0..1)")
-    ap.add_argument("--roi", type=str, default="0.25,0.35,0.75,0.95", help="density ROI x1,y1,x2,y2 (normalized 0..1)")
-    return ap.parse_args()
+    ap.add_argument("--roi", type=str, default="0.25,0.35,0.75,0.95", help="density ROI x1,y1,x2,y2 (normalized 0..1), used when --zones is not set")
+    args = ap.parse_args()
+    if args.traffic_crop and args.traffic_source == "accident":
+        # the one model must see the whole frame for accidents: there is no traffic-only pass to crop
+        ap.error("--traffic-crop needs a separate traffic model (--traffic-source coco)")
+    return args
 
 def main():
     args = parse_args()
@@ -134,33 +81,29 @@ def main():
         return
 
     # Open source
-    cap, is_cam = open_capture(args.source)
-    if not cap or not cap.isOpened():
+    cap, is_cam = open_source(args.source, mode=args.capture_mode,
+                              buffer_size=args.capture_buffer,
+                              target_size=args.imgsz, reduce=args.stream_reduce)
+    if not cap.isOpened():
         print("❌ Could not open source"); return
-    if is_cam:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH,  1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
     W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
     H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
     in_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
 
-    # Prepare writer
-    writer = None
-    if args.save:
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        writer = cv2.VideoWriter(args.save, fourcc, args.fps_out or in_fps, (W, H))
-        if not writer.isOpened():
-            print("⚠️ Failed to open writer; disabling save.")
-            writer = None
+    # Overlay drawing and writer live on the render thread, the window is updated from this loop (inert when headless)
+    renderer = make_renderer(args, W, H, args.fps_out or in_fps, "Road AI (Accident + Traffic)")
 
     # Models and state
     accident_model = None
     accident_names = {}
     accident_ids = set()
+    accident_lut = class_lut(())
     smoother = None
+    single_model = args.enable_traffic and args.traffic_source == "accident"
 
-    if args.enable_accident:
-        accident_model = YOLO(args.accident_weights)
+    if args.enable_accident or single_model:
+        accident_model = load_model(args.accident_weights, args.backend, args.imgsz,
+                                    args.backend_threads, args.export_cache)
         accident_names = accident_model.names if hasattr(accident_model, "names") else {}
         # Build accident class id set from names
         for i, n in accident_names.items():
@@ -169,27 +112,46 @@ def main():
                 accident_ids.add(int(i))
         if not accident_ids and 0 in accident_names:
             accident_ids.add(0)
-        smoother = AccidentSmoother(rise_frames=args.rise_frames, fall_frames=args.fall_frames)
+        accident_lut = class_lut(accident_ids)
+    if args.enable_accident:
+        smoother = make_smoother(args)
 
     traffic_model = None
-    lx1 = ly1 = lx2 = ly2 = 0
-    rx1 = ry1 = rx2 = ry2 = 0
-    count_y = 0
-    roi_box = (0,0,0,0)
+    count_lines = []  # [(name, (x1, y1, x2, y2), (in, out))]
+    zones = None  # density zones (polygons with per-zone thresholds)
     total_crossings = 0
-    prev_cy = {}  # id -> previous centroid y
-    last_count_frame = defaultdict(int)
-    cooldown = 5  # frames
+    line_counter = None  # previous centroid / last count frame per track ID
+    traffic_vehicle_names = {}  # class id -> vehicle name for whichever model feeds traffic
+    vehicle_lut = class_lut(())
+    acc_track_kwargs = {}
+    tracker = make_tracker(args) if args.enable_traffic else None  # None -> ultralytics tracker in track()
+    trk_kwargs = {} if tracker is not None else {"tracker": args.tracker, "persist": True}
+    tracked = Detections.empty()  # builtin tracker output for the last inferred frame
 
     if args.enable_traffic:
-        traffic_model = YOLO(args.traffic_model)
-        lx1, ly1, lx2, ly2 = norm_to_abs(args.line, W, H)
-        rx1, ry1, rx2, ry2 = norm_to_abs(args.roi, W, H)
-        count_y = ly1
-        roi_box = (rx1, ry1, rx2, ry2)
-
-    print("✅ Running. Press 'q' to quit.")
-    gui = args.display
+        if single_model:
+            traffic_vehicle_names = vehicle_class_map(accident_names)
+            acc_track_kwargs = trk_kwargs
+        else:
+            traffic_model = load_model(args.traffic_model, args.backend, args.imgsz,
+                                       args.backend_threads, args.export_cache)
+            traffic_vehicle_names = vehicle_class_map(traffic_model.names)
+        count_lines = parse_count_lines(args.count_lines, W, H, default_line=args.line)
+        zones = make_zones(args, W, H)
+        vehicle_lut = class_lut(traffic_vehicle_names)
+        line_counter = LineCounter(count_lines, traffic_vehicle_names, args.count_cooldown_ms,
+                                   make_track_store(args))
+
+    crop_box = None  # traffic model input region (None = full frame)
+    if args.enable_traffic and args.traffic_crop and not single_model:
+        crop_box = crop_region(zones.extent(), lines_extent(count_lines), int(args.crop_band * H), W, H)
+        print(f"Traffic crop: {crop_box}")
+
+    gate = make_gate(args)
+    infer = make_inference(args)
+    res = results = None  # last accident / traffic results (reused when the gate skips)
+
+    print("✅ Running. Press 'q' to quit." if renderer.title else "✅ Running headless. Ctrl+C to stop.")
     t0, frames = time.time(), 0
 
     while True:
@@ -197,142 +159,119 @@ def main():
         if not ok:
             break
         frames += 1
-
-        # We will draw everything on 'frame'
-        # Make a copy for each pipeline if you ever want separate outputs.
+        decision = gate.decide(frame) if gate is not None else GATE_FULL
+        ov = renderer.overlay(frames)  # display list for this frame, None = not rendered
+
+        # === Inference (both models see the clean frame; optionally concurrent) ===
+        run_acc = accident_model is not None and (decision == GATE_FULL or res is None)
+        run_trk = traffic_model is not None and (decision != GATE_REUSE or results is None)
+        if single_model:
+            # accident model also feeds the tracker, so it runs whenever tracks need a refresh
+            run_acc = accident_model is not None and (decision != GATE_REUSE or res is None)
+        acc_job = partial(
+            accident_model.track if acc_track_kwargs else accident_model.predict,
+            frame,
+            imgsz=args.imgsz,
+            conf=args.accident_conf,
+            iou=args.accident_iou,
+            device=args.accident_device if args.accident_device is not None else None,
+            verbose=False,
+            **acc_track_kwargs
+        ) if run_acc else None
+        trk_job = partial(
+            traffic_model.track if trk_kwargs else traffic_model.predict,
+            crop_view(frame, crop_box) if crop_box else frame,
+            imgsz=args.imgsz,
+            conf=min(args.traffic_conf, args.track_low) if tracker is not None else args.traffic_conf,
+            iou=args.traffic_iou,
+            classes=VEHICLE_CLASS_IDS,
+            device=args.traffic_device if args.traffic_device is not None else None,
+            verbose=False,
+            **trk_kwargs
+        ) if run_trk else None
+        new_res, new_results = infer.run(acc_job, trk_job)
+        if run_acc:
+            res = new_res
+        if run_trk:
+            results = new_results
+            if crop_box:
+                shift_results(results, crop_box, frame.shape)
+        if single_model and run_acc:
+            results = res
+        if tracker is not None and (run_trk or (single_model and run_acc)):
+            tracked = tracker.update(Detections.from_results(results).filter_classes(vehicle_lut),
+                                     cap.timestamp)
 
         # === Accident detection ===
         if args.enable_accident:
-            res = accident_model.predict(
-                frame,
-                imgsz=args.imgsz,
-                conf=args.accident_conf,
-                iou=args.accident_iou,
-                device=args.accident_device if args.accident_device is not None else None,
-                verbose=False
-            )
-
-            accident_boxes, accident_confs = [], []
-            if res and len(res):
-                r = res[0]
-                if r.boxes is not None and len(r.boxes) > 0:
-                    xyxy = r.boxes.xyxy.cpu().numpy()
-                    cls = r.boxes.cls.cpu().numpy().astype(int)
-                    conf = r.boxes.conf.cpu().numpy()
-                    for (x1, y1, x2, y2), c, p in zip(xyxy, cls, conf):
-                        x1i, y1i, x2i, y2i = map(int, (x1, y1, x2, y2))
-                        label = accident_names.get(int(c), str(c))
-                        is_acc = (int(c) in accident_ids)
-                        color = (0, 0, 255) if is_acc else (0, 200, 0)
-                        cv2.rectangle(frame, (x1i, y1i), (x2i, y2i), color, 2)
-                        cv2.putText(frame, f"{label} {p:.2f}",
-                                    (x1i, max(0, y1i - 6)),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                        if is_acc:
-                            accident_boxes.append((x1i, y1i, x2i, y2i))
-                            accident_confs.append(float(p))
-
-            state_on, best_box, best_conf = smoother.update(accident_boxes, accident_confs)
-            if state_on and best_box is not None:
-                bx1, by1, bx2, by2 = best_box
-                cv2.rectangle(frame, (bx1, by1), (bx2, by2), (0, 0, 255), 3)
-                cv2.putText(frame, f"ACCIDENT DETECTED ({best_conf:.2f})",
-                            (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-            else:
-                cv2.putText(frame, "NO ACCIDENT",
-                            (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 200, 0), 3)
+            acc = Detections.from_results(res)
+            acc_mask = acc.class_mask(accident_lut)
+            if ov is not None:
+                for (x1i, y1i, x2i, y2i), c, p, is_acc in zip(acc.xyxy_int().tolist(), acc.cls.tolist(),
+                                                              acc.conf.tolist(), acc_mask.tolist()):
+                    label = accident_names.get(c, str(c))
+                    color = (0, 0, 255) if is_acc else (0, 200, 0)
+                    ov.rectangle((x1i, y1i), (x2i, y2i), color, 2)
+                    ov.text(f"{label} {p:.2f}", (x1i, max(0, y1i - 6)), 0.6, color, 2)
+            hits = acc[acc_mask]
+            accident_boxes = [tuple(b) for b in hits.xyxy_int().tolist()]
+            accident_confs = hits.conf.tolist()
+
+            state_on, best_box, best_conf = smoother.update(accident_boxes, accident_confs, cap.timestamp)
+            for kind, iid, _, conf in smoother.events:
+                print(f"🚨 Accident #{iid} {kind} ({conf:.2f})")
+            if ov is not None:
+                if state_on and best_box is not None:
+                    draw_incidents(ov, smoother)
+                    ov.text(banner_text(smoother, best_conf), (10, 40), 1.2, (0, 0, 255), 3)
+                else:
+                    ov.text("NO ACCIDENT", (10, 40), 1.2, (0, 200, 0), 3)
 
         # === Traffic analysis (tracking + density + crossing) ===
         if args.enable_traffic:
-            # Draw ROI + count line first (so boxes are on top)
-            cv2.rectangle(frame, (rx1, ry1), (rx2, ry2), (255, 255, 0), 2)
-            cv2.line(frame, (lx1, ly1), (lx2, ly2), (0, 255, 255), 2)
-
-            results = traffic_model.track(
-                frame,
-                imgsz=args.imgsz,
-                conf=args.traffic_conf,
-                iou=args.traffic_iou,
-                tracker=args.tracker,
-                persist=True,
-                classes=VEHICLE_CLASS_IDS,
-                device=args.traffic_device if args.traffic_device is not None else None,
-                verbose=False
-            )
-
-            density = 0
-            if results and getattr(results[0], "boxes", None) is not None:
-                boxes = results[0].boxes
-                xyxy = boxes.xyxy.cpu().numpy() if boxes.xyxy is not None else np.empty((0, 4))
-                cls = boxes.cls.cpu().numpy().astype(int) if boxes.cls is not None else np.empty((0,), dtype=int)
-                ids = (boxes.id.cpu().numpy().astype(int)
-                       if boxes.id is not None else np.full((len(xyxy),), -1, dtype=int))
-                names = results[0].names
-
-                for (x1, y1, x2, y2), c, tid in zip(xyxy, cls, ids):
-                    label = names.get(int(c), str(c)) if isinstance(names, dict) else str(c)
-                    if label not in VEHICLE_NAMES:
-                        continue
-                    x1i, y1i, x2i, y2i = map(int, (x1, y1, x2, y2))
-                    cv2.rectangle(frame, (x1i, y1i), (x2i, y2i), (0, 255, 0), 2)
-                    cv2.putText(frame, f"{label}#{tid}",
-                                (x1i, max(0, y1i - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-                    if intersect((x1i, y1i, x2i, y2i), roi_box):
-                        density += 1
-
-                    cx, cy = int((x1 + x2) / 2), int((y1 + y2) / 2)
-                    pcy = prev_cy.get(tid, None)
-                    prev_cy[tid] = cy
-                    if pcy is None:
-                        continue
-                    crossed = (pcy < count_y <= cy) or (pcy > count_y >= cy)
-                    if crossed:
-                        if frames - last_count_frame[tid] >= cooldown:
-                            total_crossings += 1
-                            last_count_frame[tid] = frames
-
-                cv2.putText(frame, f"Vehicles crossed: {total_crossings}",
-                            (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-
-                if density <= 3:
-                    level = "LOW"; color = (0, 255, 0)
-                elif density <= 8:
-                    level = "MEDIUM"; color = (0, 255, 255)
-                else:
-                    level = "HIGH / TRAFFIC JAM"; color = (0, 0, 255)
-
-                cv2.putText(frame, f"Traffic: {level} (Vehicles in ROI: {density})",
-                            (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
-            else:
-                cv2.putText(frame, f"Vehicles crossed: {total_crossings}",
-                            (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-                cv2.putText(frame, f"Vehicles in ROI: 0",
-                            (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 0), 2)
+            veh = (tracked if tracker is not None
+                   else Detections.from_results(results).filter_classes(vehicle_lut))
+            # per-zone density + line crossings, whole-array
+            zones.update(veh, cap.timestamp)
+            level, density = zones.worst()
+            total_crossings += line_counter.update(veh, frames, cap.timestamp)
+
+            if ov is not None:
+                # count lines and zones first (so boxes are on top)
+                draw_lines(ov, line_counter)
+                draw_zones(ov, zones)
+                for (x1i, y1i, x2i, y2i), c, tid in zip(veh.xyxy_int().tolist(), veh.cls.tolist(),
+                                                        veh.track_id.tolist()):
+                    ov.rectangle((x1i, y1i), (x2i, y2i), (0, 255, 0), 2)
+                    ov.text(f"{traffic_vehicle_names[c]}#{tid}", (x1i, max(0, y1i - 6)), 0.6, (0, 255, 0), 2)
+                ov.text(f"Vehicles crossed: {total_crossings}", (10, 80), 0.9, (0, 255, 255), 2)
+                label = "HIGH / TRAFFIC JAM" if level == "HIGH" else level
+                ov.text(f"Traffic: {label} (Vehicles in zone: {density})", (10, 110), 0.9, LEVEL_COLORS[level], 2)
 
         # FPS overlay (overall)
-        if args.show_fps:
-            dt = time.time() - t0
-            fps_live = frames / max(1e-6, dt)
-            cv2.putText(frame, f"FPS: {fps_live:.1f}", (10, 150),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2)
+        if args.show_fps and ov is not None:
+            fps_live = frames / max(1e-6, time.time() - t0)
+            ov.text(f"FPS: {fps_live:.1f}", (10, 150), 0.9, (255, 255, 255), 2)
 
         # Output
-        if writer is not None:
-            writer.write(frame)
-
-        if args.display:
-            if not safe_imshow("Road AI (Accident + Traffic)", frame):
-                pass
-            else:
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+        renderer.submit(frame, ov)
+        if renderer.quit:
+            break
 
     cap.release()
-    if writer is not None:
-        writer.release()
+    infer.shutdown()
+    print_capture_stats(cap)
+    if gate is not None:
+        print_gate_stats(gate)
+    if line_counter is not None:
+        print_count_summary(line_counter)
+        print_track_stats(line_counter.store)
+    if tracker is not None:
+        print_tracker_stats(tracker)
+    renderer.close()
+    print_render_stats(renderer)
+    if renderer.writer is not None:
         print(f"💾 Saved: {args.save}")
-    cv2.destroyAllWindows()
     print("✅ Done.")
 
 if __name__ == "__main__":
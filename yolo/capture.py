@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+capture.py
+
+Shared video input for the detection scripts.
+- open_capture(): webcam index, file, or http:// MJPEG stream (ESP32-CAM)
+- MjpegStream: native multipart MJPEG reader with reconnect/backoff that
+  decodes JPEGs directly at reduced resolution (IMREAD_REDUCED_COLOR_2/4/8)
+- FrameGrabber: reads frames on a background thread into a fixed-size,
+  preallocated ring buffer so decode time overlaps with inference
+    * "latest"   : live cameras, always hand out the newest frame, drop the rest
+    * "lossless" : video files, reader thread waits for free slots, nothing dropped
+  every frame carries a capture timestamp: time.monotonic() at decode for
+  live sources, media time (decode index / FPS) for files, so time-based
+  rules behave the same however fast the file is processed
+- open_source(): one call the scripts use in place of open_capture + cap.read
+"""
+
+import os
+import re
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+
+import cv2
+import numpy as np
+
+CAPTURE_MODES = ("auto", "latest", "lossless")
+REDUCE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# JPEG start-of-frame markers that carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def is_stream_url(src_str: str) -> bool:
+    return src_str.lower().startswith(("http://", "https://"))
+
+
+def jpeg_size(data: bytes):
+    """(width, height) from the JPEG SOF header without decoding, or None."""
+    i, n = 2, len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        seg_len = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            h = (data[i + 5] << 8) | data[i + 6]
+            w = (data[i + 7] << 8) | data[i + 8]
+            return w, h
+        i += 2 + seg_len
+    return None
+
+
+def pick_reduce_factor(width, height, target):
+    """Largest of 1/2/4/8 that keeps the long side >= target (the inference size)."""
+    long_side = max(width, height)
+    factor = 1
+    for f in (2, 4, 8):
+        if long_side // f >= target:
+            factor = f
+    return factor
+
+
+class MjpegStream:
+    """
+    multipart/x-mixed-replace MJPEG over HTTP (ESP32-CAM /stream endpoint).
+
+    - parses part boundaries / Content-Length itself (no FFmpeg in the path)
+    - decodes with IMREAD_REDUCED_COLOR_N so a 1280x720 frame for a 640
+      model is decoded at 640x360 instead of full-size-then-resize
+    - a read that stalls for stall_timeout seconds drops the connection and
+      reconnects with exponential backoff (backoff_min .. backoff_max)
+    - tracks per-frame arrival interval and jitter (std-dev of the interval)
+
+    Behaves like a cv2.VideoCapture for FrameGrabber: read(), get(), isOpened(), release().
+    """
+    def __init__(self, url, target_size=640, reduce="auto", stall_timeout=3.0,
+                 backoff_min=0.5, backoff_max=8.0, max_retries=None, window=120):
+        self.url = url
+        self.target_size = int(target_size)
+        self.reduce = reduce
+        self.stall_timeout = stall_timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.max_retries = max_retries
+
+        self.frames = 0
+        self.reconnects = 0
+        self.bytes_in = 0
+        self.decode_errors = 0
+        self.factor = None if reduce == "auto" else int(reduce)
+        self.frame_size = None  # (w, h) after reduction
+
+        self._resp = None
+        self._boundary = None
+        self._at_part_headers = False
+        self._last_arrival = None
+        self._intervals = deque(maxlen=window)
+        self._stop = threading.Event()
+        self._opened = self._connect()
+
+    # ---- connection ----
+
+    def _connect(self) -> bool:
+        try:
+            req = urllib.request.Request(self.url, headers={"Connection": "keep-alive"})
+            resp = urllib.request.urlopen(req, timeout=self.stall_timeout)
+        except Exception as e:
+            print(f"⚠️ MJPEG connect failed ({self.url}): {e}")
+            return False
+        ctype = resp.headers.get("Content-Type", "")
+        m = re.search(r'boundary="?([^";]+)"?', ctype)
+        self._boundary = ("--" + m.group(1).lstrip("-")).encode() if m else None
+        self._resp = resp
+        self._at_part_headers = False
+        self._last_arrival = None  # don't count the outage as jitter
+        return True
+
+    def _close(self):
+        if self._resp is not None:
+            try:
+                self._resp.close()
+            except Exception:
+                pass
+            self._resp = None
+
+    def _reconnect(self) -> bool:
+        self._close()
+        delay, tries = self.backoff_min, 0
+        while not self._stop.is_set():
+            if self.max_retries is not None and tries >= self.max_retries:
+                return False
+            tries += 1
+            self.reconnects += 1
+            print(f"🔄 MJPEG reconnect #{self.reconnects} in {delay:.1f}s")
+            if self._stop.wait(delay):
+                return False
+            if self._connect():
+                return True
+            delay = min(delay * 2, self.backoff_max)
+        return False
+
+    # ---- multipart parsing ----
+
+    def _next_jpeg(self):
+        """Return the next JPEG payload; raises on stall / disconnect."""
+        f = self._resp
+        # skip to the boundary line (or straight to SOI if the server sent no boundary)
+        while not self._at_part_headers:
+            line = f.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            s = line.strip()
+            if self._boundary is None and s.startswith(b"\xff\xd8"):
+                return self._read_until_eoi(line)
+            if self._boundary is not None and s.startswith(self._boundary):
+                break
+        self._at_part_headers = False
+
+        length = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            if line in (b"\r\n", b"\n"):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            if k.strip().lower() == "content-length":
+                length = int(v.strip())
+
+        if length is not None:
+            data = f.read(length)
+            if len(data) < length:
+                raise ConnectionError("short read")
+            return data
+        return self._read_until_eoi(b"")
+
+    def _read_until_eoi(self, head: bytes):
+        chunks = [head]
+        while True:
+            line = self._resp.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            if self._boundary is not None and line.strip().startswith(self._boundary):
+                self._at_part_headers = True  # already consumed the next boundary
+                break
+            chunks.append(line)
+            if line.rstrip(b"\r\n").endswith(b"\xff\xd9"):
+                break
+        return b"".join(chunks).rstrip(b"\r\n")
+
+    # ---- cv2.VideoCapture-like API ----
+
+    def read(self, image=None):
+        while not self._stop.is_set():
+            if self._resp is None and not self._reconnect():
+                return False, None
+            try:
+                data = self._next_jpeg()
+            except (socket.timeout, ConnectionError, OSError, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                print(f"⚠️ MJPEG stream stalled/closed: {e}")
+                self._close()
+                continue
+
+            arrival = time.monotonic()
+            if self._last_arrival is not None:
+                self._intervals.append(arrival - self._last_arrival)
+            self._last_arrival = arrival
+            self.bytes_in += len(data)
+
+            if self.factor is None:
+                size = jpeg_size(data)
+                self.factor = pick_reduce_factor(*size, self.target_size) if size else 1
+
+            img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCE_FLAGS[self.factor])
+            if img is None:
+                self.decode_errors += 1
+                continue
+            self.frames += 1
+            self.frame_size = (img.shape[1], img.shape[0])
+            if image is not None and image.shape == img.shape:
+                np.copyto(image, img)
+                return True, image
+            return True, img
+        return False, None
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            iv = self.interval_stats()[0]
+            return 1000.0 / iv if iv > 0 else 0.0
+        if self.frame_size is not None:
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                return float(self.frame_size[0])
+            if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                return float(self.frame_size[1])
+        return 0.0
+
+    def release(self):
+        self._stop.set()
+        self._close()
+
+    def interval_stats(self):
+        """(mean arrival interval ms, jitter ms) over the recent window."""
+        if not self._intervals:
+            return 0.0, 0.0
+        iv = np.asarray(self._intervals) * 1000.0
+        return float(iv.mean()), float(iv.std())
+
+    def stats(self):
+        mean_ms, jitter_ms = self.interval_stats()
+        return {
+            "frames": self.frames,
+            "reconnects": self.reconnects,
+            "decode_errors": self.decode_errors,
+            "reduce": self.factor,
+            "kbytes": self.bytes_in // 1024,
+            "interval_ms": round(mean_ms, 1),
+            "jitter_ms": round(jitter_ms, 1),
+        }
+
+
+def open_capture(src_str: str, target_size=640, reduce="auto"):
+    if is_stream_url(src_str):
+        return MjpegStream(src_str, target_size=target_size, reduce=reduce), True
+    use_cam = src_str.isdigit() and not os.path.exists(src_str)
+    if use_cam:
+        cam_idx = int(src_str)
+        cap = cv2.VideoCapture(cam_idx, cv2.CAP_DSHOW)  # Windows-friendly
+        if not cap.isOpened():
+            cap.release()
+            cap = cv2.VideoCapture(cam_idx)  # fallback
+        return cap, True
+    else:
+        return cv2.VideoCapture(os.path.expanduser(src_str)), False
+
+
+class FrameGrabber:
+    """
+    Background reader around a cv2.VideoCapture-like object.
+
+    Frames are decoded straight into slots of a preallocated ring buffer
+    (cap.read(dst) reuses dst when the geometry matches). read() hands out a
+    view of a slot; that slot stays reserved for the caller until the next
+    read(), so drawing on the returned frame is safe but keeping it across
+    iterations is not -- copy it if you need it later.
+
+    Counters:
+      decoded   - frames read from the source
+      dropped   - decoded frames that were replaced by a newer one before
+                  being read ("latest" mode only)
+      delivered - frames returned by read()
+
+    clock="wall" stamps frames with time.monotonic() when decoded, "media"
+    with decode index / source FPS (falls back to wall if FPS is unknown).
+    """
+    def __init__(self, cap, mode="latest", buffer_size=4, clock="wall"):
+        if mode not in ("latest", "lossless"):
+            raise ValueError(f"unknown capture mode: {mode}")
+        if clock not in ("wall", "media"):
+            raise ValueError(f"unknown capture clock: {clock}")
+        self.cap = cap
+        self.mode = mode
+        self.clock = clock
+        # reader holds one slot, grabber writes one, at least one ready
+        self.buffer_size = max(3, int(buffer_size))
+
+        self.decoded = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.timestamp = 0.0   # capture time (s) of the last read() frame, see clock
+        self.frame_index = -1  # decode index of the last read() frame
+
+        self._buf = None
+        self._ts = np.zeros(self.buffer_size, dtype=np.float64)
+        self._idx = np.zeros(self.buffer_size, dtype=np.int64)
+        self._free = deque(range(self.buffer_size))
+        self._ready = deque()   # slots with unread frames, oldest first
+        self._held = None       # slot currently owned by the caller
+        self._cond = threading.Condition()
+        self._eof = False
+        self._stopped = False
+        self._thread = None
+        self._fps = 0.0
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Read the first frame synchronously (to size the ring), then spin the thread."""
+        self._fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        ok, first = self.cap.read()
+        if not ok or first is None:
+            self._eof = True
+            return self
+
+        self._buf = np.empty((self.buffer_size,) + first.shape, dtype=first.dtype)
+        slot = self._free.popleft()
+        self._buf[slot] = first
+        self._publish(slot, time.monotonic())
+
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def release(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
+
+    # ---- producer side ----
+
+    def _publish(self, slot, ts):
+        """Called with the lock held (or before the thread starts)."""
+        if self.clock == "media" and self._fps > 0:
+            ts = self.decoded / self._fps
+        self._ts[slot] = ts
+        self._idx[slot] = self.decoded
+        self.decoded += 1
+        self._ready.append(slot)
+        if self.mode == "latest":
+            while len(self._ready) > 1:
+                self._free.append(self._ready.popleft())
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._free and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                slot = self._free.popleft()
+
+            dst = self._buf[slot]
+            ok, img = self.cap.read(dst)
+            ts = time.monotonic()
+
+            with self._cond:
+                if not ok or img is None:
+                    self._free.appendleft(slot)
+                    self._eof = True
+                    self._cond.notify_all()
+                    return
+                if img is not dst:
+                    # backend ignored our buffer (or the stream changed size)
+                    if img.shape == dst.shape:
+                        np.copyto(dst, img)
+                    else:
+                        dst[...] = cv2.resize(img, (dst.shape[1], dst.shape[0]))
+                self._publish(slot, ts)
+                self._cond.notify_all()
+
+    # ---- consumer side (cv2.VideoCapture-compatible) ----
+
+    def read(self, timeout=None):
+        with self._cond:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._cond.notify_all()
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._ready and not self._eof:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False, None
+                self._cond.wait(remaining)
+
+            if not self._ready:
+                return False, None
+
+            slot = self._ready.popleft()
+            self._held = slot
+            self.timestamp = float(self._ts[slot])
+            self.frame_index = int(self._idx[slot])
+            self.delivered += 1
+            return True, self._buf[slot]
+
+    def isOpened(self):
+        return self._buf is not None or not self._eof
+
+    def get(self, prop):
+        if self._buf is not None:
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                return float(self._buf.shape[2])
+            if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                return float(self._buf.shape[1])
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        return self.cap.get(prop)
+
+    def stats(self):
+        s = {
+            "mode": self.mode,
+            "decoded": self.decoded,
+            "dropped": self.dropped,
+            "delivered": self.delivered,
+        }
+        if hasattr(self.cap, "stats"):
+            s["source"] = self.cap.stats()
+        return s
+
+
+def open_source(src_str: str, mode="auto", buffer_size=4, cam_size=(1280, 720),
+                target_size=640, reduce="auto"):
+    """
+    Open a webcam index, video path or MJPEG URL and wrap it in a started FrameGrabber.
+    mode="auto" -> "latest" for cameras/streams, "lossless" for files.
+    Cameras/streams are stamped with wall-clock capture time, files with media time.
+    target_size/reduce only apply to MJPEG URLs (decode-time downscale).
+    Returns (grabber, is_cam); grabber.isOpened() is False if nothing could be read.
+    """
+    cap, is_cam = open_capture(src_str, target_size=target_size, reduce=reduce)
+    if is_cam and cam_size and cap.isOpened() and not isinstance(cap, MjpegStream):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, cam_size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cam_size[1])
+
+    if mode == "auto":
+        mode = "latest" if is_cam else "lossless"
+
+    grabber = FrameGrabber(cap, mode=mode, buffer_size=buffer_size, clock="wall" if is_cam else "media")
+    if cap.isOpened():
+        grabber.start()
+    else:
+        grabber._eof = True
+    return grabber, is_cam
+
+
+def add_capture_args(ap):
+    ap.add_argument("--capture-mode", choices=CAPTURE_MODES, default="auto",
+                    help="latest = drop stale frames (live), lossless = every frame (files)")
+    ap.add_argument("--capture-buffer", type=int, default=4, help="frame ring buffer size")
+    ap.add_argument("--stream-reduce", choices=["auto", "1", "2", "4", "8"], default="auto",
+                    help="MJPEG URL sources: JPEG decode downscale (auto = nearest to --imgsz)")
+
+
+def print_capture_stats(cap):
+    s = cap.stats()
+    print(f"📷 Capture ({s['mode']}): decoded={s['decoded']} "
+          f"delivered={s['delivered']} dropped={s['dropped']}")
+    if "source" in s:
+        src = s["source"]
+        print("   stream: " + ", ".join(f"{k}={v}" for k, v in src.items()))
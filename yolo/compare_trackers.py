@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+compare_trackers.py
+
+Builtin NumPy tracker vs ultralytics ByteTrack / BoT-SORT on one video.
+The detector runs once per frame (predict(), vehicle classes, low conf) and
+the same detections are fed to every tracker, so only tracking differs.
+
+Per tracker:
+  - ms/frame spent in tracker.update() and the resulting end-to-end FPS
+    (detector time + tracker time)
+  - unique IDs and mean track length in frames (fragmented tracks -> more,
+    shorter IDs)
+  - ID switches (no ground truth needed): tracked boxes of consecutive
+    frames are paired by IoU >= --switch-iou; a pair whose IDs differ is a
+    switch
+  - crossings of the --line count line (LineCounter, as in the live scripts)
+
+    python compare_trackers.py --source head_on_collision_2.mp4
+    python compare_trackers.py --trackers builtin,bytetrack.yaml --frames 500
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from accident_smoother import greedy_match, iou_matrix
+from capture import open_source
+from counting import LineCounter, parse_count_lines
+from detections import Detections
+from sort_tracker import SortTracker, add_sort_args, is_builtin
+from vehicles import VEHICLE_CLASS_IDS, vehicle_class_map
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Builtin tracker vs ultralytics trackers")
+    ap.add_argument("--source", default="head_on_collision_2.mp4")
+    ap.add_argument("--model", default="yolov8s.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.1, help="detector conf (trackers apply their own thresholds)")
+    ap.add_argument("--iou", type=float, default=0.5)
+    ap.add_argument("--trackers", default="builtin,bytetrack.yaml,botsort.yaml")
+    ap.add_argument("--frames", type=int, default=0, help="stop after N frames (0 = whole video)")
+    ap.add_argument("--line", type=str, default="0.15,0.80,0.85,0.80")
+    ap.add_argument("--switch-iou", type=float, default=0.5)
+    add_sort_args(ap)
+    return ap.parse_args()
+
+
+class UltralyticsTracker:
+    """BYTETracker / BOTSORT from a tracker yaml, fed plain predict() boxes (as batch_analyze.py)."""
+    def __init__(self, cfg_path, fps):
+        from ultralytics.trackers.bot_sort import BOTSORT
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(cfg_path)))
+        cls = BOTSORT if cfg.tracker_type == "botsort" else BYTETracker
+        self.tracker = cls(args=cfg, frame_rate=int(round(fps)))
+
+    def update(self, result, frame):
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, frame) if len(det) else np.empty((0, 8))
+        tracks = np.asarray(tracks, dtype=np.float32).reshape(-1, 8)
+        return Detections(tracks[:, :4], tracks[:, 5], tracks[:, 6], tracks[:, 4])
+
+
+class Tally:
+    def __init__(self, name, lines, names):
+        self.name = name
+        self.counter = LineCounter(lines, names)
+        self.times = []
+        self.first, self.last = {}, {}
+        self.switches = 0
+        self._prev = None
+
+    def add(self, trk, frame_idx, t, dt_ms, switch_iou):
+        self.times.append(dt_ms)
+        for tid in trk.track_id.tolist():
+            self.first.setdefault(tid, frame_idx)
+            self.last[tid] = frame_idx
+        if self._prev is not None and len(trk) and len(self._prev):
+            rows, cols = greedy_match(iou_matrix(self._prev.xyxy, trk.xyxy), switch_iou)
+            self.switches += int((self._prev.track_id[rows] != trk.track_id[cols]).sum())
+        self._prev = trk
+        self.counter.update(trk, frame_idx, t)
+
+    def row(self, det_ms):
+        lengths = [self.last[i] - self.first[i] + 1 for i in self.first]
+        trk_ms = float(np.mean(self.times)) if self.times else 0.0
+        return {
+            "tracker": self.name,
+            "track ms/frame": f"{trk_ms:.2f}",
+            "end-to-end FPS": f"{1000.0 / max(det_ms + trk_ms, 1e-6):.1f}",
+            "unique IDs": f"{len(self.first)}",
+            "mean track len": f"{np.mean(lengths) if lengths else 0:.1f}",
+            "ID switches": f"{self.switches}",
+            "crossings": f"{self.counter.total}",
+        }
+
+
+def main():
+    args = parse_args()
+    model = YOLO(args.model)
+    names = vehicle_class_map(model.names)
+    cap, _ = open_source(args.source, mode="lossless")
+    if not cap.isOpened():
+        print("❌ Cannot open source"); return
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    lines = parse_count_lines("", W, H, default_line=args.line)
+
+    trackers = []
+    for spec in (s.strip() for s in args.trackers.split(",") if s.strip()):
+        if is_builtin(spec):
+            trk = SortTracker(high_thresh=args.track_high, low_thresh=args.track_low, new_thresh=args.track_new,
+                              min_hits=args.track_min_hits, buffer_ms=args.track_buffer_ms)
+        else:
+            trk = UltralyticsTracker(spec, fps)
+        trackers.append((trk, Tally(spec, lines, names)))
+
+    det_times = []
+    n = 0
+    while not args.frames or n < args.frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        n += 1
+        t0 = time.perf_counter()
+        r = model.predict(frame, imgsz=args.imgsz, conf=args.conf, iou=args.iou,
+                          classes=VEHICLE_CLASS_IDS, verbose=False)[0]
+        det_times.append((time.perf_counter() - t0) * 1000.0)
+        det = Detections.from_results(r)
+        for trk, tally in trackers:
+            t0 = time.perf_counter()
+            out = trk.update(det, cap.timestamp) if isinstance(trk, SortTracker) else trk.update(r, frame)
+            tally.add(out, n, cap.timestamp, (time.perf_counter() - t0) * 1000.0, args.switch_iou)
+    cap.release()
+
+    det_ms = float(np.mean(det_times)) if det_times else 0.0
+    print(f"\n{n} frames, detector {det_ms:.1f} ms/frame ({args.model}, imgsz {args.imgsz})")
+    rows = [tally.row(det_ms) for _, tally in trackers]
+    if not rows:
+        return
+    cols = list(rows[0])
+    widths = [max(len(c), *(len(r[c]) for r in rows)) + 2 for c in cols]
+    print("".join(c.rjust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("".join(r[c].rjust(w) for c, w in zip(cols, widths)))
+
+
+if __name__ == "__main__":
+    main()
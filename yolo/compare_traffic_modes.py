@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+compare_traffic_modes.py
+
+Side-by-side report for --traffic-source coco vs accident on one video:
+crossing count, ROI density (mean / max / per-level share) and per-frame
+inference time. "coco" runs the accident model AND yolov8s (two forward
+passes), "accident" runs only the accident model with its Bike/CAR/Truck
+classes feeding the tracker. Both modes count and measure exactly like the
+traffic scripts (counting.LineCounter, zones.ZoneSet, vehicles), so the
+numbers compare what the pipelines would report.
+
+    python compare_traffic_modes.py --source head_on_collision_2.mp4 \
+        --accident-weights accident/v1/weights/best.pt --csv modes.csv
+"""
+
+import argparse
+import csv
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from capture import open_source
+from counting import LineCounter, add_counting_args, parse_count_lines
+from detections import Detections, class_lut
+from track_store import add_track_store_args, make_track_store
+from vehicles import VEHICLE_CLASS_IDS, vehicle_class_map
+from zones import add_zone_args, make_zones
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Traffic from COCO model vs accident model")
+    ap.add_argument("--source", default="head_on_collision_2.mp4")
+    ap.add_argument("--accident-weights", default="accident/v1/weights/best.pt")
+    ap.add_argument("--traffic-model", default="yolov8s.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.35)
+    ap.add_argument("--iou", type=float, default=0.5)
+    ap.add_argument("--tracker", default="botsort.yaml")
+    ap.add_argument("--line", type=str, default="0.15,0.80,0.85,0.80")
+    ap.add_argument("--roi", type=str, default="0.25,0.35,0.75,0.95")
+    ap.add_argument("--csv", type=str, default="", help="optional per-frame density/crossings CSV")
+    add_track_store_args(ap)
+    add_counting_args(ap)
+    add_zone_args(ap)
+    return ap.parse_args()
+
+
+def run(args, mode):
+    accident_model = YOLO(args.accident_weights)
+    traffic_model = YOLO(args.traffic_model) if mode == "coco" else None
+    veh_names = vehicle_class_map((traffic_model or accident_model).names)
+    veh_lut = class_lut(veh_names)
+
+    cap, _ = open_source(args.source, mode="lossless")
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
+    counter = LineCounter(parse_count_lines(args.count_lines, W, H, default_line=args.line), veh_names,
+                          args.count_cooldown_ms, make_track_store(args))
+    zones = make_zones(args, W, H)
+
+    crossings = 0
+    densities, levels, crossing_series, times = [], [], [], []
+    frames = 0
+
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames += 1
+        t = time.perf_counter()
+        if mode == "coco":
+            accident_model.predict(frame, imgsz=args.imgsz, conf=args.conf, iou=args.iou, verbose=False)
+            results = traffic_model.track(frame, imgsz=args.imgsz, conf=args.conf, iou=args.iou,
+                                          tracker=args.tracker, persist=True,
+                                          classes=VEHICLE_CLASS_IDS, verbose=False)
+        else:
+            results = accident_model.track(frame, imgsz=args.imgsz, conf=args.conf, iou=args.iou,
+                                           tracker=args.tracker, persist=True, verbose=False)
+        times.append((time.perf_counter() - t) * 1000.0)
+
+        veh = Detections.from_results(results).filter_classes(veh_lut)
+        level, density = zones.update(veh, cap.timestamp).worst()
+        crossings += counter.update(veh, frames, cap.timestamp)
+        densities.append(density)
+        levels.append(level)
+        crossing_series.append(crossings)
+    cap.release()
+
+    d = np.asarray(densities) if densities else np.zeros(1)
+    levels = levels or ["LOW"]
+    return {
+        "mode": mode,
+        "frames": frames,
+        "crossings": crossings,
+        "density_mean": float(d.mean()),
+        "density_max": int(d.max()),
+        "pct_low": 100.0 * levels.count("LOW") / len(levels),
+        "pct_medium": 100.0 * levels.count("MEDIUM") / len(levels),
+        "pct_high": 100.0 * levels.count("HIGH") / len(levels),
+        "ms_per_frame": float(np.mean(times)) if times else 0.0,
+        "density_series": densities,
+        "level_series": levels,
+        "crossing_series": crossing_series,
+    }
+
+
+def main():
+    args = parse_args()
+    coco = run(args, "coco")
+    acc = run(args, "accident")
+
+    rows = [
+        ("frames", "{:d}"), ("crossings", "{:d}"),
+        ("density_mean", "{:.2f}"), ("density_max", "{:d}"),
+        ("pct_low", "{:.1f}%"), ("pct_medium", "{:.1f}%"), ("pct_high", "{:.1f}%"),
+        ("ms_per_frame", "{:.1f}"),
+    ]
+    print()
+    print(f"{'metric':<16}{'coco (2 models)':>18}{'accident only':>16}")
+    for key, fmt in rows:
+        print(f"{key:<16}{fmt.format(coco[key]):>18}{fmt.format(acc[key]):>16}")
+    if acc["ms_per_frame"] > 0:
+        print(f"\nInference speedup: {coco['ms_per_frame'] / acc['ms_per_frame']:.2f}x")
+
+    n = min(len(coco["density_series"]), len(acc["density_series"]))
+    if n:
+        agree = np.mean([a == b for a, b in zip(coco["level_series"][:n], acc["level_series"][:n])])
+        print(f"Traffic level agreement: {agree * 100:.1f}% of frames")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["frame", "density_coco", "density_accident", "crossings_coco", "crossings_accident"])
+            for i in range(n):
+                w.writerow([i + 1, coco["density_series"][i], acc["density_series"][i],
+                            coco["crossing_series"][i], acc["crossing_series"][i]])
+        print(f"💾 Per-frame series: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+connectivity.py
+
+Background link monitor (replaces check_internet(), which did a blocking
+requests.get to google.com from the frame loop every 10 s).
+
+- passive: the Uploader reports every request it makes. Any HTTP answer
+  (even a 5xx) means the link is up; --net-fail-after transport failures in
+  a row (connection error / timeout) mean it is down
+- active: only when nothing has been proven for --net-probe-s, a HEAD to
+  the configured Firebase host (any HTTP status = reachable) from the
+  monitor thread; while down it re-probes every --net-retry-s
+- state changes are published to subscribers (e.g. the event journal's
+  set_online, which starts the offline drain)
+- the frame loop only reads the cached .online boolean
+"""
+
+import threading
+import time
+
+import requests
+
+
+class ConnectivityMonitor:
+    def __init__(self, probe_url, probe_s=10.0, retry_s=3.0, timeout=2.0, fail_after=2):
+        self.probe_url = probe_url
+        self.probe_s = probe_s
+        self.retry_s = retry_s
+        self.timeout = timeout
+        self.fail_after = max(1, int(fail_after))
+        self.online = True  # optimistic until something fails
+
+        self._session = requests.Session()
+        self._cv = threading.Condition()
+        self._pub_lock = threading.Lock()  # listeners see changes in order
+        self._listeners = []
+        self._last_ok = 0.0    # monotonic time the link was last proven up
+        self._fails = 0        # transport failures in a row
+        self._next_probe = 0.0  # probe at once on start
+        self._stop = False
+
+        self.probes = 0
+        self.probe_failures = 0
+        self.passive_ok = 0
+        self.passive_fail = 0
+        self.transitions = 0
+        self.offline_s = 0.0
+        self._down_since = None
+
+        self._thread = threading.Thread(target=self._run, name="ConnectivityMonitor", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, callback):
+        """callback(online) on every change (from a background thread); also called once now."""
+        with self._cv:
+            self._listeners.append(callback)
+            online = self.online
+        callback(online)
+
+    def report(self, ok):
+        """Passive signal: a request got an HTTP answer (ok) or failed in transport (not ok)."""
+        with self._cv:
+            if ok:
+                self.passive_ok += 1
+                self._last_ok = time.monotonic()
+                self._fails = 0
+            else:
+                self.passive_fail += 1
+                self._fails += 1
+                if self._fails < self.fail_after:
+                    return
+            changed = self._set(ok)
+        self._publish(changed)
+
+    def _set(self, online):
+        """Update state (holding the lock) -> listeners to call, or None."""
+        now = time.monotonic()
+        if online == self.online:
+            return None
+        self.online = online
+        self.transitions += 1
+        if online:
+            self.offline_s += now - self._down_since
+            self._down_since = None
+            self._next_probe = now + self.probe_s
+        else:
+            self._down_since = now
+            self._next_probe = now + self.retry_s
+        self._cv.notify()  # reschedule the probe
+        return list(self._listeners)
+
+    def _publish(self, listeners):
+        if not listeners:
+            return
+        with self._pub_lock:
+            online = self.online  # latest state, even if another change raced this one
+            for cb in listeners:
+                cb(online)
+
+    def _probe(self):
+        self.probes += 1
+        try:
+            self._session.head(self.probe_url, timeout=self.timeout, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            self.probe_failures += 1
+            return False
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stop:
+                    now = time.monotonic()
+                    due = max(self._next_probe, self._last_ok + self.probe_s) if self.online else self._next_probe
+                    if now >= due:
+                        break
+                    self._cv.wait(due - now)
+                if self._stop:
+                    return
+            ok = self._probe()
+            with self._cv:
+                now = time.monotonic()
+                if ok:
+                    self._last_ok = now
+                    self._fails = 0
+                self._next_probe = now + (self.probe_s if ok else self.retry_s)
+                changed = self._set(ok)
+            self._publish(changed)
+
+    def close(self):
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        self._thread.join(self.timeout + 1.0)
+        self._session.close()
+
+    def stats(self):
+        with self._cv:
+            offline_s = self.offline_s + (time.monotonic() - self._down_since if self._down_since else 0.0)
+        return {
+            "online": self.online,
+            "transitions": self.transitions,
+            "offline_s": round(offline_s, 1),
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "passive_ok": self.passive_ok,
+            "passive_fail": self.passive_fail,
+        }
+
+
+def add_connectivity_args(ap):
+    ap.add_argument("--net-probe-s", type=float, default=10.0,
+                    help="probe the Firebase host if no upload proved the link for this long")
+    ap.add_argument("--net-retry-s", type=float, default=3.0, help="probe interval while offline")
+    ap.add_argument("--net-fail-after", type=int, default=2,
+                    help="upload transport failures in a row that mark the link down")
+
+
+def make_monitor(args, uploader):
+    """Monitor probing the uploader's Firebase host and fed by its request results."""
+    monitor = ConnectivityMonitor(uploader.base_url + "/.json", probe_s=args.net_probe_s,
+                                  retry_s=args.net_retry_s, fail_after=args.net_fail_after)
+    uploader.on_result = monitor.report
+    return monitor
+
+
+def print_connectivity_stats(monitor):
+    s = monitor.stats()
+    print(f"📶 Connectivity: {'online' if s['online'] else 'OFFLINE'} transitions={s['transitions']} "
+          f"offline={s['offline_s']}s probes={s['probes']} (failed {s['probe_failures']}) "
+          f"upload signals ok={s['passive_ok']} fail={s['passive_fail']}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+detections.py
+
+Struct-of-arrays container for one frame of boxes, so post-processing is a
+handful of whole-array NumPy ops instead of a Python loop per box.
+
+    det = Detections.from_results(results)          # one device->host copy
+    veh = det.filter_classes(vehicle_lut)             # class filter (class_lut())
+    density = int(veh.intersects(roi_box).sum())     # ROI membership
+    total_crossings += counter.update(veh, frames)   # line crossings (counting.py)
+
+Fields (all contiguous, length N):
+  xyxy     float32 (N, 4)
+  conf     float32 (N,)
+  cls      int64   (N,)
+  track_id int64   (N,)   -1 when the boxes come from predict() (no tracker)
+"""
+
+import numpy as np
+
+
+def class_lut(class_ids, size=None):
+    """Boolean lookup table lut[cls] -> keep, for Detections.filter_classes()."""
+    ids = [int(c) for c in class_ids]
+    lut = np.zeros(max(size or 0, max(ids, default=-1) + 1, 1), dtype=bool)
+    lut[ids] = True
+    return lut
+
+
+class Detections:
+    __slots__ = ("xyxy", "conf", "cls", "track_id")
+
+    def __init__(self, xyxy, conf, cls, track_id=None):
+        self.xyxy = np.ascontiguousarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.ascontiguousarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.ascontiguousarray(cls, dtype=np.int64).reshape(-1)
+        if track_id is None:
+            track_id = np.full(len(self.xyxy), -1, dtype=np.int64)
+        self.track_id = np.ascontiguousarray(track_id, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_results(cls, results):
+        """From ultralytics predict()/track() output (list of Results or a single Results)."""
+        if results is None:
+            return cls.empty()
+        r = results[0] if isinstance(results, (list, tuple)) else results
+        boxes = getattr(r, "boxes", None)
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        # one copy of the whole (N, 6|7) tensor instead of one per attribute
+        data = boxes.data
+        data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+        if data.shape[1] == 7:  # x1, y1, x2, y2, id, conf, cls
+            return cls(data[:, :4], data[:, 5], data[:, 6], data[:, 4])
+        return cls(data[:, :4], data[:, 4], data[:, 5])
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, idx):
+        """Boolean mask / index array -> new Detections."""
+        # fancy indexing already yields contiguous arrays of the right dtype: skip __init__'s checks
+        out = Detections.__new__(Detections)
+        out.xyxy, out.conf, out.cls, out.track_id = self.xyxy[idx], self.conf[idx], self.cls[idx], self.track_id[idx]
+        return out
+
+    # ---------- whole-array ops ----------
+
+    def class_mask(self, class_ids):
+        """
+        Boolean mask of boxes whose class is in class_ids: a class_lut() table
+        (fast path, build it once) or any iterable of ids incl. a {id: name} dict.
+        """
+        lut = class_ids if isinstance(class_ids, np.ndarray) else class_lut(class_ids)
+        cls = self.cls
+        keep = (cls >= 0) & (cls < len(lut))
+        keep[keep] = lut[cls[keep]]
+        return keep
+
+    def filter_classes(self, class_ids):
+        return self[self.class_mask(class_ids)]
+
+    def centroids(self):
+        """(N, 2) box centres."""
+        return np.stack(((self.xyxy[:, 0] + self.xyxy[:, 2]) * 0.5,
+                         (self.xyxy[:, 1] + self.xyxy[:, 3]) * 0.5), axis=1)
+
+    def intersects(self, box):
+        """Boolean mask of boxes overlapping box=(x1, y1, x2, y2) with positive area."""
+        x1, y1, x2, y2 = box
+        b = self.xyxy
+        return ((np.minimum(b[:, 2], x2) > np.maximum(b[:, 0], x1)) &
+                (np.minimum(b[:, 3], y2) > np.maximum(b[:, 1], y1)))
+
+    def xyxy_int(self):
+        """int32 copy of the boxes for drawing."""
+        return self.xyxy.astype(np.int32)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+event_journal.py
+
+Durable accident / traffic / V2V event journal (replaces the in-memory
+offline_events list and the one-POST-at-a-time flush_offline()).
+
+- every event is appended to a SQLite file in WAL mode before anything is
+  sent; synchronous=FULL, so an appended event survives a crash or power
+  cut. An append is one small INSERT + WAL fsync, and events only fire on
+  transitions, so this stays off the per-frame budget
+- idempotency: each event gets a Firebase push ID at append time and is
+  uploaded as '<list>/<push id>' (a set, not a POST), so replaying an event
+  whose ack was lost overwrites the same node instead of duplicating it
+- a drainer thread uploads pending events in batches of --journal-batch as
+  one multi-path PATCH through the Uploader, highest priority (accidents)
+  first, whenever set_online(True); failed batches wait --journal-retry-s
+- a batch the server refuses outright (uploader.REJECTED, e.g. 400 for a
+  NaN -- not a timeout / 5xx, nor a 401 / 403, which say nothing about the
+  events and just pause the drain like an outage) is bisected at once -- the next batch is half its size --
+  until the offending event is alone; that row moves to the dead_letter
+  table (kept in the file, with the rejection time) and the queue behind
+  it goes on draining at full batch size
+- acknowledged rows are deleted; once the backlog is empty the WAL is
+  checkpointed and freed pages returned (incremental vacuum), so the file
+  shrinks back after a long offline stretch
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from uploader import PRIO_ACCIDENT, db_path, push_id
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    key     TEXT NOT NULL UNIQUE,   -- push ID = idempotency key
+    list    TEXT NOT NULL,          -- DB list node, e.g. 'accidents'
+    prio    INTEGER NOT NULL,
+    created REAL NOT NULL,
+    body    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_order ON events (prio, id);
+CREATE TABLE IF NOT EXISTS dead_letter (   -- events the server refused
+    id       INTEGER PRIMARY KEY,
+    key      TEXT NOT NULL UNIQUE,
+    list     TEXT NOT NULL,
+    prio     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    body     TEXT NOT NULL,
+    rejected REAL NOT NULL
+);
+"""
+
+
+class EventJournal:
+    def __init__(self, path, uploader, batch=200, retry_s=5.0):
+        self.path = path
+        self.uploader = uploader
+        self.batch = max(1, int(batch))
+        self.retry_s = retry_s
+
+        fresh = not os.path.exists(path)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if fresh:
+            self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = FULL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()  # one connection, used by the loop and the drainer
+
+        self._cv = threading.Condition()
+        self._online = False
+        self._inflight = None      # row ids of the batch being uploaded
+        self._acked = None         # (ids, ok, retryable) handed back by the uploader thread
+        self._retry_at = 0.0
+        self._limit = self.batch   # rows in the next batch (smaller while isolating a refused row)
+        self._stop = False
+
+        self._pending = self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        self.appended = 0
+        self.uploaded = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.rejected_batches = 0  # refused by the server (bisected)
+        self.dead = 0              # events moved to dead_letter
+        self.replayed = self._pending  # left over from the previous run
+        self.peak = self._pending
+        self.append_ms = 0.0       # slowest append (durability cost on the caller)
+
+        self._thread = threading.Thread(target=self._run, name="EventJournal", daemon=True)
+        self._thread.start()
+
+    # ---- producer side (frame loop) ----
+
+    def append(self, path, body, prio=PRIO_ACCIDENT):
+        """Durably record one event for '<path>' (e.g. '/accidents.json') -> its push ID."""
+        key = push_id()
+        t = time.perf_counter()
+        with self._lock:
+            self._db.execute("INSERT INTO events (key, list, prio, created, body) VALUES (?, ?, ?, ?, ?)",
+                             (key, db_path(path), int(prio), time.time(), json.dumps(body)))
+        self.append_ms = max(self.append_ms, (time.perf_counter() - t) * 1000.0)
+        self.appended += 1
+        with self._cv:
+            self._pending += 1
+            self.peak = max(self.peak, self._pending)
+            self._cv.notify()
+        return key
+
+    def set_online(self, online):
+        with self._cv:
+            if online and not self._online:
+                self._retry_at = 0.0
+            self._online = bool(online)
+            self._cv.notify()
+
+    def pending(self):
+        """Events not yet acknowledged by Firebase."""
+        return self._pending
+
+    # ---- drainer ----
+
+    def _done(self, ids):
+        def on_done(ok, retryable):
+            with self._cv:
+                self._acked = (ids, ok, retryable)
+                self._cv.notify()
+        return on_done
+
+    def _wants_batch(self):
+        return self._online and self._inflight is None and self._pending > 0
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not (self._stop or self._acked is not None
+                           or (self._wants_batch() and time.monotonic() >= self._retry_at)):
+                    self._cv.wait(max(0.05, self._retry_at - time.monotonic()) if self._wants_batch() else None)
+                if self._stop:
+                    return
+                acked, self._acked = self._acked, None
+            if acked is not None:
+                self._finish(*acked)
+                continue
+            with self._lock:
+                rows = self._db.execute("SELECT id, key, list, prio, body FROM events ORDER BY prio, id LIMIT ?",
+                                        (self._limit,)).fetchall()
+            if not rows:
+                continue
+            ids = [r[0] for r in rows]
+            update = {f"{lst}/{key}": json.loads(body) for _, key, lst, _, body in rows}
+            with self._cv:
+                self._inflight = ids
+            # never call into the uploader while holding our locks (it may call on_done inline)
+            if not self.uploader.patch("/.json", update, prio=min(r[3] for r in rows),
+                                       what=f"upload {len(rows)} journaled event(s)", on_done=self._done(ids)):
+                with self._cv:
+                    self._inflight = None
+                    self._retry_at = time.monotonic() + self.retry_s
+
+    def _finish(self, ids, ok, retryable):
+        with self._cv:
+            self._inflight = None
+            if not ok and retryable:
+                self.failed_batches += 1
+                self._retry_at = time.monotonic() + self.retry_s
+                return
+        if not ok:
+            self.rejected_batches += 1
+            if len(ids) > 1:
+                self._limit = len(ids) // 2  # bisect: the head half goes next, right away
+                return
+            self._dead_letter(ids[0])
+            self._limit = self.batch
+        else:
+            with self._lock:
+                self._db.execute("BEGIN")  # one transaction / fsync for the whole batch
+                self._db.executemany("DELETE FROM events WHERE id = ?", [(i,) for i in ids])
+                self._db.execute("COMMIT")
+            self.uploaded += len(ids)
+            self.batches += 1
+        with self._cv:
+            self._pending -= len(ids)
+            drained = self._pending == 0
+        if drained:
+            self._compact()
+
+    def _dead_letter(self, row_id):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR REPLACE INTO dead_letter (id, key, list, prio, created, body, rejected) "
+                             "SELECT id, key, list, prio, created, body, ? FROM events WHERE id = ?",
+                             (time.time(), row_id))
+            key, lst = self._db.execute("SELECT key, list FROM dead_letter WHERE id = ?", (row_id,)).fetchone()
+            self._db.execute("DELETE FROM events WHERE id = ?", (row_id,))
+            self._db.execute("COMMIT")
+        self.dead += 1
+        print(f"❌ Event journal: server refused {lst}/{key}; moved to dead_letter in {self.path}")
+
+    def _compact(self):
+        with self._lock:
+            self._db.executescript("PRAGMA incremental_vacuum;")  # execute() would free one page per step
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Stop the drainer; whatever is not acknowledged stays in the file for the next run."""
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        self._thread.join(5.0)
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._cv:
+            online = self._online
+        return {
+            "appended": self.appended,
+            "uploaded": self.uploaded,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "rejected_batches": self.rejected_batches,
+            "dead": self.dead,
+            "replayed": self.replayed,
+            "pending": self.pending(),
+            "peak": self.peak,
+            "append_ms": round(self.append_ms, 2),
+            "online": online,
+        }
+
+
+def add_journal_args(ap):
+    ap.add_argument("--journal", type=str, default="event_journal.db",
+                    help="SQLite file that keeps events until Firebase has them")
+    ap.add_argument("--journal-batch", type=int, default=200, help="events per upload when draining")
+    ap.add_argument("--journal-retry-s", type=float, default=5.0, help="wait after a failed batch")
+
+
+def make_journal(args, uploader):
+    return EventJournal(args.journal, uploader, batch=args.journal_batch, retry_s=args.journal_retry_s)
+
+
+def print_journal_stats(journal):
+    s = journal.stats()
+    print(f"📒 Event journal: appended={s['appended']} uploaded={s['uploaded']} in {s['batches']} batch(es) "
+          f"failed={s['failed_batches']} rejected={s['rejected_batches']} dead-lettered={s['dead']} replayed={s['replayed']} pending={s['pending']} "
+          f"peak={s['peak']} slowest append={s['append_ms']}ms")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+firebase_stub.py
+
+Stand-in for the Firebase Realtime Database REST API, in memory, so the
+upload path can be exercised without the real DB (or a network).
+
+- GET / HEAD / PUT / POST / PATCH / DELETE on '<path>.json', same semantics as
+  Firebase: PUT replaces the node, POST adds a child under a new push ID and
+  answers {"name": id}, PATCH sets each (possibly 'a/b/c') key of the body
+  relative to the path -- a multi-location update when sent to the root --
+  and rejects keys that overlap; null deletes, empty nodes vanish; bodies
+  Firebase cannot parse (incl. NaN / Infinity) get 400
+- --delay-ms / --fail-rate make it a slow, flaky link (503 answers);
+  --lose-ack-rate applies the write but still answers 503, as when the
+  response is lost on the way back (replays must not duplicate); setting
+  StubDB.down drops every connection without an answer (no coverage);
+  StubDB.deny answers every request with 401 Permission denied (expired
+  token / locked rules)
+- counts requests, connections and request bytes (request line + headers + body)
+
+    python firebase_stub.py --port 9000
+    python accident_traffic.py --firebase-url http://127.0.0.1:9000 --enable-accident ...
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from uploader import push_id
+
+
+def _strict_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def _split(path):
+    path = path.split("?", 1)[0].strip("/")
+    if path.endswith(".json"):
+        path = path[:-5]
+    return [p for p in path.split("/") if p]
+
+
+def _prune(node):
+    if isinstance(node, dict):
+        node = {k: _prune(v) for k, v in node.items()}
+        node = {k: v for k, v in node.items() if v is not None}
+        return node or None
+    return node
+
+
+class StubDB:
+    def __init__(self, delay_ms=0.0, fail_rate=0.0, seed=0, lose_ack_rate=0.0):
+        self.root = None
+        self.delay_s = delay_ms / 1000.0
+        self.fail_rate = fail_rate
+        self.lose_ack_rate = lose_ack_rate
+        self.down = False
+        self.deny = False
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.bytes = 0
+        self.methods = {}
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.connections = self.bytes = 0
+            self.methods = {}
+
+    def get(self, keys):
+        node = self.root
+        for k in keys:
+            if not isinstance(node, dict) or k not in node:
+                return None
+            node = node[k]
+        return node
+
+    def set(self, keys, value):
+        if not keys:
+            self.root = _prune(value)
+            return
+        if not isinstance(self.root, dict):
+            self.root = {}
+        chain = [self.root]
+        for k in keys[:-1]:
+            if not isinstance(chain[-1].get(k), dict):
+                chain[-1][k] = {}
+            chain.append(chain[-1][k])
+        value = _prune(value)
+        if value is None:
+            chain[-1].pop(keys[-1], None)
+        else:
+            chain[-1][keys[-1]] = value
+        # drop nodes left empty, only along this path
+        for node, k in zip(reversed(chain[:-1]), reversed(keys[:-1])):
+            if node[k]:
+                break
+            del node[k]
+        self.root = self.root or None
+
+    def handle(self, method, path, body):
+        """-> (status, response object)"""
+        status, out = self._apply(method, path, body)
+        if status < 400 and method not in ("GET", "HEAD") and self.lose_ack_rate and self.rng.random() < self.lose_ack_rate:
+            return 503, {"error": "unavailable"}
+        return status, out
+
+    def _apply(self, method, path, body):
+        keys = _split(path)
+        with self.lock:
+            self.requests += 1
+            self.methods[method] = self.methods.get(method, 0) + 1
+            if self.deny:
+                return 401, {"error": "Permission denied"}
+            if self.rng.random() < self.fail_rate:
+                return 503, {"error": "unavailable"}
+            if method in ("GET", "HEAD"):
+                return 200, self.get(keys)
+            if method == "PUT":
+                self.set(keys, body)
+                return 200, body
+            if method == "POST":
+                name = push_id()
+                self.set(keys + [name], body)
+                return 200, {"name": name}
+            if method == "DELETE":
+                self.set(keys, None)
+                return 200, None
+            if method == "PATCH":
+                if not isinstance(body, dict):
+                    return 400, {"error": "Invalid data; couldn't parse JSON object."}
+                paths = sorted(_split(k) for k in body)
+                for a, b in zip(paths, paths[1:]):
+                    if b[:len(a)] == a:
+                        return 400, {"error": "Invalid data; path is an ancestor of another path"}
+                for k, v in body.items():
+                    self.set(keys + _split(k), v)
+                return 200, body
+        return 405, {"error": "method not allowed"}
+
+
+def make_handler(db):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with db.lock:
+                db.connections += 1
+
+        def _serve(self):
+            if db.down:
+                self.close_connection = True  # hang up without a response
+                return
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            head = len(self.requestline) + 4 + sum(len(k) + len(v) + 4 for k, v in self.headers.items())
+            with db.lock:
+                db.bytes += head + len(raw)
+            if db.delay_s:
+                time.sleep(db.delay_s)
+            try:
+                body = json.loads(raw, parse_constant=_strict_constant) if raw else None
+            except ValueError:
+                status, out = 400, {"error": "Invalid data; couldn't parse JSON object."}
+            else:
+                status, out = db.handle(self.command, self.path, body)
+            data = json.dumps(out).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        do_GET = do_HEAD = do_PUT = do_POST = do_PATCH = do_DELETE = _serve
+
+    return Handler
+
+
+def start_stub(port=0, delay_ms=0.0, fail_rate=0.0, seed=0, lose_ack_rate=0.0):
+    """Serve a StubDB on 127.0.0.1 in a daemon thread -> (server, db, base url)."""
+    db = StubDB(delay_ms, fail_rate, seed, lose_ack_rate)
+    srv = ThreadingHTTPServer(("127.0.0.1", port), make_handler(db))
+    threading.Thread(target=srv.serve_forever, name="FirebaseStub", daemon=True).start()
+    return srv, db, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser("In-memory Firebase Realtime DB REST stand-in")
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="added to every request")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    ap.add_argument("--lose-ack-rate", type=float, default=0.0,
+                    help="fraction of writes applied but answered with 503")
+    args = ap.parse_args()
+    srv, db, url = start_stub(args.port, args.delay_ms, args.fail_rate, lose_ack_rate=args.lose_ack_rate)
+    print(f"✅ Firebase stand-in on {url}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   requests={db.requests} connections={db.connections} bytes={db.bytes} {db.methods}")
+    except KeyboardInterrupt:
+        pass
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+geocode_cache.py
+
+Reverse-geocode cache in front of geocode_location() (which made a
+synchronous Google Geocoding call on the detection thread for every event).
+
+- places are keyed by geohash cell: --geo-precision 7 is ~150 x 150 m, so
+  every fix along the same stretch of road shares one entry
+- lookup() never blocks on the network: an in-memory LRU (--geo-cache-size
+  cells), then a SQLite file (--geo-cache) that survives restarts, so a
+  repeated commute is answered from disk. A miss returns the offline
+  geocoder's name (offline_geocoder.py, if given) or else the last known
+  one at once, and queues the cell for a background resolver thread
+- the resolver works newest cell first (the one the car is in), keeps at
+  most --geo-pending cells queued, only runs while set_online(True), and
+  caches real names only ("Unknown" = failed, retried after --geo-retry-s)
+- entries older than --geo-max-age-days are still served, and refreshed
+  in the background
+- stats: hit rate and API calls saved vs one call per lookup
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+UNKNOWN = "Unknown"
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    cell    TEXT PRIMARY KEY,   -- geohash
+    name    TEXT NOT NULL,
+    updated REAL NOT NULL       -- unix time of the API answer
+);
+"""
+
+
+def geohash(lat, lng, precision=7):
+    """Standard geohash of (lat, lng): 'tdr1v9q' for central Bengaluru at precision 7."""
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            ch = ch * 2 + (lng >= mid)
+            lng_lo, lng_hi = (mid, lng_hi) if lng >= mid else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = ch * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+class GeocodeCache:
+    def __init__(self, resolve, path, precision=7, capacity=4096, max_pending=64,
+                 retry_s=30.0, max_age_days=30.0, fallback=None):
+        self.resolve = resolve            # resolve(lat, lng) -> name, UNKNOWN on failure (blocking)
+        self.fallback = fallback          # fallback(lat, lng) -> name from local data (fast), or None
+        self.path = path
+        self.precision = int(precision)
+        self.capacity = max(1, int(capacity))
+        self.max_pending = max(1, int(max_pending))
+        self.retry_s = retry_s
+        self.max_age_s = max_age_days * 86400.0
+        self.last = UNKNOWN               # last known name, served on a miss
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")  # a lost name is just asked for again
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()     # LRU + connection, used by the loop and the resolver
+
+        self._lru = OrderedDict()         # cell -> (name, updated)
+        self._cv = threading.Condition()
+        self._pending = OrderedDict()     # cell -> (lat, lng), newest last
+        self._failed = {}                 # cell -> monotonic time a retry is allowed
+        self._inflight = None             # cell the resolver is asking about right now
+        self._online = False
+        self._stop = False
+        self._stored = None               # row count, frozen at close()
+
+        self.lookups = 0
+        self.mem_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.fallback_names = 0
+        self.api_calls = 0
+        self.api_failures = 0
+        self.refreshes = 0
+        self.dropped = 0
+        self.api_ms = 0.0                 # total time spent in resolve(), off the loop
+
+        self._thread = threading.Thread(target=self._run, name="GeocodeCache", daemon=True)
+        self._thread.start()
+
+    # ---- caller side (frame loop) ----
+
+    def lookup(self, lat, lng):
+        """Name for (lat, lng) without waiting: cached, else offline / last known (resolved in the background)."""
+        if lat is None or lng is None or (not lat and not lng):
+            return self.last
+        self.lookups += 1
+        cell = geohash(lat, lng, self.precision)
+        with self._lock:
+            hit = self._lru.get(cell)
+            if hit is not None:
+                self._lru.move_to_end(cell)
+                self.mem_hits += 1
+            else:
+                hit = self._db.execute("SELECT name, updated FROM places WHERE cell = ?", (cell,)).fetchone()
+                if hit is not None:
+                    self.disk_hits += 1
+                    self._remember(cell, *hit)
+        if hit is None:
+            self.misses += 1
+            self._queue(cell, lat, lng)
+            if self.fallback is not None:
+                name = self.fallback(lat, lng)
+                if name != UNKNOWN:
+                    self.fallback_names += 1
+                    self.last = name
+            return self.last
+        name, updated = hit
+        if time.time() - updated > self.max_age_s:
+            self._queue(cell, lat, lng, refresh=True)
+        self.last = name
+        return name
+
+    def set_online(self, online):
+        with self._cv:
+            self._online = bool(online)
+            self._cv.notify()
+
+    def _remember(self, cell, name, updated):
+        """Insert into the LRU (holding _lock), evicting the least recently used cell."""
+        self._lru[cell] = (name, updated)
+        self._lru.move_to_end(cell)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def _queue(self, cell, lat, lng, refresh=False):
+        with self._cv:
+            if cell in self._pending or cell == self._inflight:
+                return
+            retry_at = self._failed.get(cell)
+            if retry_at is not None:
+                if retry_at > time.monotonic():
+                    return
+                del self._failed[cell]
+            self._pending[cell] = (lat, lng)
+            if refresh:
+                self.refreshes += 1
+            if len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)  # oldest cell: the car has long left it
+                self.dropped += 1
+            self._cv.notify()
+
+    # ---- resolver ----
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stop and not (self._online and self._pending):
+                    self._cv.wait()
+                if self._stop:
+                    return
+                cell, (lat, lng) = self._pending.popitem(last=True)  # newest first
+                self._inflight = cell
+            t = time.perf_counter()
+            name = self.resolve(lat, lng)
+            self.api_ms += (time.perf_counter() - t) * 1000.0
+            self.api_calls += 1
+            if not name or name == UNKNOWN:
+                self.api_failures += 1
+                with self._cv:
+                    self._failed[cell] = time.monotonic() + self.retry_s
+                    self._inflight = None
+                continue
+            updated = time.time()
+            with self._lock:
+                self._remember(cell, name, updated)
+                self._db.execute("INSERT OR REPLACE INTO places (cell, name, updated) VALUES (?, ?, ?)",
+                                 (cell, name, updated))
+            with self._cv:
+                self._failed.pop(cell, None)
+                self._inflight = None
+                newest = not self._pending
+            if newest:
+                self.last = name  # nothing newer queued: this is where the car is
+
+    def close(self):
+        """Stop the resolver; queued cells are dropped, the disk store is kept."""
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        self._thread.join(5.0)
+        with self._lock:
+            self._stored = self._count()
+            self._db.close()
+
+    def _count(self):
+        return self._db.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def stats(self):
+        hits = self.mem_hits + self.disk_hits
+        with self._lock:
+            cached = len(self._lru)
+            stored = self._stored if self._stored is not None else self._count()
+        return {
+            "lookups": self.lookups,
+            "hit_rate": round(hits / self.lookups, 3) if self.lookups else 0.0,
+            "mem_hits": self.mem_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "fallback_names": self.fallback_names,
+            "api_calls": self.api_calls,
+            "api_failures": self.api_failures,
+            "api_saved": self.lookups - self.api_calls,
+            "api_ms_avg": round(self.api_ms / self.api_calls, 1) if self.api_calls else 0.0,
+            "refreshes": self.refreshes,
+            "dropped": self.dropped,
+            "cached": cached,
+            "stored": stored,
+        }
+
+
+def add_geocode_args(ap):
+    ap.add_argument("--geo-cache", type=str, default="geocode_cache.db",
+                    help="SQLite file of reverse-geocoded places, kept across runs")
+    ap.add_argument("--geo-precision", type=int, default=7, help="geohash length of a cache cell (7 = ~150 m)")
+    ap.add_argument("--geo-cache-size", type=int, default=4096, help="cells kept in memory (LRU)")
+    ap.add_argument("--geo-pending", type=int, default=64, help="max cells waiting for the geocoding API")
+    ap.add_argument("--geo-retry-s", type=float, default=30.0, help="wait before re-asking for a failed cell")
+    ap.add_argument("--geo-max-age-days", type=float, default=30.0,
+                    help="refresh cached names older than this in the background")
+
+
+def make_geocoder(args, resolve, fallback=None):
+    return GeocodeCache(resolve, args.geo_cache, precision=args.geo_precision, capacity=args.geo_cache_size,
+                        max_pending=args.geo_pending, retry_s=args.geo_retry_s,
+                        max_age_days=args.geo_max_age_days, fallback=fallback)
+
+
+def print_geocode_stats(cache):
+    s = cache.stats()
+    print(f"🗺️ Geocode cache: {s['lookups']} lookups, hit rate {s['hit_rate']:.0%} "
+          f"(memory {s['mem_hits']}, disk {s['disk_hits']}, miss {s['misses']}, offline-named {s['fallback_names']}) "
+          f"API calls={s['api_calls']} (failed {s['api_failures']}, avg {s['api_ms_avg']}ms) "
+          f"saved={s['api_saved']} cells cached={s['cached']} stored={s['stored']}")
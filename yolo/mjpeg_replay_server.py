@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+mjpeg_replay_server.py
+
+Stand-in for the ESP32-CAM: replays a video file as multipart MJPEG over HTTP
+so the MJPEG source in capture.py can be exercised without hardware.
+
+    python mjpeg_replay_server.py --video head_on_collision_2.mp4 --port 8081
+    python both.py --source http://127.0.0.1:8081/stream --enable-accident --show-fps
+
+--drop-every N closes the connection after every N frames to exercise reconnect.
+"""
+
+import argparse
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "123456789000000000000987654321"  # same boundary the ESP32-CAM example firmware uses
+
+
+def load_jpegs(path, quality):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(buf.tobytes())
+    cap.release()
+    return frames, fps
+
+
+def make_handler(frames, fps, loop, drop_every):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            period = 1.0 / fps
+            sent = 0
+            next_t = time.monotonic()
+            try:
+                while True:
+                    for jpg in frames:
+                        self.wfile.write(
+                            f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                            f"Content-Length: {len(jpg)}\r\n\r\n".encode()
+                        )
+                        self.wfile.write(jpg)
+                        self.wfile.write(b"\r\n")
+                        sent += 1
+                        if drop_every and sent % drop_every == 0:
+                            return
+                        next_t += period
+                        time.sleep(max(0.0, next_t - time.monotonic()))
+                    if not loop:
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser("MJPEG replay server (ESP32-CAM stand-in)")
+    ap.add_argument("--video", default="head_on_collision_2.mp4")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--fps", type=float, default=0, help="0 = use the file's FPS")
+    ap.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    ap.add_argument("--loop", action="store_true", help="replay forever")
+    ap.add_argument("--drop-every", type=int, default=0, help="close connection every N frames")
+    args = ap.parse_args()
+
+    frames, file_fps = load_jpegs(args.video, args.quality)
+    if not frames:
+        print(f"❌ No frames read from {args.video}")
+        return
+    fps = args.fps or file_fps
+
+    server = ThreadingHTTPServer(("0.0.0.0", args.port),
+                                 make_handler(frames, fps, args.loop, args.drop_every))
+    print(f"✅ Serving {len(frames)} frames @ {fps:.1f} FPS on http://127.0.0.1:{args.port}/stream")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
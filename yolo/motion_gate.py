@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+motion_gate.py
+
+Cheap per-frame novelty gate in front of the YOLO calls.
+- frame -> small grayscale thumbnail (INTER_AREA), compared against the
+  thumbnail of the last frame that went through full inference
+- change energy = fraction of BxB blocks whose mean abs difference exceeds
+  pixel_thresh (robust to sensor noise and single-pixel flicker)
+- decision per frame:
+    "full"  : run every model (scene changed, or max_skip reached)
+    "track" : small change -> only refresh the tracker (traffic track()),
+              keep the previous accident detections
+    "reuse" : static scene -> reuse all previous detections
+- max_skip bounds how many consecutive frames may skip full inference, so
+  AccidentSmoother hysteresis and crossing counters never go stale for long
+"""
+
+import cv2
+import numpy as np
+
+GATE_FULL = "full"
+GATE_TRACK = "track"
+GATE_REUSE = "reuse"
+
+
+class MotionGate:
+    def __init__(self, size=(160, 96), block=8, pixel_thresh=12.0,
+                 full_thresh=0.04, track_thresh=0.01, max_skip=5):
+        self.size = size                  # thumbnail (w, h); both multiples of block
+        self.block = block
+        self.pixel_thresh = pixel_thresh  # mean abs diff (0..255) that marks a block as changed
+        self.full_thresh = full_thresh    # changed-block fraction that forces full inference
+        self.track_thresh = track_thresh  # changed-block fraction that needs a tracker refresh
+        self.max_skip = max_skip
+
+        self.energy = 0.0
+        self.frames = 0
+        self.counts = {GATE_FULL: 0, GATE_TRACK: 0, GATE_REUSE: 0}
+        self._ref = None      # thumbnail of the last fully inferred frame
+        self._skipped = 0     # consecutive frames without full inference
+
+    def _thumb(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def change_energy(self, thumb):
+        diff = np.abs(thumb - self._ref)
+        h, w = diff.shape
+        b = self.block
+        blocks = diff[:h - h % b, :w - w % b].reshape(h // b, b, w // b, b).mean(axis=(1, 3))
+        return float((blocks > self.pixel_thresh).mean())
+
+    def decide(self, frame) -> str:
+        thumb = self._thumb(frame)
+        self.frames += 1
+
+        if self._ref is None or self._skipped >= self.max_skip:
+            decision = GATE_FULL
+            self.energy = 1.0 if self._ref is None else self.change_energy(thumb)
+        else:
+            self.energy = self.change_energy(thumb)
+            if self.energy >= self.full_thresh:
+                decision = GATE_FULL
+            elif self.energy >= self.track_thresh:
+                decision = GATE_TRACK
+            else:
+                decision = GATE_REUSE
+
+        if decision == GATE_FULL:
+            self._ref = thumb
+            self._skipped = 0
+        else:
+            self._skipped += 1
+        self.counts[decision] += 1
+        return decision
+
+    @property
+    def skip_ratio(self) -> float:
+        """Fraction of frames that did not run full inference."""
+        return 1.0 - self.counts[GATE_FULL] / max(1, self.frames)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "full": self.counts[GATE_FULL],
+            "track": self.counts[GATE_TRACK],
+            "reuse": self.counts[GATE_REUSE],
+            "skip_ratio": round(self.skip_ratio, 3),
+        }
+
+
+def add_gate_args(ap):
+    ap.add_argument("--motion-gate", action="store_true",
+                    help="skip/reuse inference on frames without meaningful change")
+    ap.add_argument("--gate-max-skip", type=int, default=5,
+                    help="max consecutive frames without full inference")
+    ap.add_argument("--gate-full-thresh", type=float, default=0.04,
+                    help="changed-block fraction that triggers full inference")
+    ap.add_argument("--gate-track-thresh", type=float, default=0.01,
+                    help="changed-block fraction that triggers a tracker-only update")
+
+
+def make_gate(args):
+    if not args.motion_gate:
+        return None
+    return MotionGate(full_thresh=args.gate_full_thresh,
+                      track_thresh=args.gate_track_thresh,
+                      max_skip=args.gate_max_skip)
+
+
+def print_gate_stats(gate):
+    s = gate.stats()
+    print(f"🚦 Motion gate: full={s['full']} track={s['track']} reuse={s['reuse']} "
+          f"skip ratio={s['skip_ratio'] * 100:.1f}%")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+offline_geocoder.py
+
+Reverse geocoding with no network, from a road / locality file prepared
+ahead of time (e.g. an OSM extract exported as GeoJSON with osmium or
+overpass-turbo), so events in dead zones get a real place name instead
+of the stale last one.
+
+- input: a GeoJSON FeatureCollection. LineString / MultiLineString
+  features with properties.name are roads (optional properties.area);
+  Point features with properties.name are localities
+- roads are cut into pieces of at most --offline-geo-cell-m and indexed
+  in a uniform grid over the piece midpoints (cell -> slice of a sorted
+  index array, all NumPy), in local metres around the extract's centre
+- a query scans the grid ring by ring around the point and stops as soon
+  as no unscanned piece can be closer, so the answer is the exact
+  nearest road, typically in tens of microseconds
+- the area is the road's own, else the nearest locality point
+- reverse() formats "Road, Area" like geocode_location() does, "Unknown"
+  when nothing is within --offline-geo-max-m
+"""
+
+import json
+import math
+import time
+
+import numpy as np
+
+UNKNOWN = "Unknown"
+M_PER_DEG = 111_320.0
+
+
+def place_name(road, area):
+    """Same label rules as geocode_location(): 'Magadi Road, Kottigepalya'."""
+    if road and area:
+        return f"{road}, {area}"
+    return road or area or UNKNOWN
+
+
+class OfflineGeocoder:
+    def __init__(self, roads, localities=(), cell_m=100.0, max_m=150.0, locality_m=5000.0):
+        """
+        roads:      [(name, area or None, [(lat, lng), ...])]
+        localities: [(name, lat, lng)]
+        """
+        self.cell_m = float(cell_m)
+        self.max_m = float(max_m)
+        self.locality_m = float(locality_m)
+
+        pts = [p for _, _, line in roads for p in line] + [(lat, lng) for _, lat, lng in localities]
+        if not pts:
+            raise ValueError("no roads or localities to index")
+        lat0 = (min(p[0] for p in pts) + max(p[0] for p in pts)) / 2
+        lng0 = (min(p[1] for p in pts) + max(p[1] for p in pts)) / 2
+        self._origin = (lat0, lng0, math.cos(math.radians(lat0)) * M_PER_DEG)
+
+        # road pieces: start a, direction ab, |ab|^2, owning road
+        self.roads = [(name, area) for name, area, _ in roads]
+        a, b, owner = [], [], []
+        for r, (_, _, line) in enumerate(roads):
+            xy = np.array([self._xy(lat, lng) for lat, lng in line], dtype=np.float64).reshape(-1, 2)
+            for p, q in zip(xy[:-1], xy[1:]):
+                n = max(1, int(math.ceil(np.hypot(*(q - p)) / self.cell_m)))
+                t = np.linspace(0.0, 1.0, n + 1)[:, None]
+                cuts = p + t * (q - p)
+                a.append(cuts[:-1])
+                b.append(cuts[1:])
+                owner.append(np.full(n, r, dtype=np.int32))
+        a = np.concatenate(a) if a else np.zeros((0, 2))
+        b = np.concatenate(b) if b else np.zeros((0, 2))
+        self._a = a.astype(np.float32)
+        self._ab = (b - a).astype(np.float32)
+        self._len2 = np.maximum((self._ab.astype(np.float64) ** 2).sum(1), 1e-9).astype(np.float32)
+        self._owner = np.concatenate(owner) if owner else np.zeros(0, dtype=np.int32)
+
+        # grid over midpoints: pieces sorted by cell, cell -> (lo, hi) into _order
+        mid = (a + b) / 2
+        cells = np.floor(mid / self.cell_m).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        self._order = order.astype(np.int32)
+        self._grid = {}
+        if len(order):
+            sc = cells[order]
+            starts = np.flatnonzero(np.any(np.diff(sc, axis=0) != 0, axis=1)) + 1
+            bounds = np.concatenate(([0], starts, [len(order)]))
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                self._grid[(int(sc[lo, 0]), int(sc[lo, 1]))] = (int(lo), int(hi))
+
+        self.localities = [name for name, _, _ in localities]
+        self._loc_xy = np.array([self._xy(lat, lng) for _, lat, lng in localities],
+                                dtype=np.float32).reshape(-1, 2)
+
+        self.queries = 0
+        self.found = 0
+        self.query_us = 0.0
+
+    @classmethod
+    def load(cls, path, **kw):
+        """Roads + localities from a GeoJSON FeatureCollection (coordinates are [lng, lat])."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        roads, localities = [], []
+        for feat in data.get("features", []):
+            props = feat.get("properties") or {}
+            geom = feat.get("geometry") or {}
+            name = props.get("name")
+            if not name:
+                continue
+            kind, coords = geom.get("type"), geom.get("coordinates")
+            if kind == "LineString":
+                lines = [coords]
+            elif kind == "MultiLineString":
+                lines = coords
+            elif kind == "Point":
+                localities.append((name, coords[1], coords[0]))
+                continue
+            else:
+                continue
+            for line in lines:
+                if len(line) >= 2:
+                    roads.append((name, props.get("area"), [(lat, lng) for lng, lat in line]))
+        return cls(roads, localities, **kw)
+
+    def _xy(self, lat, lng):
+        lat0, lng0, mx = self._origin
+        return (lng - lng0) * mx, (lat - lat0) * M_PER_DEG
+
+    def _ring(self, cx, cy, r):
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest_road(self, lat, lng):
+        """(road, area, metres) of the closest road within max_m, or None."""
+        x, y = self._xy(lat, lng)
+        p = np.array((x, y), dtype=np.float32)
+        cx, cy = int(math.floor(x / self.cell_m)), int(math.floor(y / self.cell_m))
+        half = self.cell_m / 2  # a piece reaches at most this far from its midpoint
+        best_i, best_d = -1, math.inf
+        r = 1
+        while True:
+            if r == 1:
+                cells = [(cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+            else:
+                cells = self._ring(cx, cy, r)
+            spans = (self._grid.get(c) for c in cells)
+            idx = [self._order[s[0]:s[1]] for s in spans if s is not None]
+            if idx:
+                idx = np.concatenate(idx)
+                a, ab = self._a[idx], self._ab[idx]
+                t = np.clip(((p - a) * ab).sum(1) / self._len2[idx], 0.0, 1.0)
+                d = np.hypot(*(a + t[:, None] * ab - p).T)
+                k = int(d.argmin())
+                if d[k] < best_d:
+                    best_i, best_d = int(idx[k]), float(d[k])
+            # the 3x3 block + rings 2..r hold every midpoint within r * cell_m of the point
+            if best_d + half <= r * self.cell_m or r * self.cell_m > self.max_m + half:
+                break
+            r += 1
+        if best_i < 0 or best_d > self.max_m:
+            return None
+        name, area = self.roads[self._owner[best_i]]
+        return name, area, best_d
+
+    def locality(self, lat, lng):
+        """Name of the nearest locality point within locality_m, or None."""
+        if not len(self._loc_xy):
+            return None
+        d = np.hypot(*(self._loc_xy - np.array(self._xy(lat, lng), dtype=np.float32)).T)
+        k = int(d.argmin())
+        return self.localities[k] if d[k] <= self.locality_m else None
+
+    def reverse(self, lat, lng):
+        """'Road, Area' (geocode_location() format), or UNKNOWN."""
+        t = time.perf_counter()
+        hit = self.nearest_road(lat, lng)
+        road, area = (hit[0], hit[1]) if hit else (None, None)
+        name = place_name(road, area or self.locality(lat, lng))
+        self.query_us += (time.perf_counter() - t) * 1e6
+        self.queries += 1
+        self.found += name != UNKNOWN
+        return name
+
+    def stats(self):
+        return {
+            "roads": len(self.roads),
+            "pieces": len(self._owner),
+            "cells": len(self._grid),
+            "localities": len(self.localities),
+            "queries": self.queries,
+            "found": self.found,
+            "avg_us": round(self.query_us / self.queries, 1) if self.queries else 0.0,
+        }
+
+
+def add_offline_geo_args(ap):
+    ap.add_argument("--offline-geo", type=str, default="",
+                    help="GeoJSON roads/localities for naming places without network (empty = off)")
+    ap.add_argument("--offline-geo-max-m", type=float, default=150.0, help="ignore roads farther than this")
+    ap.add_argument("--offline-geo-cell-m", type=float, default=100.0, help="index grid cell size")
+
+
+def make_offline_geocoder(args):
+    if not args.offline_geo:
+        return None
+    geo = OfflineGeocoder.load(args.offline_geo, cell_m=args.offline_geo_cell_m, max_m=args.offline_geo_max_m)
+    s = geo.stats()
+    print(f"🧭 Offline geocoder: {s['roads']} roads ({s['pieces']} pieces in {s['cells']} cells), "
+          f"{s['localities']} localities from {args.offline_geo}")
+    return geo
+
+
+def print_offline_geo_stats(geo):
+    s = geo.stats()
+    print(f"🧭 Offline geocoder: {s['queries']} queries, {s['found']} named, avg {s['avg_us']}µs")
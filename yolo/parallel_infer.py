@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+parallel_infer.py
+
+Runs the accident predict() and traffic track() calls for one frame at the
+same time instead of back-to-back.
+- SerialInference  : reference path, calls run one after the other
+- ParallelInference: one pool thread per model; PyTorch releases the GIL inside
+  its kernels, so both forward passes overlap. Each pool thread sets its own
+  intra-op thread count (OpenMP's thread count is per calling thread), which
+  partitions the cores between the two models instead of oversubscribing them.
+Both return the results in call order, so post-processing is unchanged.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _set_torch_threads(n):
+    try:
+        import torch
+        torch.set_num_threads(n)
+    except ImportError:
+        pass
+
+
+class SerialInference:
+    def run(self, *jobs):
+        """jobs: zero-arg callables (or None to skip). Returns results in the same order."""
+        return [job() if job is not None else None for job in jobs]
+
+    def shutdown(self):
+        pass
+
+
+class ParallelInference:
+    def __init__(self, workers=2, threads_per_worker=None):
+        total = os.cpu_count() or 2
+        self.threads_per_worker = threads_per_worker or max(1, total // workers)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="infer",
+            initializer=_set_torch_threads,
+            initargs=(self.threads_per_worker,),
+        )
+
+    def run(self, *jobs):
+        live = [j for j in jobs if j is not None]
+        if len(live) <= 1:
+            # nothing to overlap, skip the hand-off
+            return [job() if job is not None else None for job in jobs]
+        futures = [self._pool.submit(job) if job is not None else None for job in jobs]
+        return [f.result() if f is not None else None for f in futures]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def make_inference(args):
+    if args.parallel_models:
+        runner = ParallelInference(threads_per_worker=args.threads_per_model or None)
+        print(f"⚡ Parallel inference: {runner.threads_per_worker} torch threads per model")
+        return runner
+    return SerialInference()
+
+
+def add_parallel_args(ap):
+    ap.add_argument("--parallel-models", action="store_true",
+                    help="run accident and traffic models concurrently")
+    ap.add_argument("--threads-per-model", type=int, default=0,
+                    help="torch intra-op threads per model in parallel mode (0 = split cores evenly)")
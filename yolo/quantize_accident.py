@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+quantize_accident.py
+
+INT8 post-training quantization of the accident detector (OpenVINO + NNCF via
+ultralytics export), with an accuracy gate before the model is published.
+
+Steps:
+  1. sample --calib-images images from Accident-detection-dataset/train
+     and use them as the calibration set
+  2. export accident/v1/weights/best.pt -> OpenVINO INT8
+  3. validate FP32 (.pt) and INT8 on the valid and test splits
+  4. gate:
+       - accident-class recall (INT8) may not drop more than --margin below
+         the FP32 accident-class recall measured in step 3
+       - all-class recall on valid (INT8) may not drop more than --margin
+         below the recall recorded for the best epoch in accident/v1/results.csv
+  5. publish to --out only if the gate passes (exit code 1 otherwise)
+
+The published directory plugs straight into the detection scripts:
+    python accident_traffic.py --enable-accident \
+        --accident-weights accident/v1/weights/best_int8_openvino_model
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("INT8 quantization of the accident model with accuracy gate")
+    ap.add_argument("--weights", default="accident/v1/weights/best.pt")
+    ap.add_argument("--dataset", default="Accident-detection-dataset")
+    ap.add_argument("--results-csv", default="accident/v1/results.csv",
+                    help="training log with the FP32 baseline recall")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--calib-images", type=int, default=100, help="train images used for calibration")
+    ap.add_argument("--margin", type=float, default=0.03, help="max allowed recall drop (absolute)")
+    ap.add_argument("--out", default="accident/v1/weights/best_int8_openvino_model")
+    ap.add_argument("--bench-frames", type=int, default=50, help="images timed for the speedup figure")
+    ap.add_argument("--seed", type=int, default=0)
+    return ap.parse_args()
+
+
+def list_images(folder):
+    return sorted(str(p.resolve()) for p in Path(folder).glob("*") if p.suffix.lower() in IMG_EXTS)
+
+
+def read_names(data_yaml):
+    """names list from the Roboflow data.yaml."""
+    with open(data_yaml) as f:
+        return yaml.safe_load(f)["names"]
+
+
+def accident_class_ids(names):
+    ids = [i for i, n in enumerate(names)
+           if any(k in str(n).lower() for k in ("accident", "collision", "fire", "smoke"))]
+    return ids or [0]
+
+
+def write_data_yaml(path, names, train, val=None, test=None):
+    """data.yaml with absolute paths (the Roboflow one uses ../train style paths)."""
+    cfg = {"train": train, "val": val or train, "nc": len(names), "names": list(names)}
+    if test:
+        cfg["test"] = test
+    with open(path, "w") as f:
+        yaml.safe_dump(cfg, f)
+    return path
+
+
+def baseline_recall(results_csv):
+    """Recall of the epoch ultralytics saved as best.pt (max fitness = 0.1*mAP50 + 0.9*mAP50-95)."""
+    best, best_fit = None, -1.0
+    with open(results_csv) as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): v for k, v in row.items()}
+            fit = 0.1 * float(row["metrics/mAP50(B)"]) + 0.9 * float(row["metrics/mAP50-95(B)"])
+            if fit > best_fit:
+                best_fit, best = fit, row
+    return int(best["epoch"]), float(best["metrics/recall(B)"])
+
+
+def evaluate(model, data_yaml, split, imgsz, acc_ids):
+    m = model.val(data=data_yaml, split=split, imgsz=imgsz, batch=1, plots=False, verbose=False)
+    per_class_r = dict(zip((int(i) for i in m.box.ap_class_index), m.box.r))
+    acc_r = [per_class_r[i] for i in acc_ids if i in per_class_r]
+    return {
+        "mAP50": float(m.box.map50),
+        "mAP50-95": float(m.box.map),
+        "recall": float(m.box.mr),
+        "acc_recall": float(np.mean(acc_r)) if acc_r else 0.0,
+    }
+
+
+def time_model(model, images, imgsz, n):
+    frames = [cv2.imread(p) for p in images[:n]]
+    model.predict(frames[0], imgsz=imgsz, verbose=False)  # warm-up
+    t = time.perf_counter()
+    for f in frames:
+        model.predict(f, imgsz=imgsz, verbose=False)
+    return (time.perf_counter() - t) * 1000.0 / max(1, len(frames))
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    ds = Path(args.dataset)
+    names = read_names(ds / "data.yaml")
+    acc_ids = accident_class_ids(names)
+    print(f"Accident classes: {[names[i] for i in acc_ids]}")
+
+    work = Path(tempfile.mkdtemp(prefix="c2c_int8_"))
+    try:
+        # --- calibration subset of train ---
+        train_imgs = list_images(ds / "train" / "images")
+        calib = random.sample(train_imgs, min(args.calib_images, len(train_imgs)))
+        calib_txt = work / "calib.txt"
+        calib_txt.write_text("\n".join(calib) + "\n")
+        calib_yaml = write_data_yaml(work / "calib.yaml", names, str(calib_txt))
+        eval_yaml = write_data_yaml(work / "eval.yaml", names,
+                                    str((ds / "train" / "images").resolve()),
+                                    str((ds / "valid" / "images").resolve()),
+                                    str((ds / "test" / "images").resolve()))
+        print(f"Calibration: {len(calib)} train images")
+
+        # --- export INT8 ---
+        fp32 = YOLO(args.weights)
+        exported = fp32.export(format="openvino", int8=True, data=str(calib_yaml),
+                               imgsz=args.imgsz, fraction=1.0, verbose=False)
+        staged = work / "int8_openvino_model"
+        shutil.move(str(exported), str(staged))
+        int8 = YOLO(str(staged), task="detect")
+
+        # --- accuracy ---
+        rows = {}
+        for split in ("val", "test"):
+            rows[("fp32", split)] = evaluate(YOLO(args.weights), str(eval_yaml), split, args.imgsz, acc_ids)
+            rows[("int8", split)] = evaluate(int8, str(eval_yaml), split, args.imgsz, acc_ids)
+
+        # --- speed ---
+        bench_imgs = list_images(ds / "valid" / "images")
+        ms_fp32 = time_model(YOLO(args.weights), bench_imgs, args.imgsz, args.bench_frames)
+        ms_int8 = time_model(int8, bench_imgs, args.imgsz, args.bench_frames)
+
+        epoch, csv_recall = baseline_recall(args.results_csv)
+
+        print()
+        print(f"{'split':<6}{'model':<6}{'mAP50':>8}{'mAP50-95':>10}{'recall':>8}{'acc recall':>12}")
+        for split in ("val", "test"):
+            for kind in ("fp32", "int8"):
+                r = rows[(kind, split)]
+                print(f"{split:<6}{kind:<6}{r['mAP50']:>8.3f}{r['mAP50-95']:>10.3f}"
+                      f"{r['recall']:>8.3f}{r['acc_recall']:>12.3f}")
+        for split in ("val", "test"):
+            d = {k: rows[("int8", split)][k] - rows[("fp32", split)][k] for k in rows[("fp32", split)]}
+            print(f"Δ {split}: " + ", ".join(f"{k} {v:+.3f}" for k, v in d.items()))
+        print(f"results.csv baseline (epoch {epoch}): recall {csv_recall:.3f}")
+        print(f"Latency: FP32 {ms_fp32:.1f} ms, INT8 {ms_int8:.1f} ms -> {ms_fp32 / ms_int8:.2f}x speedup")
+
+        # --- gate ---
+        failures = []
+        for split in ("val", "test"):
+            drop = rows[("fp32", split)]["acc_recall"] - rows[("int8", split)]["acc_recall"]
+            if drop > args.margin:
+                failures.append(f"{split}: accident recall dropped {drop:.3f} > {args.margin}")
+        csv_drop = csv_recall - rows[("int8", "val")]["recall"]
+        if csv_drop > args.margin:
+            failures.append(f"val: recall {csv_drop:.3f} below results.csv baseline (> {args.margin})")
+
+        if failures:
+            print("\n❌ INT8 model NOT published:")
+            for f in failures:
+                print("   -", f)
+            return 1
+
+        if os.path.exists(args.out):
+            shutil.rmtree(args.out)
+        shutil.copytree(staged, args.out)
+        print(f"\n✅ Published INT8 model: {args.out}")
+        print(f"   python accident_traffic.py --enable-accident --accident-weights {args.out}")
+        return 0
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+recorder.py
+
+Asynchronous --save sink.
+- AsyncVideoWriter: cv2.VideoWriter-compatible (write / release / isOpened)
+  but the mp4v encode runs in a separate process
+- annotated frames are copied into a shared-memory ring of fixed slots, only
+  the slot index crosses the process boundary
+- bounded: when every slot is waiting to be encoded the "block" policy
+  (default) waits for the encoder (backpressure), the "drop" policy skips
+  the frame and warns (at most every DROP_WARN_S) that the clip has gaps
+- a blocked write polls the encoder process; if it died, the error is
+  printed once and every later frame is dropped instead of hanging the loop
+- release() flushes all queued frames before closing the file
+"""
+
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+SAVE_POLICIES = ("block", "drop")
+SLOT_WAIT_S = 0.5    # blocked write: check the encoder is alive this often
+DROP_WARN_S = 5.0    # "drop": at most one warning per this many seconds
+
+
+def _encoder_main(shm_name, shape, path, fourcc, fps, free_q, filled_q, status_q):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    H, W = shape[1], shape[2]
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (W, H))
+    status_q.put(bool(writer.isOpened()))
+    try:
+        while True:
+            slot = filled_q.get()
+            if slot is None:
+                break
+            if writer.isOpened():
+                writer.write(frames[slot])
+            free_q.put(slot)
+    finally:
+        writer.release()
+        del frames
+        shm.close()
+
+
+class AsyncVideoWriter:
+    def __init__(self, path, fps, size, fourcc="mp4v", slots=8, policy="block"):
+        if policy not in SAVE_POLICIES:
+            raise ValueError(f"unknown save policy: {policy}")
+        self.path = path
+        self.size = (int(size[0]), int(size[1]))  # (W, H)
+        self.policy = policy
+        self.slots = max(2, int(slots))
+        self.written = 0   # frames handed to the encoder
+        self.dropped = 0   # frames skipped: queue full ("drop") or encoder dead
+        self.blocked_s = 0.0  # time spent waiting for a slot ("block")
+        self.encoder_died = False
+        self._warned_at = -DROP_WARN_S
+
+        W, H = self.size
+        self._shape = (self.slots, H, W, 3)
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self._shape)))
+        self._frames = np.ndarray(self._shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        ctx = mp.get_context("spawn")
+        self._free_q = ctx.Queue()
+        self._filled_q = ctx.Queue()
+        status_q = ctx.Queue()
+        for i in range(self.slots):
+            self._free_q.put(i)
+
+        self._proc = ctx.Process(
+            target=_encoder_main,
+            args=(self._shm.name, self._shape, path, fourcc, float(fps),
+                  self._free_q, self._filled_q, status_q),
+            name="AsyncVideoWriter",
+            daemon=True,
+        )
+        self._proc.start()
+        try:
+            self._opened = status_q.get(timeout=15)
+        except queue.Empty:
+            self._opened = False
+        if not self._opened:
+            self.release()
+
+    def isOpened(self):
+        return self._opened
+
+    def write(self, frame):
+        if not self._opened:
+            return
+        if self.encoder_died:
+            self.dropped += 1
+            return
+        if self.policy == "drop":
+            try:
+                slot = self._free_q.get_nowait()
+            except queue.Empty:
+                self._drop()
+                return
+        else:
+            t = time.perf_counter()
+            slot = None
+            while slot is None:
+                try:
+                    slot = self._free_q.get(timeout=SLOT_WAIT_S)
+                except queue.Empty:
+                    if not self._proc.is_alive():
+                        self.blocked_s += time.perf_counter() - t
+                        self._drop()
+                        return
+            self.blocked_s += time.perf_counter() - t
+
+        dst = self._frames[slot]
+        if frame.shape[:2] == dst.shape[:2]:
+            np.copyto(dst, frame)
+        else:
+            cv2.resize(frame, self.size, dst=dst)
+        self._filled_q.put(slot)
+        self.written += 1
+
+    def _drop(self):
+        self.dropped += 1
+        if not self.encoder_died and not self._proc.is_alive():
+            self.encoder_died = True
+            print(f"❌ Recorder: encoder process died (exit code {self._proc.exitcode}); "
+                  f"dropping frames, {self.path} ends at frame {self.written}")
+            return
+        now = time.monotonic()
+        if now - self._warned_at >= DROP_WARN_S:
+            self._warned_at = now
+            print(f"⚠️ Recorder: encoder can't keep up, {self.dropped} frames dropped so far "
+                  f"(--save-policy block keeps every frame)")
+
+    def release(self):
+        if self._proc is not None:
+            if self._proc.is_alive():
+                self._filled_q.put(None)  # encoder drains everything queued before this
+                self._proc.join(timeout=30)
+                if self._proc.is_alive():
+                    self._proc.terminate()
+            self._proc = None
+        if self._shm is not None:
+            del self._frames
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self._opened = False
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "blocked_s": round(self.blocked_s, 2),
+            "encoder_died": self.encoder_died,
+        }
+
+
+def open_writer(path, fps, size, slots=8, policy="block"):
+    """AsyncVideoWriter for --save, or None (with a warning) if it cannot be opened."""
+    writer = AsyncVideoWriter(path, fps, size, slots=slots, policy=policy)
+    if not writer.isOpened():
+        print("⚠️ Failed to open writer; disabling save.")
+        return None
+    return writer
+
+
+def add_recorder_args(ap):
+    ap.add_argument("--save-queue", type=int, default=8, help="frames buffered for the encoder process")
+    ap.add_argument("--save-policy", choices=SAVE_POLICIES, default="block",
+                    help="queue full: block the loop until the encoder catches up, or drop the frame")
+
+
+def print_recorder_stats(writer):
+    s = writer.stats()
+    print(f"💾 Recorder ({s['policy']}): written={s['written']} "
+          f"dropped={s['dropped']} blocked={s['blocked_s']}s"
+          + (" ❌ encoder died" if s["encoder_died"] else ""))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+render.py
+
+Overlay rendering, separated from detection.
+
+- the detection loop only records what to draw: an Overlay is a display list
+  of rectangles / text / polylines / lines in full-frame pixel coordinates,
+  built from the current detections, so nothing it holds changes afterwards
+- Renderer draws that list onto a copy of the frame on its own thread and
+  hands it to the --save writer; for --display the finished image goes back
+  to the caller, and show() (run by submit(), i.e. on the main loop) does
+  cv2.imshow / cv2.waitKey -- HighGUI only works from the main thread
+- headless (no --display, no --save): Renderer.overlay() returns None, the
+  scripts skip building the list, and there is no frame copy, no drawing
+  and no cv2.waitKey -- zero CPU on pixels nobody sees
+- --render-every N: only every Nth frame is drawn / shown / saved (the saved
+  clip's FPS is divided by N so it still plays in real time)
+- --render-scale S: the frame is downscaled before drawing; window and saved
+  file get the smaller size
+- queue: display only -> one slot, newest frame wins; with --save the
+  --save-policy applies (block the loop / drop the frame)
+"""
+
+import queue
+import threading
+
+import cv2
+
+from recorder import open_writer, print_recorder_stats
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class Overlay:
+    __slots__ = ("ops",)
+
+    def __init__(self):
+        self.ops = []
+
+    def rectangle(self, p1, p2, color, thickness=2):
+        self.ops.append((0, p1, p2, color, thickness))
+
+    def text(self, s, org, scale, color, thickness=2):
+        self.ops.append((1, s, org, scale, color, thickness))
+
+    def polylines(self, pts, color, thickness=2):
+        """Closed polygon, pts = (K, 2) int32 array."""
+        self.ops.append((2, pts, color, thickness))
+
+    def line(self, p1, p2, color, thickness=2):
+        self.ops.append((3, p1, p2, color, thickness))
+
+    def draw(self, img, scale=1.0):
+        def pt(p):
+            return (int(p[0] * scale), int(p[1] * scale)) if scale != 1.0 else (int(p[0]), int(p[1]))
+
+        for op in self.ops:
+            kind = op[0]
+            if kind == 0:
+                cv2.rectangle(img, pt(op[1]), pt(op[2]), op[3], op[4])
+            elif kind == 1:
+                cv2.putText(img, op[1], pt(op[2]), FONT, op[3] * max(scale, 0.4), op[4], op[5])
+            elif kind == 2:
+                pts = (op[1] * scale).astype(op[1].dtype) if scale != 1.0 else op[1]
+                cv2.polylines(img, [pts], True, op[2], op[3])
+            else:
+                cv2.line(img, pt(op[1]), pt(op[2]), op[3], op[4])
+        return img
+
+
+class Renderer:
+    def __init__(self, title=None, writer=None, scale=1.0, every=1, policy="block"):
+        self.title = title      # window name, None = no window
+        self.writer = writer
+        self.scale = float(scale)
+        self.every = max(1, int(every))
+        self.block = writer is not None and policy == "block"
+        self.quit = False       # 'q' pressed in the window
+        self.rendered = 0
+        self.dropped = 0        # frames the render thread could not keep up with
+        self._q = queue.Queue(maxsize=1 if writer is None else 2)
+        self._lock = threading.Lock()
+        self._shown = None      # newest finished image, waiting for show()
+        self._thread = None
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name="Renderer", daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self):
+        return self.title is not None or self.writer is not None
+
+    def overlay(self, frame_idx):
+        """Overlay to fill for this frame, or None if it will not be rendered."""
+        if not self.enabled or self.quit or frame_idx % self.every:
+            return None
+        return Overlay()
+
+    def submit(self, frame, ov):
+        """
+        Queue frame + overlay for drawing (the frame is copied; the caller may reuse it).
+        Call from the main thread: it also updates the window (show()).
+        """
+        if self.title is not None:
+            self.show()
+        if ov is None or not self.enabled:
+            return
+        if self.scale != 1.0:
+            img = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            img = frame.copy()
+        if self.block:
+            self._q.put((img, ov))
+            return
+        try:
+            self._q.put_nowait((img, ov))
+        except queue.Full:
+            if self.writer is None:
+                # display only: replace the stale frame with this one
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    pass
+                self._q.put_nowait((img, ov))
+            self.dropped += 1
+
+    def show(self):
+        """Main thread only: show the newest finished image, poll the window for 'q'."""
+        if self.title is None:
+            return
+        with self._lock:
+            img, self._shown = self._shown, None
+        try:
+            if img is not None:
+                cv2.imshow(self.title, img)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.quit = True
+        except cv2.error:
+            print("⚠️ No GUI available; window disabled.")
+            self.title = None
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            img, ov = item
+            ov.draw(img, self.scale)
+            if self.writer is not None:
+                self.writer.write(img)
+            if self.title is not None:
+                with self._lock:
+                    self._shown = img  # an image not shown yet is simply replaced
+            self.rendered += 1
+
+    def close(self):
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.writer is not None:
+            self.writer.release()
+        if self.title is not None:
+            cv2.destroyAllWindows()
+
+    def stats(self):
+        return {"rendered": self.rendered, "dropped": self.dropped,
+                "every": self.every, "scale": self.scale}
+
+
+def add_render_args(ap):
+    ap.add_argument("--render-every", type=int, default=1, help="draw / show / save every Nth frame only")
+    ap.add_argument("--render-scale", type=float, default=1.0,
+                    help="downscale frames before drawing (window and --save size)")
+
+
+def make_renderer(args, W, H, fps, title):
+    """Renderer for --display / --save (opens the writer); inert when neither is set."""
+    writer = None
+    if args.save:
+        size = (int(W * args.render_scale), int(H * args.render_scale))
+        writer = open_writer(args.save, fps / max(1, args.render_every), size,
+                             slots=args.save_queue, policy=args.save_policy)
+    return Renderer(title if args.display else None, writer, scale=args.render_scale,
+                    every=args.render_every, policy=args.save_policy)
+
+
+def print_render_stats(renderer):
+    if not renderer.enabled and renderer.rendered == 0:
+        print("🖼️ Rendering: off (headless)")
+        return
+    s = renderer.stats()
+    print(f"🖼️ Rendering: rendered={s['rendered']} dropped={s['dropped']} "
+          f"every={s['every']} scale={s['scale']:g}")
+    if renderer.writer is not None:
+        print_recorder_stats(renderer.writer)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+roi_crop.py
+
+ROI-cropped traffic inference.
+Density only counts boxes touching --roi and crossings only happen near
+--line, so the traffic model only needs to see the union of:
+  - the density ROI
+  - a band of +/- band px around the count line
+The union is padded out to a multiple of the model stride and clipped to the
+frame. The crop is fixed for the whole run (ROI/line don't move), so the
+tracker sees a stable coordinate system and persistent IDs keep working;
+boxes are shifted back into frame coordinates before post-processing and
+rendering.
+"""
+
+import numpy as np
+
+
+def crop_region(roi_box, line, band, W, H, stride=32):
+    """(x1, y1, x2, y2) crop covering roi_box and the band around line, stride-aligned."""
+    rx1, ry1, rx2, ry2 = roi_box
+    lx1, ly1, lx2, ly2 = line
+    x1 = min(rx1, lx1, lx2) - band
+    x2 = max(rx2, lx1, lx2) + band
+    y1 = min(ry1, ly1 - band, ly2 - band)
+    y2 = max(ry2, ly1 + band, ly2 + band)
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(W, x2), min(H, y2)
+
+    # grow to a multiple of stride (shift back inside the frame if we hit the edge)
+    def align(a, b, limit):
+        size = b - a
+        target = min(limit, int(np.ceil(size / stride)) * stride)
+        extra = target - size
+        a = max(0, a - extra // 2)
+        b = a + target
+        if b > limit:
+            a, b = limit - target, limit
+        return int(a), int(b)
+
+    x1, x2 = align(x1, x2, W)
+    y1, y2 = align(y1, y2, H)
+    return x1, y1, x2, y2
+
+
+def crop_view(frame, box):
+    x1, y1, x2, y2 = box
+    return frame[y1:y2, x1:x2]
+
+
+def shift_results(results, box, frame_shape):
+    """Move boxes from crop coordinates back into full-frame coordinates (in place)."""
+    if not results or getattr(results[0], "boxes", None) is None:
+        return results
+    from ultralytics.engine.results import Boxes
+
+    r = results[0]
+    data = r.boxes.data
+    # inference tensors can't be modified in place outside inference mode -> clone
+    data = data.clone() if hasattr(data, "clone") else np.array(data, copy=True)
+    if len(data):
+        x1, y1 = box[0], box[1]
+        data[:, 0] += x1
+        data[:, 2] += x1
+        data[:, 1] += y1
+        data[:, 3] += y1
+    r.orig_shape = tuple(frame_shape[:2])
+    r.boxes = Boxes(data, r.orig_shape)
+    return results
+
+
+def add_crop_args(ap):
+    ap.add_argument("--traffic-crop", action="store_true",
+                    help="run the traffic model only on ROI + count-line band (needs --traffic-source coco)")
+    ap.add_argument("--crop-band", type=float, default=0.06,
+                    help="half-height of the band around the count line (fraction of frame height)")
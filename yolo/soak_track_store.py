@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+soak_track_store.py
+
+Long-run memory check for the bounded track store.
+Replays the sample video in a loop through model.track() (IDs keep growing
+because persist=True across loops) and feeds LineCounter, printing process
+RSS and track-store size every --report-every frames. With --legacy the old
+prev_cy dict / last_count_frame defaultdict are fed the same IDs for comparison.
+
+    python soak_track_store.py --source head_on_collision_2.mp4 --hours 8
+    python soak_track_store.py --synthetic --hours 8    # no model, simulated 25 FPS traffic
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from capture import open_source
+from counting import LineCounter
+from detections import Detections
+from track_store import add_track_store_args, make_track_store, print_track_stats
+from vehicles import VEHICLE_CLASS_IDS
+
+
+def parse_args():
+    ap = argparse.ArgumentParser("Track-store soak test")
+    ap.add_argument("--source", default="head_on_collision_2.mp4")
+    ap.add_argument("--model", default="yolov8s.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--tracker", default="botsort.yaml")
+    ap.add_argument("--hours", type=float, default=1.0, help="footage to replay (at --fps)")
+    ap.add_argument("--fps", type=float, default=25.0)
+    ap.add_argument("--synthetic", action="store_true", help="simulated tracks instead of the model")
+    ap.add_argument("--vehicles", type=int, default=20, help="vehicles in view (synthetic)")
+    ap.add_argument("--legacy", action="store_true", help="also grow the old unbounded dicts")
+    ap.add_argument("--report-every", type=int, default=25 * 600)
+    add_track_store_args(ap)
+    return ap.parse_args()
+
+
+def rss_mib():
+    """Current resident set size (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2 ** 20 if sys.platform == "darwin" else 1024)
+
+
+def synthetic_frames(n_frames, n_vehicles, rng):
+    """Vehicles drive top->bottom through a 720p view; each new pass gets a new ID."""
+    y = rng.uniform(0, 720, n_vehicles)
+    vy = rng.uniform(4, 12, n_vehicles)
+    x = rng.uniform(0, 1200, n_vehicles)
+    ids = np.arange(n_vehicles, dtype=np.int64)
+    next_id = n_vehicles
+    for _ in range(n_frames):
+        y += vy
+        wrapped = y > 720
+        if wrapped.any():
+            y[wrapped] = 0.0
+            ids[wrapped] = np.arange(next_id, next_id + int(wrapped.sum()))
+            next_id += int(wrapped.sum())
+        xyxy = np.stack((x, y - 30, x + 80, y + 30), axis=1)
+        yield Detections(xyxy, np.ones(n_vehicles), np.full(n_vehicles, 2), ids)
+
+
+def video_frames(args, n_frames):
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    done = 0
+    while done < n_frames:
+        cap, _ = open_source(args.source, mode="lossless")
+        while done < n_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            res = model.track(frame, imgsz=args.imgsz, tracker=args.tracker, persist=True,
+                              classes=VEHICLE_CLASS_IDS, verbose=False)
+            done += 1
+            yield Detections.from_results(res)
+        cap.release()
+
+
+def main():
+    args = parse_args()
+    n_frames = int(args.hours * 3600 * args.fps)
+    counter = LineCounter([("line", (0, 576, 1280, 576), ("in", "out"))], cooldown_ms=200,
+                          store=make_track_store(args))
+    legacy_prev_cy, legacy_last = {}, defaultdict(int)
+
+    frames = (synthetic_frames(n_frames, args.vehicles, np.random.default_rng(0))
+              if args.synthetic else video_frames(args, n_frames))
+
+    print(f"Soak: {n_frames} frames ({args.hours:g} h @ {args.fps:g} FPS), "
+          f"{'synthetic' if args.synthetic else args.source}")
+    print(f"{'frame':>10}{'footage h':>11}{'RSS MiB':>10}{'live':>7}{'store KiB':>11}{'legacy ids':>12}")
+    rss0 = rss_mib()
+    t0 = time.time()
+    crossings = 0
+    for i, det in enumerate(frames, 1):
+        crossings += counter.update(det, i, i / args.fps)
+        if args.legacy:
+            for tid, cy in zip(det.track_id.tolist(), det.centroids()[:, 1].tolist()):
+                legacy_prev_cy[tid] = cy
+                legacy_last[tid]
+        if i % args.report_every == 0 or i == n_frames:
+            st = counter.store
+            print(f"{i:>10}{i / args.fps / 3600:>11.2f}{rss_mib():>10.1f}{len(st):>7}"
+                  f"{st.memory_bytes() / 1024:>11.1f}{len(legacy_prev_cy):>12}")
+
+    print(f"\nRSS growth: {rss_mib() - rss0:+.1f} MiB over {time.time() - t0:.0f}s, crossings={crossings}")
+    print_track_stats(counter.store)
+
+
+if __name__ == "__main__":
+    main()
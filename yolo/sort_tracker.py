@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+sort_tracker.py
+
+Built-in CPU tracker (--tracker builtin): SORT/ByteTrack-style tracking of
+plain predict() detections, no appearance model or camera-motion step, so
+the detector call is a plain predict() and tracking costs about a
+millisecond per frame on CPU.
+
+- one constant-velocity Kalman filter per track on (cx, cy, w/h, h), the
+  ByteTrack parametrisation; all tracks are predicted / corrected as
+  stacked (N, 8) / (N, 8, 8) arrays. The time step is the capture-time
+  delta (in 25 FPS frame units), so gaps from the motion gate or a slow
+  loop are coasted over correctly
+- association, ByteTrack's two stages on IoU with the predicted boxes:
+    1. detections with conf >= --track-high vs all tracks
+    2. the rest (conf >= --track-low) vs tracks that were seen last frame
+  optimal assignment via scipy's Hungarian solver when installed,
+  otherwise greedy highest-IoU-first
+- an unmatched high-confidence detection starts a track; its ID is reported
+  once it has been matched --track-min-hits times in a row
+- unmatched tracks coast on the prediction and are dropped after
+  --track-buffer-ms without a match (unconfirmed ones immediately)
+
+update() returns Detections with track_id set, like model.track() output
+passed through Detections.from_results().
+"""
+
+import numpy as np
+
+from accident_smoother import greedy_match, iou_matrix
+from detections import Detections
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # greedy matching is close enough at traffic densities
+    linear_sum_assignment = None
+
+REF_DT = 1.0 / 25.0  # Kalman noise is tuned per 25 FPS frame
+STD_POS = 1.0 / 20.0
+STD_VEL = 1.0 / 160.0
+
+
+def match(iou, thresh):
+    """(rows, cols) of a one-to-one matching maximising IoU, only pairs >= thresh."""
+    if linear_sum_assignment is None or iou.size == 0:
+        return greedy_match(iou, thresh)
+    rows, cols = linear_sum_assignment(-iou)
+    keep = iou[rows, cols] >= thresh
+    return rows[keep].astype(np.int64), cols[keep].astype(np.int64)
+
+
+def xyxy_to_xyah(b):
+    w, h = b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]
+    return np.stack(((b[:, 0] + b[:, 2]) * 0.5, (b[:, 1] + b[:, 3]) * 0.5, w / np.maximum(h, 1e-6), h), axis=1)
+
+
+def xyah_to_xyxy(m):
+    w, h = m[:, 2] * m[:, 3], m[:, 3]
+    return np.stack((m[:, 0] - w * 0.5, m[:, 1] - h * 0.5, m[:, 0] + w * 0.5, m[:, 1] + h * 0.5), axis=1)
+
+
+class SortTracker:
+    def __init__(self, high_thresh=0.5, low_thresh=0.1, new_thresh=0.6, match_iou=0.2,
+                 low_match_iou=0.5, min_hits=3, buffer_ms=1200.0):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_thresh = new_thresh
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.min_hits = min_hits
+        self.buffer_s = buffer_ms / 1000.0
+
+        # one row per track
+        self.ids = np.empty(0, dtype=np.int64)
+        self.mean = np.empty((0, 8), dtype=np.float64)
+        self.cov = np.empty((0, 8, 8), dtype=np.float64)
+        self.cls = np.empty(0, dtype=np.int64)
+        self.conf = np.empty(0, dtype=np.float32)
+        self.hits = np.empty(0, dtype=np.int64)
+        self.last_t = np.empty(0, dtype=np.float64)
+        self.confirmed = np.empty(0, dtype=bool)
+        self.seen = np.empty(0, dtype=bool)  # matched in the previous update
+
+        self._next_id = 1
+        self._t = None
+        self.frames = 0
+        self.created = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- Kalman ----
+
+    def _predict(self, dt):
+        n = len(self.ids)
+        if n == 0:
+            return
+        k = dt / REF_DT
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * k
+        h = self.mean[:, 3]
+        std = np.stack((STD_POS * h, STD_POS * h, np.full(n, 1e-2), STD_POS * h,
+                        STD_VEL * h, STD_VEL * h, np.full(n, 1e-5), STD_VEL * h), axis=1)
+        Q = np.zeros((n, 8, 8))
+        Q[:, np.arange(8), np.arange(8)] = std ** 2 * k
+        self.mean = self.mean @ F.T
+        self.cov = F @ self.cov @ F.T + Q
+
+    def _correct(self, rows, z):
+        if len(rows) == 0:
+            return
+        mean, cov = self.mean[rows], self.cov[rows]
+        h = mean[:, 3]
+        r = np.stack((STD_POS * h, STD_POS * h, np.full(len(rows), 1e-1), STD_POS * h), axis=1)
+        S = cov[:, :4, :4].copy()
+        S[:, np.arange(4), np.arange(4)] += r ** 2
+        K = cov[:, :, :4] @ np.linalg.inv(S)                  # (K, 8, 4)
+        self.mean[rows] = mean + (K @ (z - mean[:, :4])[:, :, None])[:, :, 0]
+        self.cov[rows] = cov - K @ cov[:, :4, :]
+
+    def _spawn(self, z, cls, conf, t):
+        n = len(z)
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        self.created += n
+        h = z[:, 3]
+        std = np.stack((2 * STD_POS * h, 2 * STD_POS * h, np.full(n, 1e-2), 2 * STD_POS * h,
+                        10 * STD_VEL * h, 10 * STD_VEL * h, np.full(n, 1e-5), 10 * STD_VEL * h), axis=1)
+        cov = np.zeros((n, 8, 8))
+        cov[:, np.arange(8), np.arange(8)] = std ** 2
+        confirmed = np.full(n, self.min_hits <= 1 or self.frames == 1)
+        self.ids = np.concatenate((self.ids, ids))
+        self.mean = np.concatenate((self.mean, np.concatenate((z, np.zeros((n, 4))), axis=1)))
+        self.cov = np.concatenate((self.cov, cov))
+        self.cls = np.concatenate((self.cls, cls))
+        self.conf = np.concatenate((self.conf, conf))
+        self.hits = np.concatenate((self.hits, np.ones(n, dtype=np.int64)))
+        self.last_t = np.concatenate((self.last_t, np.full(n, t)))
+        self.confirmed = np.concatenate((self.confirmed, confirmed))
+        self.seen = np.concatenate((self.seen, np.ones(n, dtype=bool)))
+        return ids, confirmed
+
+    def _keep(self, mask):
+        self.removed += int((~mask).sum())
+        for name in ("ids", "mean", "cov", "cls", "conf", "hits", "last_t", "confirmed", "seen"):
+            setattr(self, name, getattr(self, name)[mask])
+
+    # ---- per frame ----
+
+    def update(self, det, t):
+        """Associate this frame's detections (captured at t, seconds) -> Detections with track IDs."""
+        t = float(t)
+        self.frames += 1
+        dt = REF_DT if self._t is None else max(t - self._t, 1e-3)
+        self._t = t
+        self._predict(dt)
+
+        keep = det.conf >= self.low_thresh
+        boxes, conf, cls = det.xyxy[keep].astype(np.float64), det.conf[keep], det.cls[keep]
+        z = xyxy_to_xyah(boxes)
+        high = np.flatnonzero(conf >= self.high_thresh)
+        low = np.flatnonzero(conf < self.high_thresh)
+
+        pred = xyah_to_xyxy(self.mean)
+        # stage 1: confident detections vs every track
+        r1, c1 = match(iou_matrix(pred, boxes[high]), self.match_iou)
+        trk_rows, det_cols = [r1], [high[c1]]
+        # stage 2: weak detections vs tracks seen last frame and still free
+        free = np.ones(len(self.ids), dtype=bool)
+        free[r1] = False
+        cand = np.flatnonzero(free & self.seen)
+        r2, c2 = match(iou_matrix(pred[cand], boxes[low]), self.low_match_iou)
+        trk_rows.append(cand[r2])
+        det_cols.append(low[c2])
+        rows, cols = np.concatenate(trk_rows), np.concatenate(det_cols)
+
+        self._correct(rows, z[cols])
+        self.cls[rows] = cls[cols]
+        self.conf[rows] = conf[cols]
+        self.hits[rows] += 1
+        self.last_t[rows] = t
+        self.confirmed |= self.hits >= self.min_hits
+        matched = np.zeros(len(self.ids), dtype=bool)
+        matched[rows] = True
+        self.hits[~matched] = 0
+        self.seen = matched
+
+        out_ids = np.full(len(boxes), -1, dtype=np.int64)
+        ok = self.confirmed[rows]
+        out_ids[cols[ok]] = self.ids[rows[ok]]
+
+        # drop unconfirmed tracks on their first miss and everyone after the buffer
+        self._keep(matched | (self.confirmed & (t - self.last_t <= self.buffer_s)))
+
+        # unmatched confident detections start tracks
+        unused = np.ones(len(boxes), dtype=bool)
+        unused[cols] = False
+        new = np.flatnonzero(unused & (conf >= self.new_thresh))
+        if len(new):
+            ids, confirmed = self._spawn(z[new], cls[new], conf[new], t)
+            out_ids[new[confirmed]] = ids[confirmed]
+
+        sel = out_ids >= 0
+        return Detections(boxes[sel], conf[sel], cls[sel], out_ids[sel])
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "live": len(self.ids),
+            "created": self.created,
+            "removed": self.removed,
+            "assignment": "hungarian" if linear_sum_assignment is not None else "greedy",
+        }
+
+
+def is_builtin(tracker):
+    return tracker == "builtin"
+
+
+def add_sort_args(ap):
+    ap.add_argument("--track-high", type=float, default=0.5, help="builtin tracker: first-stage confidence")
+    ap.add_argument("--track-low", type=float, default=0.1, help="builtin tracker: lowest usable confidence")
+    ap.add_argument("--track-new", type=float, default=0.6, help="builtin tracker: confidence to start a track")
+    ap.add_argument("--track-min-hits", type=int, default=3, help="builtin tracker: matches before an ID is reported")
+    ap.add_argument("--track-buffer-ms", type=float, default=1200.0,
+                    help="builtin tracker: keep unmatched tracks this long")
+
+
+def make_tracker(args):
+    """SortTracker for --tracker builtin, None for ultralytics tracker configs."""
+    if not is_builtin(args.tracker):
+        return None
+    return SortTracker(high_thresh=args.track_high, low_thresh=args.track_low, new_thresh=args.track_new,
+                       min_hits=args.track_min_hits, buffer_ms=args.track_buffer_ms)
+
+
+def print_tracker_stats(tracker):
+    s = tracker.stats()
+    print(f"🧭 Builtin tracker ({s['assignment']}): frames={s['frames']} live={s['live']} "
+          f"created={s['created']} removed={s['removed']}")
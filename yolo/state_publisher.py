@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+state_publisher.py
+
+Change-driven /vehicles/<car id> updates (replaces the full PUT of the
+whole document once per second, which lastUpdate alone made different
+every time).
+
+- the first write is a full PUT; after that only the fields that differ
+  from the last state Firebase acknowledged go out, as a PATCH
+- a write is triggered only when
+    * trafficLevel or isAccident flips
+    * the position moved --state-min-move-m from the acknowledged one
+    * nothing was written for --state-heartbeat-s (presence), carrying
+      lastUpdate plus whatever else drifted
+  and never more often than --state-min-interval-s
+- one write in flight at a time: the next diff is taken against what was
+  acknowledged, so a failed or dropped write is simply re-diffed and sent
+  again on the next update (no partial PATCH can be lost to queue
+  coalescing)
+- stats: writes, fields and bytes sent vs the old 1 Hz full PUT
+"""
+
+import json
+import math
+import threading
+import time
+
+from uploader import PRIO_STATE
+
+FLAGS = ("trafficLevel", "isAccident")
+
+
+def moved_m(lat1, lng1, lat2, lng2):
+    """Equirectangular distance in metres (fine at these ranges)."""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6_371_000.0 * math.hypot(x, y)
+
+
+class StatePublisher:
+    def __init__(self, uploader, car_id, reg_number, min_move_m=25.0, heartbeat_s=30.0, min_interval_s=1.0):
+        self.uploader = uploader
+        self.path = f"/vehicles/{car_id}.json"
+        self.reg_number = reg_number
+        self.min_move_m = min_move_m
+        self.heartbeat_s = heartbeat_s
+        self.min_interval_s = min_interval_s
+
+        self._lock = threading.Lock()
+        self._acked = None      # state Firebase has (None = nothing written yet)
+        self._inflight = None   # state being written
+        self._last_sent = -math.inf
+        self._retry = False     # last write failed: resend the diff without waiting for a trigger
+
+        self.updates = 0
+        self.writes = 0
+        self.full_writes = 0
+        self.heartbeats = 0
+        self.flips = 0
+        self.moves = 0
+        self.failed = 0
+        self.fields = 0
+        self.bytes = 0
+        self.baseline_writes = 0  # what the old 1 Hz full PUT would have sent
+        self.baseline_bytes = 0
+        self._baseline_at = -math.inf
+
+    def update(self, lat, lng, location_name, traffic_level, is_accident, now=None):
+        """Call as often as you like (e.g. every frame); returns True if a write was queued."""
+        now = time.monotonic() if now is None else now
+        state = {
+            "regNumber": self.reg_number,
+            "latitude": lat,
+            "longitude": lng,
+            "locationName": location_name,
+            "trafficLevel": traffic_level,   # "LOW"/"MEDIUM"/"HIGH" or None
+            "isAccident": bool(is_accident),
+        }
+        self.updates += 1
+        if now - self._baseline_at >= 1.0:
+            self._baseline_at = now
+            self.baseline_writes += 1
+            self.baseline_bytes += len(json.dumps(dict(state, lastUpdate=int(time.time() * 1000))))
+
+        with self._lock:
+            if self._inflight is not None or now - self._last_sent < self.min_interval_s:
+                return False
+            acked = self._acked
+            if acked is None:
+                method, body = "PUT", dict(state)
+                self.full_writes += 1
+            else:
+                body = {k: v for k, v in state.items() if acked.get(k) != v}
+                flipped = any(k in body for k in FLAGS)
+                moved = moved_m(acked["latitude"], acked["longitude"], lat, lng) >= self.min_move_m
+                heartbeat = now - self._last_sent >= self.heartbeat_s
+                if not (flipped or moved or heartbeat or self._retry):
+                    return False
+                self.flips += flipped
+                self.moves += moved
+                self.heartbeats += heartbeat and not (flipped or moved)
+                method = "PATCH"
+            body["lastUpdate"] = int(time.time() * 1000)
+            self._inflight = state
+            self._last_sent = now
+            self._retry = False
+        self.writes += 1
+        self.fields += len(body)
+        self.bytes += len(json.dumps(body))
+        # outside our lock: the uploader may call on_done inline (queue full / closing)
+        if not self.uploader.submit(method, self.path, body, prio=PRIO_STATE,
+                                    what="update vehicle state", on_done=self._done(state)):
+            self._done(state)(False, True)
+        return True
+
+    def _done(self, state):
+        def on_done(ok, retryable):
+            with self._lock:
+                if self._inflight is state:
+                    self._inflight = None
+                if ok:
+                    self._acked = state
+                else:
+                    self.failed += 1
+                    # re-diffed against the acknowledged state, after min_interval_s; a refused
+                    # write (bad value) waits for the next trigger instead of being resent as is
+                    self._retry = retryable
+        return on_done
+
+    def stats(self):
+        return {
+            "updates": self.updates,
+            "writes": self.writes,
+            "full": self.full_writes,
+            "flips": self.flips,
+            "moves": self.moves,
+            "heartbeats": self.heartbeats,
+            "failed": self.failed,
+            "fields": self.fields,
+            "bytes": self.bytes,
+            "baseline_writes": self.baseline_writes,
+            "baseline_bytes": self.baseline_bytes,
+        }
+
+
+def add_state_args(ap):
+    ap.add_argument("--state-min-move-m", type=float, default=25.0,
+                    help="publish the position once it moved this far from the last published one")
+    ap.add_argument("--state-heartbeat-s", type=float, default=30.0,
+                    help="publish lastUpdate at least this often, even if nothing changed")
+    ap.add_argument("--state-min-interval-s", type=float, default=1.0, help="never publish more often than this")
+
+
+def make_state_publisher(args, uploader, car_id, reg_number):
+    return StatePublisher(uploader, car_id, reg_number, min_move_m=args.state_min_move_m,
+                          heartbeat_s=args.state_heartbeat_s, min_interval_s=args.state_min_interval_s)
+
+
+def print_state_stats(pub):
+    s = pub.stats()
+    saved = 1 - s["bytes"] / s["baseline_bytes"] if s["baseline_bytes"] else 0.0
+    print(f"🚗 Vehicle state: {s['writes']} writes (full {s['full']}, flips {s['flips']}, moves {s['moves']}, "
+          f"heartbeats {s['heartbeats']}, failed {s['failed']}) {s['fields']} fields, {s['bytes']} bytes "
+          f"vs {s['baseline_writes']} full PUTs / {s['baseline_bytes']} bytes at 1 Hz ({saved:.0%} saved)")
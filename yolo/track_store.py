@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+track_store.py
+
+Bounded per-track state for the traffic loops (replaces the prev_cy dict /
+last_count_frame defaultdict that grew by one entry per track ID forever).
+
+- fixed-capacity NumPy columns, one slot per live track (users such as
+  LineCounter keep their own per-slot rows next to them, e.g. last centroid):
+    last_count      capture time of the last counted crossing (cooldown)
+    first_frame / last_frame, first_t / last_t   first/last seen
+- ID -> slot index kept as two sorted arrays, so looking up every box of a
+  frame is a single searchsorted
+- tracks not seen for --track-max-age frames (or --track-max-age-s seconds)
+  are evicted; if the store is full the stalest track is evicted early.
+  evict() keeps a lower bound on the oldest last_frame / last_t (they only
+  move forward), so on most frames it is two comparisons, not a scan
+Memory is allocated once up front and does not grow with drive length.
+"""
+
+import numpy as np
+
+_FIELDS = (
+    ("last_count", np.float64),
+    ("first_frame", np.int64), ("last_frame", np.int64),
+    ("first_t", np.float64), ("last_t", np.float64),
+)
+
+
+class TrackStore:
+    def __init__(self, capacity=1024, max_age_frames=150, max_age_s=0.0):
+        self.capacity = int(capacity)
+        self.max_age_frames = int(max_age_frames)
+        self.max_age_s = float(max_age_s)
+        for name, dtype in _FIELDS:
+            setattr(self, name, np.zeros(self.capacity, dtype=dtype))
+        self.track_id = np.full(self.capacity, -1, dtype=np.int64)  # slot -> id (-1 = free)
+        self._free = list(range(self.capacity - 1, -1, -1))          # stack of free slots
+        self._ids = np.empty(0, dtype=np.int64)                       # sorted live ids
+        self._slots = np.empty(0, dtype=np.int64)                     # slot of _ids[i]
+        self._oldest_frame = 0        # lower bounds of last_frame / last_t over live slots
+        self._oldest_t = -np.inf
+        self.inserted = 0
+        self.evicted = 0
+        self.forced = 0  # evictions because the store was full
+        self.peak = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup(self, ids):
+        """Slot of each id (-1 if not stored)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self._ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.searchsorted(self._ids, ids)
+        np.minimum(pos, len(self._ids) - 1, out=pos)  # past the end: compared against the last id, no match
+        return np.where(self._ids[pos] == ids, self._slots[pos], -1)
+
+    def _remove(self, slots):
+        if len(slots) == 0:
+            return
+        ids = self.track_id[slots]
+        keep = ~np.isin(self._ids, ids)
+        self._ids, self._slots = self._ids[keep], self._slots[keep]
+        self.track_id[slots] = -1
+        self._free.extend(int(s) for s in slots)
+        self.evicted += len(slots)
+
+    def insert(self, ids, frame_idx, t=0.0):
+        """Allocate slots for new ids (not already stored, at most capacity). Returns their slots."""
+        ids = np.asarray(ids, dtype=np.int64)[:self.capacity]
+        overflow = len(ids) - len(self._free)
+        if overflow > 0:
+            live = self._slots
+            stalest = live[np.argsort(self.last_frame[live], kind="stable")[:overflow]]
+            self._remove(stalest)
+            self.forced += len(stalest)
+        slots = np.array([self._free.pop() for _ in range(len(ids))], dtype=np.int64)
+        self.track_id[slots] = ids
+        self.last_count[slots] = -np.inf
+        self.first_frame[slots] = self.last_frame[slots] = frame_idx
+        self.first_t[slots] = self.last_t[slots] = t
+
+        order = np.argsort(ids)
+        pos = np.searchsorted(self._ids, ids[order])
+        self._ids = np.insert(self._ids, pos, ids[order])
+        self._slots = np.insert(self._slots, pos, slots[order])
+        self.inserted += len(ids)
+        self.peak = max(self.peak, len(self._ids))
+        return slots
+
+    def evict(self, frame_idx, t=0.0):
+        """Drop tracks older than max_age_frames / max_age_s. Returns how many were removed."""
+        live = self._slots
+        if len(live) == 0:
+            return 0
+        frames_due = self.max_age_frames > 0 and frame_idx - self._oldest_frame > self.max_age_frames
+        time_due = self.max_age_s > 0 and t - self._oldest_t > self.max_age_s
+        if not (frames_due or time_due):
+            return 0  # nothing can be stale yet
+        stale = np.zeros(len(live), dtype=bool)
+        if self.max_age_frames > 0:
+            stale |= frame_idx - self.last_frame[live] > self.max_age_frames
+        if self.max_age_s > 0:
+            stale |= t - self.last_t[live] > self.max_age_s
+        self._remove(live[stale])
+        live = self._slots
+        if len(live):
+            self._oldest_frame = int(self.last_frame[live].min())
+            self._oldest_t = float(self.last_t[live].min())
+        return int(stale.sum())
+
+    def memory_bytes(self):
+        cols = sum(getattr(self, name).nbytes for name, _ in _FIELDS) + self.track_id.nbytes
+        return cols + self._ids.nbytes + self._slots.nbytes + 8 * len(self._free)
+
+    def stats(self):
+        return {
+            "live": len(self),
+            "peak": self.peak,
+            "capacity": self.capacity,
+            "inserted": self.inserted,
+            "evicted": self.evicted,
+            "forced": self.forced,
+            "bytes": self.memory_bytes(),
+        }
+
+
+def add_track_store_args(ap):
+    ap.add_argument("--track-capacity", type=int, default=1024,
+                    help="max live tracks kept for counting (stalest evicted when full)")
+    ap.add_argument("--track-max-age", type=int, default=150,
+                    help="forget a track after this many frames unseen (0 = off)")
+    ap.add_argument("--track-max-age-s", type=float, default=0.0,
+                    help="forget a track after this many seconds unseen (0 = off)")
+
+
+def make_track_store(args):
+    return TrackStore(capacity=args.track_capacity, max_age_frames=args.track_max_age,
+                      max_age_s=args.track_max_age_s)
+
+
+def print_track_stats(store):
+    s = store.stats()
+    print(f"🧮 Track store: live={s['live']} peak={s['peak']}/{s['capacity']} "
+          f"inserted={s['inserted']} evicted={s['evicted']} (forced {s['forced']}) "
+          f"memory={s['bytes'] / 1024:.1f} KiB")
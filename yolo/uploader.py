@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+uploader.py
+
+Background Firebase REST uploader, so the frame loop never waits on the network.
+
+- submit() only builds a job and pushes it on a bounded priority queue;
+  one worker thread sends jobs over a pooled keep-alive requests.Session
+  (HTTP/1.1, one TLS handshake for the whole run instead of one per call)
+- priority: accident < traffic < V2V < vehicle state, so an accident report
+  never waits behind a backlog of state updates
+- jobs with a key (the vehicle state) are coalesced: a newer submit replaces
+  the body of the one still queued instead of adding another PUT
+- queue full: the new job evicts the lowest-priority, newest queued job if it
+  outranks it, otherwise it is dropped (counted)
+- connection errors, timeouts, 429 and 5xx are retried with exponential
+  backoff (--upload-retries); so are 401 / 403 (expired token, locked rules:
+  nothing is wrong with the data, every write would get the same answer).
+  Only the answers that reject the payload itself (REJECTED: 400 bad data,
+  413 too large, 422) fail at once. A combined request that is rejected is
+  re-sent one job at a time, so only the job carrying the bad write is
+  reported as rejected
+- on_done(ok, retryable) tells the job's owner how it ended: retryable is
+  False only when the server refused the write itself (e.g. HTTP 400 for a
+  NaN), True when it may succeed later (transport, 401 / 403, 429 / 5xx,
+  dropped from a full queue, closing)
+- --upload-batch-ms > 0: writes queued within that window go out as ONE
+  multi-location PATCH on the DB root. PUT /a/b.json becomes "a/b": body
+  (same replace semantics), POST /list.json becomes "list/<push id>": body
+  with a client-generated Firebase push ID -- so a retried batch cannot
+  create duplicates. An accident closes the window at once
+- on_result(ok), if set, hears about every request: True for any HTTP
+  answer, False for a transport failure (the connectivity monitor's
+  passive signal)
+- stats: requests / writes / bytes, sent / failed / retries / dropped /
+  coalesced, queue peak and per-request latency p50 / p95 / max
+"""
+
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+PRIO_ACCIDENT, PRIO_TRAFFIC, PRIO_V2V, PRIO_STATE = 0, 1, 2, 3
+REJECTED = (400, 413, 422)  # HTTP answers that refuse the payload: resending it cannot help
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_push_lock = threading.Lock()
+_push_last = [0, [0] * 12]  # last timestamp (ms), its random suffix
+
+
+def push_id(now_ms=None):
+    """
+    Firebase-style push ID: 8 chars of ms timestamp + 12 random chars, sorting
+    in creation order (the suffix is incremented within the same ms).
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    with _push_lock:
+        if now_ms == _push_last[0]:
+            rnd = _push_last[1]
+            i = 11
+            while i >= 0 and rnd[i] == 63:
+                rnd[i] = 0
+                i -= 1
+            if i >= 0:
+                rnd[i] += 1
+        else:
+            rnd = [random.randrange(64) for _ in range(12)]
+            _push_last[0], _push_last[1] = now_ms, rnd
+        suffix = "".join(PUSH_CHARS[c] for c in rnd)
+    head = []
+    for _ in range(8):
+        head.append(PUSH_CHARS[now_ms % 64])
+        now_ms //= 64
+    return "".join(reversed(head)) + suffix
+
+
+def db_path(path):
+    """'/vehicles/C1.json' -> 'vehicles/C1' ('' for the root)."""
+    path = path.strip("/")
+    return path[:-5] if path.endswith(".json") else path
+
+
+def _overlaps(a, b):
+    """True if one DB path is the other or an ancestor of it (not allowed in one multi-path update)."""
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/") or not a or not b
+
+
+class _Job:
+    __slots__ = ("prio", "seq", "method", "path", "body", "what", "key", "on_done")
+
+    def __init__(self, prio, seq, method, path, body, what, key, on_done):
+        self.prio, self.seq = prio, seq
+        self.method, self.path, self.body = method, path, body
+        self.what, self.key, self.on_done = what, key, on_done
+
+    def __lt__(self, other):
+        return (self.prio, self.seq) < (other.prio, other.seq)
+
+
+class Uploader:
+    def __init__(self, base_url, max_queue=256, timeout=3.0, retries=2, backoff=0.5,
+                 batch_ms=0.0, batch_max=64):
+        self.base_url = base_url.rstrip("/")
+        self.batch_s = batch_ms / 1000.0
+        self.batch_max = max(1, int(batch_max))
+        self.max_queue = max(1, int(max_queue))
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._heap = []
+        self._keyed = {}  # key -> queued _Job
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._closing = False
+        self._deadline = None
+
+        self.requests = 0  # HTTP requests that got an answer or gave up
+        self.writes = 0    # jobs delivered (several per request when batching)
+        self.bytes = 0     # request bodies, incl. retries
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.peak = 0
+        self.latency_ms = deque(maxlen=2048)  # successful requests, incl. retries
+        self.on_result = None
+
+        self._thread = threading.Thread(target=self._run, name="Uploader", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._cv:
+            return len(self._heap)
+
+    # ---- producer side (frame loop) ----
+
+    def submit(self, method, path, body, prio=PRIO_STATE, what="upload", key=None, on_done=None):
+        """
+        Queue one REST call (path relative to the DB root, e.g. '/accidents.json'); never blocks.
+        on_done(ok, retryable) is called from the uploader thread once the call succeeded or gave up.
+        """
+        with self._cv:
+            if self._closing:
+                self.dropped += 1
+                return False
+            if key is not None and key in self._keyed:
+                job = self._keyed[key]
+                job.method, job.path, job.body = method, path, body
+                self.coalesced += 1
+                return True
+            if self.batch_s > 0 and method == "POST":
+                # client-side push ID now, so the entry keeps its place in time order
+                method, path = "PUT", f"/{db_path(path)}/{push_id()}.json"
+            job = _Job(prio, next(self._seq), method, path, body, what, key, on_done)
+            if len(self._heap) >= self.max_queue:
+                worst = max(self._heap)
+                if not job < worst:
+                    self.dropped += 1
+                    return False
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                if worst.key is not None:
+                    del self._keyed[worst.key]
+                if worst.on_done is not None:
+                    worst.on_done(False, True)
+                self.dropped += 1
+            heapq.heappush(self._heap, job)
+            if key is not None:
+                self._keyed[key] = job
+            self.peak = max(self.peak, len(self._heap))
+            self._cv.notify()
+            return True
+
+    def put(self, path, body, **kw):
+        return self.submit("PUT", path, body, **kw)
+
+    def post(self, path, body, **kw):
+        return self.submit("POST", path, body, **kw)
+
+    def patch(self, path, body, **kw):
+        return self.submit("PATCH", path, body, **kw)
+
+    # ---- worker ----
+
+    def _pop(self):
+        job = heapq.heappop(self._heap)
+        if job.key is not None:
+            del self._keyed[job.key]
+        return job
+
+    def _next_jobs(self):
+        """Jobs for the next request: one, or (batching) everything queued within the window."""
+        with self._cv:
+            while not self._heap:
+                if self._closing:
+                    return None
+                self._cv.wait()
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                return None
+            if self.batch_s <= 0:
+                return [self._pop()]
+            end = time.monotonic() + self.batch_s
+            while (not self._closing and self._heap[0].prio > PRIO_ACCIDENT
+                   and len(self._heap) < self.batch_max and time.monotonic() < end):
+                self._cv.wait(end - time.monotonic())
+            jobs, paths, later = [], [], []
+            while self._heap and len(jobs) < self.batch_max:
+                job = self._pop()
+                p = db_path(job.path)
+                if any(_overlaps(p, q) for q in paths):
+                    later.append(job)  # conflicting path: next batch
+                    continue
+                jobs.append(job)
+                paths.append(p)
+            for job in later:
+                heapq.heappush(self._heap, job)
+                if job.key is not None:
+                    self._keyed[job.key] = job
+            return jobs
+
+    def _request(self, jobs):
+        """(method, url, body) carrying all jobs."""
+        if len(jobs) == 1 and self.batch_s <= 0:
+            job = jobs[0]
+            return job.method, self.base_url + job.path, job.body
+        update = {}
+        for job in jobs:
+            p = db_path(job.path)
+            if job.method == "PATCH":
+                update.update({f"{p}/{k}" if p else k: v for k, v in job.body.items()})
+            else:  # PUT (POSTs were turned into PUTs on a push ID)
+                update[p] = job.body
+        return "PATCH", self.base_url + "/.json", update
+
+    def _send(self, method, url, body):
+        """One request -> (ok, retryable, error)."""
+        data = json.dumps(body).encode("utf-8")
+        self.bytes += len(data)
+        t = time.perf_counter()
+        try:
+            r = self.session.request(method, url, data=data, timeout=self.timeout,
+                                     headers={"Content-Type": "application/json"})
+        except requests.RequestException as e:
+            if self.on_result is not None:
+                self.on_result(False)
+            return False, True, e
+        if self.on_result is not None:
+            self.on_result(True)
+        if r.status_code < 400:
+            self.latency_ms.append((time.perf_counter() - t) * 1000.0)
+            return True, False, None
+        return False, r.status_code not in REJECTED, f"HTTP {r.status_code}"
+
+    def _run(self):
+        while True:
+            jobs = self._next_jobs()
+            if jobs is None:
+                return
+            method, url, body = self._request(jobs)
+            for attempt in range(self.retries + 1):
+                ok, retryable, err = self._send(method, url, body)
+                if ok or not retryable or attempt == self.retries:
+                    break
+                self.retried += 1
+                time.sleep(self.backoff * (2 ** attempt))
+            self.requests += 1
+            if not ok and not retryable and len(jobs) > 1:
+                # a combined request was refused: find out whose write it was
+                results = []
+                for job in jobs:
+                    results.append((job,) + self._send(*self._request([job])))
+                    self.requests += 1
+            else:
+                results = [(job, ok, retryable, err) for job in jobs]
+            failed = [(job, err) for job, ok, _, err in results if not ok]
+            self.sent += len(jobs) - len(failed)
+            self.writes += len(jobs) - len(failed)
+            if failed:
+                self.failed += len(failed)
+                print(f"⚠️ Failed to {', '.join(sorted({j.what for j, _ in failed}))}: {failed[0][1]}")
+            for job, ok, retryable, _ in results:
+                if job.on_done is not None:
+                    job.on_done(ok, retryable)
+
+    def close(self, timeout=5.0):
+        """Send what is still queued (for at most `timeout` s), then stop the worker."""
+        with self._cv:
+            self._closing = True
+            self._deadline = time.monotonic() + timeout
+            self._cv.notify_all()
+        self._thread.join(timeout + self.timeout + 1.0)
+        with self._cv:
+            self.dropped += len(self._heap)
+            for job in self._heap:
+                if job.on_done is not None:
+                    job.on_done(False, True)
+            self._heap.clear()
+            self._keyed.clear()
+        self.session.close()
+
+    def stats(self):
+        lat = np.asarray(self.latency_ms, dtype=np.float64)
+        p50, p95, mx = (np.percentile(lat, 50), np.percentile(lat, 95), lat.max()) if len(lat) else (0.0, 0.0, 0.0)
+        return {
+            "requests": self.requests,
+            "writes": self.writes,
+            "bytes": self.bytes,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retried,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "queued": len(self),
+            "peak": self.peak,
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "max_ms": round(float(mx), 1),
+        }
+
+
+def add_uploader_args(ap):
+    ap.add_argument("--upload-queue", type=int, default=256, help="Firebase requests buffered for the uploader")
+    ap.add_argument("--upload-timeout", type=float, default=3.0, help="per-request timeout (s)")
+    ap.add_argument("--upload-retries", type=int, default=2,
+                    help="retries for timeouts / 5xx / 429 / 401 / 403 (exponential backoff from 0.5 s)")
+    ap.add_argument("--upload-batch-ms", type=float, default=1000.0,
+                    help="coalesce writes queued within this window into one multi-path PATCH (0 = one request each)")
+
+
+def make_uploader(args, firebase_url):
+    return Uploader(firebase_url, max_queue=args.upload_queue, timeout=args.upload_timeout,
+                    retries=args.upload_retries, batch_ms=args.upload_batch_ms)
+
+
+def print_uploader_stats(uploader):
+    s = uploader.stats()
+    print(f"📤 Uploader: requests={s['requests']} writes={s['writes']} bytes={s['bytes']} sent={s['sent']} failed={s['failed']} retries={s['retries']} "
+          f"dropped={s['dropped']} coalesced={s['coalesced']} queue peak={s['peak']} "
+          f"latency p50={s['p50_ms']}ms p95={s['p95_ms']}ms max={s['max_ms']}ms")
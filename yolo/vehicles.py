@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+vehicles.py
+
+Vehicle class bookkeeping shared by the traffic pipelines.
+- COCO models (yolov8s.pt): bicycle/car/motorcycle/bus/truck
+- accident/v1 weights (Accident-detection-dataset/data.yaml):
+  ['Accident', 'Accident-fire-smoke', 'Bike', 'CAR', 'Truck']
+vehicle_class_map() turns either model's names into {class_id: coco_name}
+so the traffic loop can run on whichever model produced the boxes.
+"""
+
+VEHICLE_NAMES = {"car", "bus", "truck", "motorcycle", "bicycle"}
+VEHICLE_CLASS_IDS = [1, 2, 3, 5, 7]  # COCO: bicycle=1, car=2, motorcycle=3, bus=5, truck=7
+
+# accident-model class name (lower-case) -> COCO vehicle name
+ACCIDENT_VEHICLE_ALIASES = {"bike": "motorcycle", "car": "car", "truck": "truck"}
+
+TRAFFIC_SOURCES = ("coco", "accident")
+
+
+def vehicle_class_map(names) -> dict:
+    """{class_id: vehicle name} for every vehicle class in a model's names dict/list."""
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    out = {}
+    for i, n in (names or {}).items():
+        s = str(n).lower()
+        if s in VEHICLE_NAMES:
+            out[int(i)] = s
+        elif s in ACCIDENT_VEHICLE_ALIASES:
+            out[int(i)] = ACCIDENT_VEHICLE_ALIASES[s]
+    return out
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+zones.py
+
+Named polygon zones for traffic density (replaces the single --roi rectangle
+and the hard-coded <=3 LOW / <=8 MEDIUM thresholds).
+
+- each zone: polygon (normalized points) + its own (low, medium) thresholds
+    --zones "lane1:0.05,0.95,0.30,0.45,0.45,0.45,0.40,0.95:2,5;lane2:...:4,10"
+  no --zones -> one zone called "roi" from --roi with thresholds 3,8
+- membership: a box belongs to a zone if its bottom-centre (where the
+  vehicle touches the road) lies inside the polygon. Polygons are rasterised
+  once into a low-res bit mask (bit z = zone z, so zones may overlap); each
+  frame is then one fancy-index lookup for all boxes
+- per zone: vehicle count, level, and occupancy = summed box footprint
+  (box clipped to the zone's bounding rect) / polygon area, capped at 1
+- level dwell: a zone's reported level only changes once the thresholds have
+  disagreed with it for --level-dwell-ms of capture time (no flicker around
+  a threshold, same behaviour whatever the processing rate)
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+LEVELS = ("LOW", "MEDIUM", "HIGH")
+LEVEL_COLORS = {"LOW": (0, 255, 0), "MEDIUM": (0, 255, 255), "HIGH": (0, 0, 255)}
+DEFAULT_THRESHOLDS = (3, 8)
+
+
+def level_for(count, thresholds=DEFAULT_THRESHOLDS):
+    low, medium = thresholds
+    if count <= low:
+        return "LOW"
+    if count <= medium:
+        return "MEDIUM"
+    return "HIGH"
+
+
+def parse_zones(spec, W, H, default_roi="0.25,0.35,0.75,0.95", default_thresholds=DEFAULT_THRESHOLDS):
+    """
+    'name:x1,y1,x2,y2,x3,y3,...[:low,medium];...' (normalized) ->
+    [(name, (K, 2) int32 points in px, (low, medium)), ...]
+    """
+    if not spec:
+        x1, y1, x2, y2 = [float(v) for v in default_roi.split(",")]
+        spec = f"roi:{x1},{y1},{x2},{y1},{x2},{y2},{x1},{y2}"
+    zones = []
+    for i, part in enumerate(p.strip() for p in spec.split(";")):
+        if not part:
+            continue
+        fields = part.split(":")
+        if len(fields) == 1:
+            fields = [f"zone{i + 1}"] + fields
+        name = fields[0].strip()
+        vals = [float(v) for v in fields[1].split(",")]
+        if len(vals) < 6 or len(vals) % 2:
+            raise ValueError(f"zone {name!r}: need at least 3 x,y points")
+        pts = np.array(vals, dtype=np.float64).reshape(-1, 2) * (W, H)
+        thr = tuple(int(v) for v in fields[2].split(",")) if len(fields) > 2 else tuple(default_thresholds)
+        zones.append((name, pts.round().astype(np.int32), thr))
+    return zones
+
+
+class ZoneSet:
+    def __init__(self, zones, W, H, scale=0.25, dwell_ms=0.0):
+        if len(zones) > 32:
+            raise ValueError("at most 32 zones")
+        self.zones = list(zones)
+        self.names = [z[0] for z in self.zones]
+        self.thresholds = np.array([z[2] for z in self.zones], dtype=np.int64).reshape(-1, 2)
+        self.W, self.H = W, H
+        self.scale = float(scale)
+        self.dwell_s = dwell_ms / 1000.0
+        mw, mh = max(1, int(round(W * scale))), max(1, int(round(H * scale)))
+        self.mask = np.zeros((mh, mw), dtype=np.uint32)
+        layer = np.zeros((mh, mw), dtype=np.uint8)
+        for z, (_, pts, _) in enumerate(self.zones):
+            layer[:] = 0
+            cv2.fillPoly(layer, [np.round(pts * scale).astype(np.int32)], 1)
+            self.mask |= layer.astype(np.uint32) << np.uint32(z)
+        self._bits = (np.uint32(1) << np.arange(len(self.zones), dtype=np.uint32))
+        self.area = np.array([max(cv2.contourArea(p.astype(np.float32)), 1.0) for _, p, _ in self.zones])
+        self.rects = np.array([(p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max())
+                               for _, p, _ in self.zones], dtype=np.float32).reshape(-1, 4)
+
+        n = len(self.zones)
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.occupancy = np.zeros(n, dtype=np.float32)
+        self.levels = ["LOW"] * n      # reported (after dwell)
+        self.raw_levels = ["LOW"] * n  # this frame's thresholds
+        self._pending_since = [None] * n
+
+    def extent(self):
+        """(x1, y1, x2, y2) bounding box of all zones (e.g. for roi_crop.crop_region)."""
+        r = self.rects
+        return int(r[:, 0].min()), int(r[:, 1].min()), int(r[:, 2].max()), int(r[:, 3].max())
+
+    def membership(self, det):
+        """(N, Z) boolean: box bottom-centre inside zone z."""
+        if len(det) == 0:
+            return np.zeros((0, len(self.zones)), dtype=bool)
+        b = det.xyxy
+        mh, mw = self.mask.shape
+        xs = np.clip(((b[:, 0] + b[:, 2]) * 0.5 * self.scale).astype(np.int64), 0, mw - 1)
+        ys = np.clip((b[:, 3] * self.scale).astype(np.int64), 0, mh - 1)
+        return (self.mask[ys, xs][:, None] & self._bits) != 0
+
+    def update(self, det, t=None):
+        """Recompute counts / occupancy / levels for this frame's boxes captured at t (s, monotonic)."""
+        inside = self.membership(det)
+        self.counts = inside.sum(axis=0)
+        if len(det):
+            b = det.xyxy[:, None, :]
+            r = self.rects[None, :, :]
+            w = np.clip(np.minimum(b[..., 2], r[..., 2]) - np.maximum(b[..., 0], r[..., 0]), 0, None)
+            h = np.clip(np.minimum(b[..., 3], r[..., 3]) - np.maximum(b[..., 1], r[..., 1]), 0, None)
+            self.occupancy = np.minimum((w * h * inside).sum(axis=0) / self.area, 1.0).astype(np.float32)
+        else:
+            self.occupancy = np.zeros(len(self.zones), dtype=np.float32)
+        self.raw_levels = [level_for(c, thr) for c, thr in zip(self.counts.tolist(), self.thresholds.tolist())]
+        self._dwell(time.monotonic() if t is None else float(t))
+        return self
+
+    def _dwell(self, t):
+        for z, raw in enumerate(self.raw_levels):
+            if raw == self.levels[z]:
+                self._pending_since[z] = None
+            elif self._pending_since[z] is None and self.dwell_s > 0:
+                self._pending_since[z] = t
+            elif self.dwell_s <= 0 or t - self._pending_since[z] >= self.dwell_s - 1e-6:  # timestamp rounding
+                self.levels[z] = raw
+                self._pending_since[z] = None
+
+    def worst(self):
+        """(level, count) of the most congested zone (ties -> higher count)."""
+        if not self.zones:
+            return "LOW", 0
+        i = max(range(len(self.zones)), key=lambda z: (LEVELS.index(self.levels[z]), self.counts[z]))
+        return self.levels[i], int(self.counts[i])
+
+    def summary(self):
+        return {n: {"count": int(c), "occupancy": round(float(o), 3), "level": lv}
+                for n, c, o, lv in zip(self.names, self.counts, self.occupancy, self.levels)}
+
+
+def draw_zones(ov, zones, color=(255, 255, 0)):
+    """Add zone outlines + per-zone count / occupancy / level to a render.Overlay."""
+    for (name, pts, _), c, o, lv in zip(zones.zones, zones.counts, zones.occupancy, zones.levels):
+        ov.polylines(pts, color, 2)
+        x, y = int(pts[:, 0].min()), int(pts[:, 1].min())
+        ov.text(f"{name}: {c} ({o * 100:.0f}%) {lv}", (x, max(0, y - 8)), 0.6, LEVEL_COLORS[lv], 2)
+
+
+def add_zone_args(ap):
+    ap.add_argument("--zones", type=str, default="",
+                    help="density zones 'name:x1,y1,x2,y2,x3,y3,...[:low,medium];...' (normalized 0..1); "
+                         "default: --roi with thresholds 3,8")
+    ap.add_argument("--zone-mask-scale", type=float, default=0.25,
+                    help="resolution of the zone lookup mask relative to the frame")
+    ap.add_argument("--level-dwell-ms", type=float, default=1000.0,
+                    help="a zone's traffic level must hold this long before it is reported")
+
+
+def make_zones(args, W, H):
+    return ZoneSet(parse_zones(args.zones, W, H, default_roi=args.roi), W, H,
+                   scale=args.zone_mask_scale, dwell_ms=args.level_dwell_ms)